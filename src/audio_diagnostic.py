@@ -30,12 +30,6 @@ def check_imports():
         print("✅ sounddevice imported successfully")
     except ImportError:
         missing.append("sounddevice")
-        
-    try:
-        import sox
-        print("✅ sox imported successfully")
-    except ImportError:
-        missing.append("sox")
     
     if missing:
         print(f"❌ Missing libraries: {', '.join(missing)}")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Batch Voice Processing for Dark Helmet Voice Changer
+Runs recorded lines through the live effect chain, split into chunks across all CPU cores
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dsp_engine import DSPEngine
+from params import DEFAULT_PARAMS, EffectParams
+from wav_stream import WavReader, WavWriter
+
+# Offline processing settings
+BLOCK_SIZE = 1024        # Samples fed to the engine per call, as in the live stream
+CHUNK_SECONDS = 10.0     # Work unit handed to each process
+PREROLL_SECONDS = 1.0    # Input replayed before a chunk so filter/reverb state settles
+OVERLAP_SECONDS = 0.05   # Crossfade between neighbouring chunks
+ALIGN_SECONDS = 0.0075   # Furthest a chunk is shifted to line up: half a period of a 67 Hz voice
+
+
+def render_range(path, start, stop, params, sample_rate, preroll):
+    """Process output frames [start, stop) of a file with a fresh engine
+
+    Input is replayed from `preroll` frames earlier (aligned to the block
+    grid) so filter, vocoder and reverb state match a single continuous
+    pass, and the engine latency is compensated so output lines up with input.
+    """
+    with WavReader(path) as reader:
+        engine = DSPEngine(sample_rate, reader.channels, BLOCK_SIZE,
+                           channel_vocoder=EffectParams(*params).vocoder_mix > 0)
+        engine.set_params(*params)
+        latency = engine.latency
+
+        feed_start = max(0, (start - preroll) // BLOCK_SIZE * BLOCK_SIZE)
+        offset = start - feed_start + latency
+        output = np.empty((offset + stop - start + BLOCK_SIZE, reader.channels), dtype=np.float32)
+        for i, block in enumerate(reader.blocks(BLOCK_SIZE, feed_start, stop + latency)):
+            engine.process(block, output[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE])
+    return output[offset:offset + stop - start]
+
+
+def _alignment(tail, rendered, lead, trail):
+    """Shift in [-lead, trail] at which rendered best continues the previous chunk's tail
+
+    Each engine's phase vocoder starts its synthesis phase where its chunk
+    begins, so two chunks render the same partials with different phases.
+    For (quasi-)periodic sound that is a time offset within half a pitch
+    period either way, found here as the peak of the normalised
+    cross-correlation. Of shifts that match about equally well, the
+    smallest wins, so chunks that already agree stay put.
+    """
+    n = len(tail)
+    region = rendered[:lead + trail + n]
+    tail_energy = np.sum(tail ** 2)
+    if tail_energy == 0:
+        return 0
+    correlation = sum(np.correlate(region[:, c], tail[:, c], 'valid') for c in range(tail.shape[1]))
+    power = np.concatenate([[0.0], np.cumsum(np.sum(region.astype(np.float64) ** 2, axis=1))])
+    energy = power[n:] - power[:-n]
+    score = correlation / np.sqrt(np.maximum(energy, 1e-12) * tail_energy)
+    shifts = np.arange(-lead, trail + 1)
+    close = np.flatnonzero(score >= score.max() - 1e-3)
+    return int(shifts[close[np.argmin(np.abs(shifts[close]))]])
+
+
+def _crossfade(tail, head):
+    """Blend the end of one chunk into the start of the next
+
+    A linear fade scaled by the two sides' correlation keeps the power of
+    the mix constant: coherent signals are reconstructed exactly, and
+    partials the alignment could not match (voice harmonics rarely all
+    line up at one lag) no longer cancel in the middle of the fade.
+    """
+    t = np.linspace(0.0, 1.0, len(tail), dtype=np.float32)[:, None]
+    energy = np.sqrt(np.sum(tail ** 2) * np.sum(head ** 2))
+    correlation = np.clip(np.sum(tail * head) / energy, 0.0, 1.0) if energy > 0 else 1.0
+    gain = 1.0 / np.sqrt((1.0 - t) ** 2 + t ** 2 + 2.0 * correlation * t * (1.0 - t))
+    return (tail * (1.0 - t) + head * t) * gain
+
+
+def plan_chunks(total_frames, sample_rate, chunk_seconds=CHUNK_SECONDS,
+                overlap_seconds=OVERLAP_SECONDS):
+    """Split a file into (start, stop) output ranges that overlap by the crossfade length"""
+    chunk = max(int(chunk_seconds * sample_rate), BLOCK_SIZE)
+    overlap = int(overlap_seconds * sample_rate)
+    ranges = []
+    for start in range(0, total_frames, chunk):
+        ranges.append((start, min(start + chunk + overlap, total_frames)))
+    return ranges, overlap
+
+
+def render_bounds(start, stop, total_frames, margin):
+    """Frames to render for the output range [start, stop): margin more each side where the file allows"""
+    return max(start - margin, 0), min(stop + margin, total_frames)
+
+
+def stitch(chunks, ranges, margin=0):
+    """Yield finished output in order, crossfading each chunk into the next
+
+    Chunks are rendered over render_bounds(), so each one can be shifted by
+    up to margin frames to line up with the previous chunk's tail before
+    the crossfade. Only that overlapping tail is held, so chunks can be
+    written out as they arrive.
+    """
+    tail = None
+    for i, ((start, stop), rendered) in enumerate(zip(ranges, chunks)):
+        lead = min(margin, start)
+        shift = 0
+        if tail is not None:
+            shift = _alignment(tail, rendered, lead, len(rendered) - lead - (stop - start))
+        piece = rendered[lead + shift:lead + shift + stop - start]
+        if tail is not None:
+            piece[:len(tail)] = _crossfade(tail, piece[:len(tail)])
+        done = ranges[i + 1][0] - start if i + 1 < len(ranges) else stop - start
+        yield piece[:done]
+        tail = piece[done:]
+
+
+def _rendered(jobs, executor, in_flight):
+    """Render jobs in order, keeping at most in_flight chunks outstanding"""
+    if executor is None:
+        for job in jobs:
+            yield render_range(*job)
+        return
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(render_range, *job))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def process_file(in_path, out_path, params=DEFAULT_PARAMS, executor=None,
+                 chunk_seconds=CHUNK_SECONDS):
+    """Process one WAV file, fanning its chunks out over executor (or inline)
+
+    Chunks are written to a memory-mapped output as they finish, so memory
+    use depends on the chunk size and worker count, not the file length.
+    """
+    with WavReader(in_path) as reader:
+        sample_rate, channels = reader.sample_rate, reader.channels
+        total_frames, dtype = reader.frames, reader.dtype
+
+    ranges, _ = plan_chunks(total_frames, sample_rate, chunk_seconds)
+    preroll = int(PREROLL_SECONDS * sample_rate)
+    margin = int(ALIGN_SECONDS * sample_rate)
+    jobs = [(in_path, *render_bounds(start, stop, total_frames, margin), tuple(params), sample_rate, preroll)
+            for start, stop in ranges]
+    in_flight = 2 * (os.cpu_count() or 1)
+    with WavWriter(out_path, sample_rate, channels, total_frames, dtype) as writer:
+        for piece in stitch(_rendered(jobs, executor, in_flight), ranges, margin):
+            writer.write(piece)
+    return total_frames / sample_rate
+
+
+def process_directory(in_dir, out_dir, params=DEFAULT_PARAMS, workers=None,
+                      chunk_seconds=CHUNK_SECONDS):
+    """Process every .wav in in_dir into out_dir using a process pool"""
+    os.makedirs(out_dir, exist_ok=True)
+    names = sorted(name for name in os.listdir(in_dir) if name.lower().endswith('.wav'))
+    audio_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name in names:
+            print(f"🎙️  {name}")
+            audio_seconds += process_file(os.path.join(in_dir, name), os.path.join(out_dir, name),
+                                          params, executor, chunk_seconds)
+    return len(names), audio_seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply the Dark Helmet voice to recorded WAV files")
+    parser.add_argument('input', help="Input WAV file or directory")
+    parser.add_argument('output', help="Output WAV file or directory")
+    parser.add_argument('--workers', type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument('--chunk-seconds', type=float, default=CHUNK_SECONDS)
+    for name in EffectParams._fields:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float,
+                            default=getattr(DEFAULT_PARAMS, name))
+    args = parser.parse_args(argv)
+    params = EffectParams(*(getattr(args, name) for name in EffectParams._fields))
+
+    print("🎭 Dark Helmet Batch Processor")
+    print("=" * 50)
+    started = time.perf_counter()
+    if os.path.isdir(args.input):
+        count, audio_seconds = process_directory(args.input, args.output, params,
+                                                 args.workers, args.chunk_seconds)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            audio_seconds = process_file(args.input, args.output, params, executor,
+                                         args.chunk_seconds)
+        count = 1
+    elapsed = time.perf_counter() - started
+    print(f"✅ {count} file(s), {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+          f"({audio_seconds / max(elapsed, 1e-9):.1f}x realtime)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark for the Dark Helmet Realtime Effect Chain
+Feeds synthetic or recorded audio through each stage block by block, no audio device needed
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from dsp_engine import DSPEngine, NotchFilter
+from params import DEFAULT_PARAMS
+from presets import BUILTIN_PRESETS
+from stream_backends import load_wav, synthetic_voice
+from vocoder import ChannelVocoder
+from waveshaper import Waveshaper
+
+# Sample rates and block sizes get_best_audio_config can fall back to
+BENCH_CONFIGS = [
+    # (sample_rate, blocksize)
+    (44100, 1024),
+    (44100, 512),
+    (22050, 1024),
+    (22050, 512),
+    (48000, 1024),
+    (48000, 512),
+]
+
+
+def _engine_case(pitch_algorithm, params=DEFAULT_PARAMS, **options):
+    # options are DSPEngine keyword arguments (multichannel, internal_rate, feedback, ...)
+    def build(sample_rate, channels, blocksize):
+        engine = DSPEngine(sample_rate, channels, blocksize, pitch_algorithm=pitch_algorithm, **options)
+        engine.set_params(*params)
+        return engine.process
+    return build
+
+
+# The chain voice_changer builds with its default settings, and with the robot vocoder enabled
+LIVE_OPTIONS = {'feedback': True, 'gate': True, 'oversample': 2, 'waveshaper': 'tanh'}
+
+
+def _notch_case(sample_rate, channels, blocksize):
+    notch = NotchFilter(sample_rate)
+    work = np.zeros(blocksize, dtype=np.float32)
+
+    def process(indata, outdata):
+        notch.process(indata[:, 0], work[:len(indata)])
+        outdata[:, 0] = work[:len(indata)]
+    return process
+
+
+def _shaper_case(curve, oversample=1, drive=8.0):
+    def build(sample_rate, channels, blocksize):
+        shaper = Waveshaper(blocksize, oversample, curve)
+        work = np.zeros(blocksize, dtype=np.float32)
+
+        def process(indata, outdata):
+            shaper.process(indata[:, 0], drive, work[:len(indata)])
+            outdata[:, 0] = work[:len(indata)]
+        return process
+    return build
+
+
+def _channel_vocoder_case(bands):
+    def build(sample_rate, channels, blocksize):
+        vocoder = ChannelVocoder(sample_rate, blocksize, bands=bands)
+        vocoder.apply_plan(vocoder.plan(1.0, 120.0))
+        work = np.zeros(blocksize, dtype=np.float32)
+
+        def process(indata, outdata):
+            vocoder.process(indata[:, 0], work[:len(indata)])
+            outdata[:, 0] = work[:len(indata)]
+        return process
+    return build
+
+
+def _legacy_realtime_case(sample_rate, channels, blocksize):
+    # Imported lazily: voice_changer pulls in sounddevice
+    from voice_changer import apply_effects_realtime
+
+    def process(indata, outdata):
+        outdata[:] = apply_effects_realtime(indata.mean(axis=1))
+    return process
+
+
+# name -> factory(sample_rate, channels, blocksize) returning process(indata, outdata)
+BENCHMARKS = {
+    'notch': _notch_case,
+    'legacy_realtime': _legacy_realtime_case,
+    'shaper_tanh': _shaper_case('tanh'),
+    'shaper_table': _shaper_case('table'),
+    'shaper_tanh_2x': _shaper_case('tanh', 2),
+    'shaper_table_2x': _shaper_case('table', 2),
+    'shaper_tanh_4x': _shaper_case('tanh', 4),
+    'shaper_table_4x': _shaper_case('table', 4),
+    'channel_vocoder_16': _channel_vocoder_case(16),
+    'channel_vocoder_32': _channel_vocoder_case(32),
+    'engine_vocoder': _engine_case('vocoder'),
+    'engine_delay': _engine_case('delay'),
+    'engine_vocoder_multichannel': _engine_case('vocoder', multichannel=True),
+    'engine_delay_multichannel': _engine_case('delay', multichannel=True),
+    'engine_vocoder_16k': _engine_case('vocoder', internal_rate=16000),
+    'engine_delay_16k': _engine_case('delay', internal_rate=16000),
+    'engine_live': _engine_case('vocoder', **LIVE_OPTIONS),
+    'engine_live_robot': _engine_case('vocoder', BUILTIN_PRESETS['dot_matrix'], channel_vocoder=True,
+                                      **LIVE_OPTIONS),
+}
+
+
+def run_case(build, audio, sample_rate, blocksize, measure_allocations=True):
+    """Time one stage over audio block by block and return its statistics"""
+    channels = audio.shape[1]
+    process = build(sample_rate, channels, blocksize)
+    n_blocks = len(audio) // blocksize
+    outdata = np.zeros((blocksize, channels), dtype=np.float32)
+    durations = np.zeros(n_blocks)
+
+    # Warm up caches and FIFOs before timing
+    for i in range(min(4, n_blocks)):
+        process(audio[i * blocksize:(i + 1) * blocksize], outdata)
+
+    clock = time.perf_counter
+    for i in range(n_blocks):
+        block = audio[i * blocksize:(i + 1) * blocksize]
+        started = clock()
+        process(block, outdata)
+        durations[i] = clock() - started
+
+    budget = blocksize / sample_rate
+    result = {
+        'blocks': n_blocks,
+        'rtf': float(durations.sum() / (n_blocks * budget)),
+        'p50_ms': float(np.percentile(durations, 50) * 1000),
+        'p99_ms': float(np.percentile(durations, 99) * 1000),
+        'max_ms': float(durations.max() * 1000),
+    }
+
+    if measure_allocations:
+        # Separate pass: tracemalloc slows everything down, so it is not timed
+        peaks = []
+        tracemalloc.start()
+        for i in range(min(n_blocks, 64)):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            process(audio[i * blocksize:(i + 1) * blocksize], outdata)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+        result['alloc_kib_per_block'] = float(np.mean(peaks) / 1024)
+    return result
+
+
+def run_benchmarks(cases=None, configs=BENCH_CONFIGS, seconds=10.0, wav_paths=(), channels=2,
+                   measure_allocations=True):
+    """Run every case at every config; returns a list of result dicts"""
+    cases = cases or list(BENCHMARKS)
+    results = []
+    for sample_rate, blocksize in configs:
+        sources = [('synthetic', synthetic_voice(sample_rate, seconds, channels))]
+        sources += [(path, load_wav(path, sample_rate, channels)) for path in wav_paths]
+        for source, audio in sources:
+            for name in cases:
+                entry = {'case': name, 'source': source,
+                         'sample_rate': sample_rate, 'blocksize': blocksize}
+                try:
+                    entry.update(run_case(BENCHMARKS[name], audio, sample_rate, blocksize,
+                                          measure_allocations))
+                except (ImportError, OSError) as e:
+                    entry['skipped'] = str(e)
+                results.append(entry)
+    return results
+
+
+def print_results(results):
+    """Print a results table"""
+    print(f"{'case':<28} {'source':<12} {'rate':>6} {'block':>6} {'RTF':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'KiB/blk':>8}")
+    for r in results:
+        source = r['source'] if len(r['source']) <= 12 else '…' + r['source'][-11:]
+        prefix = f"{r['case']:<28} {source:<12} {r['sample_rate']:>6} {r['blocksize']:>6}"
+        if 'skipped' in r:
+            print(f"{prefix}  skipped: {r['skipped']}")
+            continue
+        alloc = r.get('alloc_kib_per_block', float('nan'))
+        print(f"{prefix} {r['rtf']:>7.3f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} "
+              f"{r['max_ms']:>8.3f} {alloc:>8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Dark Helmet realtime effect chain")
+    parser.add_argument('--case', action='append', choices=sorted(BENCHMARKS),
+                        help="Stage to benchmark (repeatable, default: all)")
+    parser.add_argument('--wav', action='append', default=[], help="Recorded WAV input (repeatable)")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Length of synthetic input")
+    parser.add_argument('--channels', type=int, default=2, help="Input/output channels")
+    parser.add_argument('--no-alloc', action='store_true', help="Skip the allocation pass")
+    parser.add_argument('--json', help="Write results to this JSON file")
+    parser.add_argument('--max-rtf', type=float,
+                        help="Exit non-zero if any case exceeds this real-time factor")
+    args = parser.parse_args(argv)
+
+    print("🎭 Dark Helmet Realtime Benchmark")
+    print("=" * 50)
+    results = run_benchmarks(args.case, seconds=args.seconds, wav_paths=args.wav,
+                             channels=args.channels, measure_allocations=not args.no_alloc)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results written to {args.json}")
+
+    if args.max_rtf is not None:
+        slow = [r for r in results if r.get('rtf', 0.0) > args.max_rtf]
+        if slow:
+            print(f"\n❌ {len(slow)} case(s) above RTF {args.max_rtf}")
+            return 1
+        print(f"\n✅ All cases below RTF {args.max_rtf}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Audio Callback Builder for Dark Helmet Voice Changer
+Builds the PortAudio callback once per stream, specialised for its channel layout
+"""
+
+import numpy as np
+
+
+def layout_processor(engine, in_channels, out_channels):
+    """Return process(indata, outdata) for one fixed channel layout
+
+    A mono engine's layout is a downmix, the chain and an upmix. Each is
+    chosen here rather than per block: mono input is used
+    as a view, stereo is summed into a preallocated buffer, and any
+    multichannel output is filled by broadcasting one preallocated
+    (frames, 1) column across it. Blocks are never longer than the
+    engine's stream_blocksize, which the stream is opened with. A multichannel
+    engine processes the stream's blocks directly.
+    """
+    blocksize = engine.stream_blocksize
+    mono_in = np.zeros(blocksize, dtype=np.float32)
+    column = np.zeros((blocksize, 1), dtype=np.float32)
+    process_block = engine.process_block
+    meter = engine.meter
+
+    if engine.multichannel:
+        # Every stage takes the (frames, channels) block as it is: no mixing at all
+        if (in_channels, out_channels) != (engine.channels, engine.channels):
+            raise ValueError(f"multichannel engine is {engine.channels} channels, "
+                             f"stream is {in_channels} in / {out_channels} out")
+        if meter is None:
+            return process_block
+        record = meter.record
+
+        def process(indata, outdata):
+            record(indata, process_block(indata, outdata))
+        return process
+
+    if in_channels == 1:
+        def downmix(indata):
+            return indata[:, 0]
+    elif in_channels == 2:
+        def downmix(indata):
+            mono = mono_in[:len(indata)]
+            np.add(indata[:, 0], indata[:, 1], out=mono)
+            mono *= 0.5
+            return mono
+    else:
+        def downmix(indata):
+            mono = mono_in[:len(indata)]
+            np.mean(indata, axis=1, out=mono)
+            return mono
+
+    if out_channels == 1:
+        def chain(indata, outdata):
+            mono = downmix(indata)
+            return mono, process_block(mono, outdata[:, 0])
+    else:
+        def chain(indata, outdata):
+            mono = downmix(indata)
+            out = column[:len(indata)]
+            processed = process_block(mono, out[:, 0])
+            np.copyto(outdata, out)  # (frames, 1) broadcasts across every output channel
+            return mono, processed
+
+    if meter is None:
+        def process(indata, outdata):
+            chain(indata, outdata)
+    else:
+        record = meter.record
+
+        def process(indata, outdata):
+            record(*chain(indata, outdata))
+    return process
+
+
+def snapshot_processor(engine, store, in_channels, out_channels):
+    """Return process(indata, outdata) that first adopts the store's latest snapshot"""
+    apply = engine.apply
+    process = layout_processor(engine, in_channels, out_channels)
+
+    def process_block(indata, outdata):
+        apply(store.snapshot.compiled)
+        process(indata, outdata)
+    return process_block
+
+
+def build_callback(engine, store, metrics, in_channels, out_channels, pipeline=None):
+    """Return the PortAudio callback for a configured stream
+
+    With a pipeline the callback only exchanges blocks with the DSP
+    thread, which must have been built on snapshot_processor(). Otherwise
+    the chain runs in the callback and its timing is recorded in metrics.
+    """
+    if pipeline is not None:
+        exchange = pipeline.callback
+
+        def pipelined_callback(indata, outdata, frames, time, status):
+            exchange(indata, outdata, status)
+        return pipelined_callback
+
+    process_block = snapshot_processor(engine, store, in_channels, out_channels)
+    clock = metrics.clock
+    record = metrics.record
+    record_error = metrics.record_error
+
+    def callback(indata, outdata, frames, time, status):
+        # No printing on the hot path: status flags are counted in metrics
+        started = clock()
+        try:
+            process_block(indata, outdata)
+            record(started, frames, status)
+        except Exception as e:
+            # Counted, not printed: a persistent fault would print every block
+            record_error(e)
+            outdata.fill(0)  # Silence rather than risk feedback
+    return callback
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Asyncio Control Server for Dark Helmet Voice Changer
+Small HTTP/1.1 server on the main event loop: keep-alive, cached static assets, ETag, gzip and WebSockets
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import urllib.parse
+from collections import namedtuple
+
+# Request limits: phones on the access point only ever send small JSON bodies
+MAX_HEADER_BYTES = 8192
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT = 30.0  # seconds a keep-alive connection may sit unused
+
+# Responses at least this large are gzipped when the client accepts it
+GZIP_MIN_BYTES = 512
+
+# WebSocket limits: messages are small JSON objects, and a phone that falls
+# this far behind just misses pushes rather than growing our buffers
+MAX_WS_MESSAGE_BYTES = 64 * 1024
+MAX_WS_BACKLOG_BYTES = 64 * 1024
+
+# RFC 6455 handshake key suffix and opcodes
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_CONTINUATION, WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+STATUS_TEXT = {
+    101: 'Switching Protocols', 200: 'OK', 304: 'Not Modified', 400: 'Bad Request',
+    404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+Request = namedtuple('Request', ['method', 'path', 'query', 'headers', 'body'])
+
+
+class Response:
+    """Status, body bytes and headers for one reply"""
+
+    def __init__(self, status=200, body=b'', content_type='text/plain', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = {'Content-Type': content_type}
+        self.headers.update(headers or {})
+
+    @classmethod
+    def json(cls, data, status=200):
+        return cls(status, json.dumps(data).encode(), 'application/json')
+
+
+def request_json(request):
+    """Decode a request body as a JSON object, or raise ValueError"""
+    data = json.loads(request.body.decode() or '{}')
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    return data
+
+
+class StaticAsset:
+    """A file held in memory with its ETag and gzipped form
+
+    The file is only re-read when its modification time changes, so
+    serving it costs a stat() rather than an SD card read per request.
+    """
+
+    def __init__(self, path, content_type):
+        self.path = path
+        self.content_type = content_type
+        self._mtime = None
+        self.body = b''
+        self.gzipped = None
+        self.etag = '""'
+
+    def refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with open(self.path, 'rb') as f:
+            self.body = f.read()
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+        compressed = gzip.compress(self.body, 9, mtime=0)
+        self.gzipped = compressed if len(compressed) < len(self.body) else None
+        self._mtime = mtime
+
+    def response(self, request):
+        try:
+            self.refresh()
+        except OSError:
+            return Response(404, b'Not Found')
+        headers = {'ETag': self.etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if self.etag in request.headers.get('if-none-match', ''):
+            return Response(304, b'', self.content_type, headers)
+        if self.gzipped is not None and 'gzip' in request.headers.get('accept-encoding', ''):
+            headers['Content-Encoding'] = 'gzip'
+            return Response(200, self.gzipped, self.content_type, headers)
+        return Response(200, self.body, self.content_type, headers)
+
+
+class WebSocket:
+    """Server side of one RFC 6455 connection
+
+    receive() is awaited by the connection's handler; send() never waits,
+    so a broadcaster can push to every client from one task. Frames to a
+    client whose socket backlog is over MAX_WS_BACKLOG_BYTES are dropped.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+        self.dropped = 0
+
+    @staticmethod
+    def frame(opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = bytes((0x80 | opcode, length))
+        elif length < 1 << 16:
+            header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+        else:
+            header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+        return header + payload
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = int.from_bytes(await self.reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await self.reader.readexactly(8), 'big')
+        if length > MAX_WS_MESSAGE_BYTES:
+            raise ValueError("WebSocket message too large")
+        mask = await self.reader.readexactly(4) if second & 0x80 else b''
+        payload = await self.reader.readexactly(length)
+        if mask and length:
+            # XOR the whole payload as one big integer instead of byte by byte
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        return bool(first & 0x80), first & 0x0F, payload
+
+    async def receive(self):
+        """Next text (str) or binary (bytes) message, or None once closed"""
+        message, kind = b'', None
+        while not self.closed:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                self.closed = True
+                break
+            if opcode == WS_PING:
+                self._write(WS_PONG, payload)
+            elif opcode == WS_CLOSE:
+                self._write(WS_CLOSE, payload[:2])
+                self.closed = True
+            elif opcode in (WS_TEXT, WS_BINARY, WS_CONTINUATION):
+                kind = opcode if opcode != WS_CONTINUATION else kind
+                message += payload
+                if len(message) > MAX_WS_MESSAGE_BYTES:
+                    self.closed = True
+                elif fin:
+                    if kind != WS_TEXT:
+                        return message
+                    try:
+                        return message.decode()
+                    except UnicodeDecodeError:
+                        self.close(1007)  # invalid frame payload data
+        return None
+
+    def _write(self, opcode, payload):
+        if self.writer.is_closing():
+            self.closed = True
+            return False
+        self.writer.write(self.frame(opcode, payload))
+        return True
+
+    def send(self, message):
+        """Queue a text (str) or binary (bytes) message; False if dropped"""
+        if self.closed:
+            return False
+        if self.writer.transport.get_write_buffer_size() > MAX_WS_BACKLOG_BYTES:
+            self.dropped += 1
+            return False
+        if isinstance(message, str):
+            return self._write(WS_TEXT, message.encode())
+        return self._write(WS_BINARY, message)
+
+    def send_json(self, data):
+        return self.send(json.dumps(data, separators=(',', ':')))
+
+    def close(self, code=1000):
+        if not self.closed:
+            self._write(WS_CLOSE, code.to_bytes(2, 'big'))
+            self.closed = True
+
+
+class ControlServer:
+    """Routes HTTP requests to plain functions on the running event loop
+
+    Every connection is a coroutine rather than a thread, so dozens of
+    phones polling the helmet cost a few sockets and no extra stacks.
+    Handlers take a Request and return a Response; they run on the loop,
+    so they must be quick (parameter compilation is a few milliseconds).
+    """
+
+    def __init__(self, host='0.0.0.0', port=8000):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self.websocket_routes = {}
+        self.websockets = set()
+        self.server = None
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    def websocket(self, path, handler):
+        """Serve WebSocket upgrades on path with `async handler(ws)`"""
+        self.websocket_routes[path] = handler
+
+    def static(self, path, file_path, content_type):
+        asset = StaticAsset(file_path, content_type)
+        self.route('GET', path, asset.response)
+        return asset
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        for ws in list(self.websockets):
+            ws.close()
+            ws.writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("headers too large")
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, version = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0'))
+        if length > MAX_BODY_BYTES:
+            raise OverflowError("body too large")
+        body = await reader.readexactly(length) if length else b''
+
+        url = urllib.parse.urlsplit(target)
+        query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return Request(method, url.path, query, headers, body), keep_alive
+
+    def dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            known = any(path == request.path for _, path in self.routes)
+            return Response(405 if known else 404, STATUS_TEXT[405 if known else 404].encode())
+        try:
+            return handler(request)
+        except (KeyError, TypeError, ValueError) as e:
+            # Malformed bodies (missing fields, wrong JSON types) are the client's fault
+            message = f"missing field {e}" if isinstance(e, KeyError) else str(e)
+            return Response.json({'status': 'error', 'message': message}, 400)
+        except Exception as e:
+            # A handler bug must not drop the connection without a reply
+            print(f"❌ {request.method} {request.path} failed: {e!r}")
+            return Response.json({'status': 'error', 'message': 'internal error'}, 500)
+
+    @staticmethod
+    def _encode(response, request, keep_alive):
+        body = response.body
+        headers = dict(response.headers)
+        accepts_gzip = request is not None and 'gzip' in request.headers.get('accept-encoding', '')
+        if len(body) >= GZIP_MIN_BYTES and accepts_gzip and 'Content-Encoding' not in headers:
+            body = gzip.compress(body, 5)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        headers['Content-Length'] = str(len(body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        lines = [f"HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request, keep_alive = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except OverflowError:
+                    writer.write(self._encode(Response(413, b'Payload Too Large'), None, False))
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(self._encode(Response(400, b'Bad Request'), None, False))
+                    break
+
+                if request.path in self.websocket_routes and \
+                        request.headers.get('upgrade', '').lower() == 'websocket':
+                    await self._serve_websocket(request, reader, writer)
+                    break
+
+                response = self.dispatch(request)
+                writer.write(self._encode(response, request, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _serve_websocket(self, request, reader, writer):
+        key = request.headers.get('sec-websocket-key', '')
+        if not key:
+            writer.write(self._encode(Response(400, b'Bad Request'), None, False))
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write((f"HTTP/1.1 101 {STATUS_TEXT[101]}\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        ws = WebSocket(reader, writer)
+        self.websockets.add(ws)
+        try:
+            await self.websocket_routes[request.path](ws)
+        finally:
+            self.websockets.discard(ws)
+            ws.close()
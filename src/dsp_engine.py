@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Streaming DSP Engine for Dark Helmet Voice Changer
+Keeps filter coefficients and effect state alive across audio callback blocks
+"""
+
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from callbacks import layout_processor
+from feedback import FeedbackSuppressor
+from gate import NoiseGate
+from pitch_shifter import FFT_SIZE, OVERLAP, PhaseVocoderPitchShifter
+from resampler import RateConverter
+from reverb import PartitionedConvolutionReverb
+from params import DEFAULT_PARAMS, EffectParams
+from smoothing import RAMP_TIME, SmoothedParam, channel_shape
+from startup import LazyModule
+from vocoder import VOCODER_FFT_SIZE, ChannelVocoder, RingModulator
+from waveshaper import Waveshaper
+
+# Imported on first use: scipy.signal alone takes seconds to load on a Pi Zero
+signal = LazyModule('scipy.signal')
+
+# Fixed notch defaults (previously hardcoded in the callbacks)
+NOTCH_FREQ = 1000.0  # Hz
+NOTCH_Q = 30.0
+
+# Delay-line pitch shifter window (seconds)
+PITCH_WINDOW = 0.04
+
+# Pitch changes glide over this long, one precompiled plan per block (seconds)
+PITCH_GLIDE_TIME = 0.1
+
+# Longest glide compile() accepts: each block of glide is a plan held in memory (seconds)
+MAX_GLIDE_TIME = 10.0
+
+# FFT sizes are tuned for this rate; an internal rate scales them to keep the frame duration
+REFERENCE_RATE = 44100
+
+
+class NotchFilter:
+    """Second-order notch with persistent lfilter state; a frequency of 0 bypasses it
+
+    With channels set it filters (frames, channels) blocks along axis 0,
+    keeping separate state per channel.
+    """
+
+    def __init__(self, sample_rate, freq=NOTCH_FREQ, q=NOTCH_Q, channels=None):
+        self.sample_rate = sample_rate
+        self.zi = np.zeros((2,) + channel_shape(channels), dtype=np.float32)
+        self._lfilter = signal.lfilter  # resolved once, not per block
+        self.design(freq, q)
+
+    def plan(self, freq, q):
+        """Design coefficients for freq/q without touching the running filter"""
+        if freq <= 0:
+            return freq, q, None, None
+        b, a = signal.iirnotch(freq / (self.sample_rate / 2), q)
+        # float32 coefficients keep lfilter in single precision like the stream
+        return freq, q, b.astype(np.float32), a.astype(np.float32)
+
+    def apply_plan(self, plan):
+        """Switch coefficients, keeping the filter state"""
+        self.freq, self.q, self.b, self.a = plan
+
+    def design(self, freq, q):
+        self.apply_plan(self.plan(freq, q))
+
+    def reset(self):
+        self.zi[:] = 0.0
+
+    def process(self, block, out):
+        """Filter block into out (lfilter has no out= so its result is copied)"""
+        if self.b is None:
+            if out is not block:
+                out[:] = block
+            return out
+        filtered, self.zi = self._lfilter(self.b, self.a, block, axis=0, zi=self.zi)
+        out[:] = filtered
+        return out
+
+
+class DelayLinePitchShifter:
+    """Two-tap rotating delay line pitch shifter with sin^2 crossfade
+
+    Tap positions and gains are computed once per block and shared by all
+    channels when it runs on (frames, channels) blocks.
+    """
+
+    def __init__(self, sample_rate, blocksize, window=PITCH_WINDOW, channels=None):
+        self.window = max(int(window * sample_rate), 64)
+        self._shape = channel_shape(channels)
+        # Indexes a per-sample vector so it broadcasts along the channel axis
+        self._column = (slice(None),) + (None,) * len(self._shape)
+        self.latency = self.window // 2  # average; the taps sweep 0..window
+        self.write_pos = 0
+        self.phase = 0.0
+        self.ratio = 1.0
+        self.allocate(blocksize)
+
+    def allocate(self, blocksize):
+        """Size the delay line and every work buffer for blocks up to blocksize"""
+        self.blocksize = blocksize
+        self.size = self.window + blocksize + 2
+        self.buffer = np.zeros((self.size,) + self._shape, dtype=np.float32)
+        self.write_pos = 0
+        self._ramp = np.arange(blocksize, dtype=np.float64)
+        self._phases = np.empty(blocksize, dtype=np.float64)
+        self._tap_phase = np.empty(blocksize, dtype=np.float64)
+        self._read = np.empty(blocksize, dtype=np.float64)
+        self._frac = np.empty(blocksize, dtype=np.float64)
+        self._i0 = np.empty(blocksize, dtype=np.int64)
+        self._i1 = np.empty(blocksize, dtype=np.int64)
+        self._tap0 = np.empty((blocksize,) + self._shape, dtype=np.float32)
+        self._tap1 = np.empty((blocksize,) + self._shape, dtype=np.float32)
+        self._gain = np.empty(blocksize, dtype=np.float32)
+
+    def plan(self, semitones):
+        """Derive the pitch ratio for a shift"""
+        if not math.isfinite(semitones):
+            raise ValueError(f"pitch shift must be finite, not {semitones!r}")
+        return 2.0 ** (semitones / 12.0)
+
+    def apply_plan(self, plan):
+        self.ratio = plan
+
+    def set_semitones(self, semitones):
+        self.apply_plan(self.plan(semitones))
+
+    def reset(self):
+        self.buffer[:] = 0.0
+        self.phase = 0.0
+
+    def _write(self, block):
+        """Copy block into the ring at write_pos using at most two slices"""
+        frames = len(block)
+        first = min(frames, self.size - self.write_pos)
+        self.buffer[self.write_pos:self.write_pos + first] = block[:first]
+        self.buffer[:frames - first] = block[first:]
+
+    def process(self, block, out):
+        """Pitch shift block into out; out may be the same array as block"""
+        frames = len(block)
+        if frames > self.blocksize:
+            # PortAudio delivered a longer block than configured: resize once
+            self.allocate(frames)
+
+        self._write(block)
+        if self.ratio == 1.0:
+            # Keep the delay line primed so a later shift starts cleanly
+            self.write_pos = (self.write_pos + frames) % self.size
+            if out is not block:
+                out[:] = block
+            return out
+
+        step = (1.0 - self.ratio) / self.window
+        ramp = self._ramp[:frames]
+        phases = self._phases[:frames]
+        tap_phase = self._tap_phase[:frames]
+        read = self._read[:frames]
+        frac = self._frac[:frames]
+        i0 = self._i0[:frames]
+        i1 = self._i1[:frames]
+        tap0 = self._tap0[:frames]
+        tap1 = self._tap1[:frames]
+        gain = self._gain[:frames]
+
+        np.multiply(ramp, step, out=phases)
+        phases += self.phase
+        self.phase = (self.phase + step * frames) % 1.0
+
+        out[:] = 0.0
+        for offset in (0.0, 0.5):
+            np.add(phases, offset, out=tap_phase)
+            np.remainder(tap_phase, 1.0, out=tap_phase)
+
+            # Fractional read position behind the write head
+            np.multiply(tap_phase, -self.window, out=read)
+            read += ramp
+            read += self.write_pos
+            np.floor(read, out=frac)
+            np.copyto(i0, frac, casting='unsafe')
+            np.subtract(read, frac, out=frac)
+            np.remainder(i0, self.size, out=i0)
+            np.add(i0, 1, out=i1)
+            np.remainder(i1, self.size, out=i1)
+
+            # Linear interpolation between neighbouring samples
+            np.take(self.buffer, i0, axis=0, out=tap0)
+            np.take(self.buffer, i1, axis=0, out=tap1)
+            tap1 -= tap0
+            tap1 *= frac[self._column]
+            tap0 += tap1
+
+            # sin^2 crossfade: the two taps always sum to unity gain
+            np.multiply(tap_phase, np.pi, out=gain, casting='unsafe')
+            np.sin(gain, out=gain)
+            np.square(gain, out=gain)
+            tap0 *= gain[self._column]
+            out += tap0
+
+        self.write_pos = (self.write_pos + frames) % self.size
+        return out
+
+
+# Parameters plus the DSP state derived from them, built off the audio thread
+CompiledParams = namedtuple('CompiledParams', ['params', 'notch', 'pitch', 'reverb', 'pitch_stage', 'quality',
+                                               'channel_vocoder', 'ring'])
+
+# Effect quality an engine runs at (fft_size is the phase vocoder pitch shifter's; None for the delay line)
+Quality = namedtuple('Quality', ['pitch_algorithm', 'fft_size', 'reverb'])
+
+# Streaming pitch shifters selectable per engine
+PITCH_ALGORITHMS = {
+    'vocoder': PhaseVocoderPitchShifter,
+    'delay': DelayLinePitchShifter,
+}
+
+
+class DSPEngine:
+    """Stateful voice chain: notch -> pitch -> robot -> distortion -> reverb -> volume
+
+    With feedback=True an adaptive FeedbackSuppressor notches howl
+    frequencies found in the output out of the input, after the fixed notch.
+    With channel_vocoder=True a ChannelVocoder follows the pitch shifter;
+    it adds its fixed latency even at vocoder_mix 0, so the mix can be
+    changed live without a jump, but skips its transforms while the mix is
+    0. The RingModulator after it costs nothing while ring_mix is 0.
+    With gate=True a NoiseGate skips everything up to the reverb while the
+    wearer is silent; the reverb is fed silence so its tail rings out, and
+    is skipped too once the tail has fully decayed.
+
+    By default blocks are downmixed to mono and the result is copied to
+    every output channel. With multichannel=True every stage instead keeps
+    per-channel state and processes (frames, channels) blocks as one 2-D
+    array, broadcasting along axis 1, so stereo costs far less than twice
+    mono and needs no downmix or duplicate copies.
+
+    Distortion is a Waveshaper: waveshaper picks numpy's tanh or a lookup
+    table, and oversample=2 or 4 runs it at a multiple of the rate so
+    strong drive does not alias. An oversampled shaper stays in the chain
+    at drive 1 so its filter delay (part of latency) never changes.
+
+    With internal_rate set, every stage runs at that rate whatever the
+    stream's: each block is decimated by a streaming polyphase resampler,
+    processed, and interpolated back, so the chain sounds the same at
+    22.05 or 48 kHz and speech-band DSP costs less at high stream rates.
+    sample_rate and blocksize are then the internal ones; stream_rate and
+    stream_blocksize describe the blocks process() is given. FFT sizes
+    (including Quality.fft_size) are then scaled from REFERENCE_RATE to the
+    internal rate, so frames last as long as at 44.1 kHz and the latency
+    stays what it is without resampling plus the resamplers' own.
+
+    All intermediate buffers are sized once from blocksize/channels, and
+    every stage writes in place. Steady-state allocations remain where
+    numpy offers no out=: lfilter's result, and in the phase vocoder the
+    rFFT/irFFT results and the peak-region bookkeeping (about 270 KiB per
+    1024-sample mono block, against about 20 KiB with the delay line).
+    """
+
+    def __init__(self, sample_rate, channels, blocksize, pitch_algorithm='vocoder',
+                 ramp_time=RAMP_TIME, feedback=False, gate=False, multichannel=False,
+                 internal_rate=None, oversample=1, waveshaper='tanh', channel_vocoder=False):
+        self.stream_rate = sample_rate
+        self.stream_blocksize = blocksize
+        self.channels = channels
+        self.multichannel = multichannel
+        # Channel count handed to every stage; None keeps them on 1-D mono blocks
+        self._stage_channels = channels if multichannel else None
+        stage_channels = self._stage_channels
+        self.resampler = None
+        if internal_rate and internal_rate != sample_rate:
+            self.resampler = RateConverter(sample_rate, internal_rate, blocksize, stage_channels)
+            sample_rate = self.resampler.internal_rate
+            blocksize = self.resampler.internal_blocksize
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.notch = NotchFilter(sample_rate, DEFAULT_PARAMS.notch_freq, DEFAULT_PARAMS.notch_q,
+                                 channels=stage_channels)
+        self.feedback = (FeedbackSuppressor(sample_rate, blocksize, channels=stage_channels)
+                         if feedback else None)
+        self.gate = NoiseGate(sample_rate, blocksize, channels=stage_channels) if gate else None
+        self._gated_samples = 0
+        self.quality = Quality(pitch_algorithm, FFT_SIZE if pitch_algorithm == 'vocoder' else None, True)
+        self.requested_quality = self.quality
+        self.pitch = self._build_pitch(self.quality)
+        self.reverb = PartitionedConvolutionReverb(sample_rate, blocksize, ramp_time=ramp_time,
+                                                   channels=stage_channels)
+        self.channel_vocoder = (ChannelVocoder(sample_rate, blocksize,
+                                               fft_size=self._frame_size(VOCODER_FFT_SIZE),
+                                               channels=stage_channels) if channel_vocoder else None)
+        self.ring = RingModulator(sample_rate, blocksize, ramp_time, stage_channels)
+        self.compiled = None
+
+        # Gain-like parameters ramp per sample; pitch glides per block
+        ramp_samples = ramp_time * sample_rate
+        self.distortion = SmoothedParam(1.0, ramp_samples, blocksize, stage_channels)
+        self.shaper = Waveshaper(blocksize, oversample, waveshaper, stage_channels)
+        self.volume = SmoothedParam(1.0, ramp_samples, blocksize, stage_channels)
+        self.glide_blocks = max(int(round(PITCH_GLIDE_TIME * sample_rate / blocksize)), 1)
+        self._compiled_quality = self.quality
+        self._compiled_pitch = self.pitch
+        self._pitch_glide = ()
+        self._glide_index = 0
+        self.meter = None  # optional LevelMeter fed from process()
+        self._layouts = {}  # (in_channels, out_channels, meter) -> process() for that layout
+        self.allocate(blocksize)
+
+    def allocate(self, blocksize):
+        """Preallocate the work buffer for blocks of the internal rate"""
+        self.blocksize = blocksize
+        self._work = np.zeros((blocksize,) + channel_shape(self._stage_channels), dtype=np.float32)
+
+    @property
+    def latency(self):
+        """Processing latency added by the chain, in stream samples"""
+        latency = self.pitch.latency + self.shaper.latency
+        if self.channel_vocoder is not None:
+            latency += self.channel_vocoder.latency
+        if self.resampler is None:
+            return latency
+        scale = self.stream_rate / self.sample_rate
+        return int(round(latency * scale)) + self.resampler.latency
+
+    @property
+    def pitch_algorithm(self):
+        return self.quality.pitch_algorithm
+
+    def _frame_size(self, fft_size):
+        """FFT size for this engine's rate: fft_size at REFERENCE_RATE, rounded to whole hops"""
+        if self.resampler is None:
+            return fft_size
+        return max(int(round(fft_size * self.sample_rate / REFERENCE_RATE / OVERLAP)), 1) * OVERLAP
+
+    def _build_pitch(self, quality):
+        """Construct a pitch shifter for a quality setting (allocates; not for the audio thread)"""
+        options = {'fft_size': self._frame_size(quality.fft_size)} if quality.fft_size else {}
+        return PITCH_ALGORITHMS[quality.pitch_algorithm](self.sample_rate, self.blocksize,
+                                                         channels=self._stage_channels, **options)
+
+    def compile(self, params, previous=None, glide_time=PITCH_GLIDE_TIME):
+        """Derive coefficients and tables for params without touching live state
+
+        The pitch entry is a glide: one plan per block from the previous
+        parameters' shift to the new one, so the audio thread only steps
+        through ready-made plans. Without previous it is a single plan (an
+        instant switch). If requested_quality asks for a different pitch
+        algorithm or FFT size, the new pitch shifter is built here too and
+        swapped in by apply(); a reverb-only quality change keeps the running
+        shifter and its buffered audio.
+        """
+        if not 0.0 <= glide_time <= MAX_GLIDE_TIME:
+            raise ValueError(f"glide_time must be between 0 and {MAX_GLIDE_TIME:g} seconds")
+        quality = self.requested_quality
+        previous_quality = self._compiled_quality
+        if quality[:2] != previous_quality[:2]:  # (pitch_algorithm, fft_size)
+            self._compiled_pitch = self._build_pitch(quality)
+        self._compiled_quality = quality
+        pitch = self._compiled_pitch
+
+        end = params.pitch_shift * 12
+        start = previous.pitch_shift * 12 if previous is not None else end
+        glide_blocks = max(int(round(glide_time * self.sample_rate / self.blocksize)), 1)
+        steps = np.linspace(start, end, glide_blocks + 1)[1:] if end != start else (end,)
+        notch = self.notch.plan(params.notch_freq, params.notch_q)
+        room_size = params.reverb_room_size if quality.reverb else 0.0
+        channel_vocoder = (self.channel_vocoder.plan(params.vocoder_mix, params.vocoder_pitch)
+                           if self.channel_vocoder is not None else None)
+        return CompiledParams(params, notch,
+                              tuple(pitch.plan(semitones) for semitones in steps),
+                              self.reverb.plan(room_size), pitch, quality,
+                              channel_vocoder, self.ring.plan(params.ring_mix, params.ring_freq))
+
+    def is_current(self, compiled):
+        """Whether compiled was built for the requested quality and the live pitch stage"""
+        return compiled.quality == self.requested_quality and compiled.pitch_stage is self._compiled_pitch
+
+    def apply(self, compiled):
+        """Adopt precompiled parameters; cheap enough for the audio callback"""
+        if compiled is self.compiled:
+            return
+        if compiled.pitch_stage is not self.pitch:
+            self.pitch = compiled.pitch_stage
+        self.quality = compiled.quality
+        self.notch.apply_plan(compiled.notch)
+        self._pitch_glide = compiled.pitch
+        self._glide_index = 0
+        self.reverb.apply_plan(compiled.reverb)
+        if self.channel_vocoder is not None:
+            self.channel_vocoder.apply_plan(compiled.channel_vocoder)
+        self.ring.apply_plan(compiled.ring)
+        self.distortion.set_target(max(compiled.params.distortion_gain, 1.0))
+        self.volume.set_target(compiled.params.volume)
+        self.compiled = compiled
+
+    def set_params(self, pitch_shift, distortion_gain, reverb_room_size, volume,
+                   notch_freq=DEFAULT_PARAMS.notch_freq, notch_q=DEFAULT_PARAMS.notch_q,
+                   vocoder_mix=DEFAULT_PARAMS.vocoder_mix, vocoder_pitch=DEFAULT_PARAMS.vocoder_pitch,
+                   ring_mix=DEFAULT_PARAMS.ring_mix, ring_freq=DEFAULT_PARAMS.ring_freq):
+        """Compile and apply parameters in one step (offline use and tests)"""
+        params = EffectParams(pitch_shift, distortion_gain, reverb_room_size, volume, notch_freq, notch_q,
+                              vocoder_mix, vocoder_pitch, ring_mix, ring_freq)
+        previous = self.compiled.params if self.compiled is not None else None
+        if params == previous:
+            return
+        self.apply(self.compile(params, previous))
+
+    def reset(self):
+        """Clear all carried state (e.g. after a stream restart)"""
+        self.notch.reset()
+        if self.feedback is not None:
+            self.feedback.reset()
+        self.pitch.reset()
+        if self.channel_vocoder is not None:
+            self.channel_vocoder.reset()
+        self.ring.reset()
+        self.shaper.reset()
+        self.reverb.reset()
+        if self.resampler is not None:
+            self.resampler.reset()
+
+    def process_block(self, mono, out=None):
+        """Run one block through the chain into out (a work buffer by default)
+
+        Blocks are 1-D mono, or (frames, channels) for a multichannel engine.
+        """
+        if self.resampler is not None:
+            return self.resampler.process(mono, out, self._process_internal)
+        return self._process_internal(mono, out)
+
+    def _process_internal(self, mono, out=None):
+        frames = len(mono)
+        if frames > self.blocksize:
+            self.allocate(frames)
+        if out is None:
+            out = self._work[:frames]
+
+        if self._glide_index < len(self._pitch_glide):
+            self.pitch.apply_plan(self._pitch_glide[self._glide_index])
+            self._glide_index += 1
+
+        if self.gate is not None:
+            started = time.perf_counter()
+            is_open = self.gate.update(mono)
+            if not is_open:
+                self._process_gated(out)
+            else:
+                self._gated_samples = 0
+                self._process_chain(mono, out)
+            self.gate.record(is_open, time.perf_counter() - started)
+            return out
+        return self._process_chain(mono, out)
+
+    def _process_gated(self, out):
+        """Silence in place of the voice; only the reverb tail and ramps keep moving"""
+        frames = len(out)
+        out[:] = 0.0
+        self.ring.mix.next_block(frames)
+        self.distortion.next_block(frames)
+        if self._gated_samples < self.reverb.tail_samples:
+            self._gated_samples += frames
+            self.reverb.process(out, out)
+            out *= self.volume.next_block(frames)
+        else:
+            self.volume.next_block(frames)
+        return out
+
+    def _process_chain(self, mono, out):
+        frames = len(mono)
+        self.notch.process(mono, out)
+        if self.feedback is not None:
+            self.feedback.process(out, out)
+        self.pitch.process(out, out)
+        if self.channel_vocoder is not None:
+            self.channel_vocoder.process(out, out)
+        if self.ring.active:
+            self.ring.process(out, out)
+        distorting = self.distortion.ramping or self.distortion.value > 1.0
+        drive = self.distortion.next_block(frames)
+        if distorting or self.shaper.oversample > 1:
+            self.shaper.process(out, drive if distorting else None, out)
+        self.reverb.process(out, out)
+        out *= self.volume.next_block(frames)
+        if self.feedback is not None:
+            self.feedback.analyse(out)
+        return out
+
+    def process(self, indata, outdata):
+        """Process a (frames, channels) block from indata into outdata
+
+        For offline use: runs the same layout_processor the stream
+        callbacks are built on (one per channel layout and meter), in
+        pieces of at most stream_blocksize frames.
+        """
+        key = (indata.shape[1], outdata.shape[1], self.meter)
+        process = self._layouts.get(key)
+        if process is None:
+            process = self._layouts[key] = layout_processor(self, indata.shape[1], outdata.shape[1])
+        step = self.stream_blocksize
+        for start in range(0, len(indata), step):
+            process(indata[start:start + step], outdata[start:start + step])
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Native Effect Chain for Dark Helmet Voice Changer
+Array-in/array-out pitch, overdrive, reverb and volume with no disk I/O or subprocesses
+"""
+
+import numpy as np
+
+from startup import LazyModule
+
+# Imported on first use to keep startup fast
+signal = LazyModule('scipy.signal')
+
+# Phase vocoder analysis settings for the offline pitch shifter
+PV_FFT_SIZE = 1024
+PV_HOP_SIZE = 256
+
+# Overdrive colour used by SoX when none is given
+OVERDRIVE_COLOUR = 20.0
+
+
+def _as_mono(audio):
+    """Return a float32 mono copy of a (frames,) or (frames, channels) array"""
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1)
+    return audio
+
+
+def _lobes(magnitude):
+    """Peak bins of a magnitude spectrum and, for every bin, the peak whose lobe it is in
+
+    Lobes are split at the lowest bin between neighbouring peaks.
+    """
+    interior = (magnitude[1:-1] > magnitude[:-2]) & (magnitude[1:-1] >= magnitude[2:])
+    peaks = np.flatnonzero(interior) + 1
+    if len(peaks) < 2:
+        peaks = peaks if len(peaks) else np.array([np.argmax(magnitude)])
+        return peaks, np.full(len(magnitude), peaks[0])
+    span = magnitude[peaks[0]:peaks[-1]]
+    segment = np.repeat(np.arange(len(peaks) - 1), np.diff(peaks))
+    lows = np.minimum.reduceat(span, peaks[:-1] - peaks[0])
+    at_low = np.flatnonzero(span == lows[segment])
+    _, first = np.unique(segment[at_low], return_index=True)
+    troughs = at_low[first] + peaks[0]
+    return peaks, peaks[np.searchsorted(troughs, np.arange(len(magnitude)), side='right')]
+
+
+def _time_stretch(audio, rate):
+    """Phase vocoder time stretch: rate > 1 makes the audio shorter"""
+    window = np.hanning(PV_FFT_SIZE).astype(np.float32)
+    padded = np.pad(audio, (PV_FFT_SIZE, PV_FFT_SIZE))
+    n_frames = 1 + (len(padded) - PV_FFT_SIZE) // PV_HOP_SIZE
+    frames = np.lib.stride_tricks.sliding_window_view(padded, PV_FFT_SIZE)[::PV_HOP_SIZE][:n_frames]
+    spectrum = np.fft.rfft(frames * window, axis=1)
+
+    # Interpolate magnitudes at fractional frame positions
+    positions = np.arange(0, n_frames - 1, rate)
+    index = positions.astype(np.int64)
+    frac = (positions - index)[:, None]
+    magnitude = (1.0 - frac) * np.abs(spectrum[index]) + frac * np.abs(spectrum[index + 1])
+    analysis_phase = np.angle(spectrum)
+
+    # True phase advance per hop of every bin between the neighbouring analysis frames
+    bins = np.arange(PV_FFT_SIZE // 2 + 1)
+    expected = 2.0 * np.pi * PV_HOP_SIZE * bins / PV_FFT_SIZE
+    delta = analysis_phase[index + 1] - analysis_phase[index] - expected
+    delta -= 2.0 * np.pi * np.round(delta / (2.0 * np.pi))
+    increment = expected + delta
+
+    # Identity phase locking: only spectral peaks accumulate phase; the other
+    # bins of each peak's lobe keep their analysed offset from it, so a
+    # partial's main lobe stays coherent instead of drifting apart
+    phase = np.zeros_like(magnitude)
+    previous = None
+    floor = 1e-9 * np.max(magnitude, initial=0.0)
+    for m in range(len(magnitude)):
+        frame = magnitude[m]
+        source = analysis_phase[index[m]]
+        if previous is None or frame.max() <= floor:
+            # Seed from the first frame that holds signal (the padding is silent)
+            phase[m] = source
+            previous = source if frame.max() > floor else None
+            continue
+        peaks, owner = _lobes(frame)
+        peak_phase = previous[peaks] + increment[m - 1, peaks]
+        locked = np.empty_like(source)
+        locked[peaks] = peak_phase
+        phase[m] = locked[owner] + source - source[owner]
+        previous = phase[m]
+
+    frames_out = np.fft.irfft(magnitude * np.exp(1j * phase), n=PV_FFT_SIZE, axis=1) * window
+    out_length = PV_HOP_SIZE * (len(frames_out) - 1) + PV_FFT_SIZE
+    output = np.zeros(out_length)
+    norm = np.zeros(out_length)
+    for i, frame in enumerate(frames_out):
+        start = i * PV_HOP_SIZE
+        output[start:start + PV_FFT_SIZE] += frame
+        norm[start:start + PV_FFT_SIZE] += window ** 2
+    output /= np.maximum(norm, 1e-6)
+    return output[int(round(PV_FFT_SIZE / rate)):]
+
+
+def pitch_shift(audio, semitones):
+    """Shift pitch by a number of semitones while keeping the duration"""
+    audio = _as_mono(audio)
+    if semitones == 0 or len(audio) == 0:
+        return audio.copy()
+
+    ratio = 2.0 ** (semitones / 12.0)
+    stretched = _time_stretch(audio, 1.0 / ratio)
+
+    # Resample the stretched signal back to the original length
+    positions = np.arange(len(audio)) * ratio
+    shifted = np.interp(positions, np.arange(len(stretched)), stretched, right=0.0)
+    return shifted.astype(np.float32)
+
+
+def overdrive(audio, gain_db, colour=OVERDRIVE_COLOUR):
+    """SoX-style overdrive: gain, cubic soft clip, then DC blocking"""
+    audio = _as_mono(audio)
+    driven = audio * (10.0 ** (gain_db / 20.0)) + colour / 200.0
+    clipped = np.clip(driven, -1.0, 1.0)
+    clipped = clipped - clipped ** 3 / 3.0
+
+    # One-pole DC blocker removes the offset added by the colour term
+    return signal.lfilter([1.0, -1.0], [1.0, -0.995], clipped).astype(np.float32)
+
+
+def helmet_impulse_response(sample_rate, room_size, seed=0):
+    """Synthetic impulse response of a small enclosed helmet"""
+    room_size = float(np.clip(room_size, 0.0, 1.0))
+    rt60 = 0.05 + 0.45 * room_size  # seconds
+    length = max(int(rt60 * sample_rate), 1)
+
+    # Exponentially decaying noise tail (60 dB at rt60)
+    rng = np.random.default_rng(seed)
+    t = np.arange(length) / sample_rate
+    tail = rng.standard_normal(length) * np.exp(-6.9078 * t / rt60)
+
+    # A few strong early reflections off the visor
+    for delay_ms, gain in ((1.3, 0.6), (2.9, -0.45), (4.7, 0.3)):
+        tap = int(delay_ms * 1e-3 * sample_rate)
+        if tap < length:
+            tail[tap] += gain
+
+    tail[0] = 0.0
+    tail /= max(np.sqrt(np.sum(tail ** 2)), 1e-9)
+    return tail.astype(np.float32)
+
+
+def reverb(audio, sample_rate, room_size, wet_gain=0.35):
+    """Helmet reverb by convolution, dry signal kept (wet_only=False)"""
+    audio = _as_mono(audio)
+    if room_size <= 0 or len(audio) == 0:
+        return audio.copy()
+    ir = helmet_impulse_response(sample_rate, room_size)
+    wet = signal.fftconvolve(audio, ir)[:len(audio)]
+    return (audio + wet_gain * room_size * wet).astype(np.float32)
+
+
+def apply_volume(audio, volume):
+    """Scale audio by a linear volume factor"""
+    return (_as_mono(audio) * volume).astype(np.float32)
+
+
+def apply_effect_chain(audio, sample_rate, pitch_shift_octaves, distortion_gain,
+                       reverb_room_size, volume):
+    """Run the full Dark Helmet chain (pitch, overdrive, reverb, volume) in memory"""
+    processed = pitch_shift(audio, pitch_shift_octaves * 12)
+    processed = overdrive(processed, distortion_gain)
+    processed = reverb(processed, sample_rate, reverb_room_size)
+    return apply_volume(processed, volume)
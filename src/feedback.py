@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Adaptive Feedback Suppressor for Dark Helmet Voice Changer
+Finds howl frequencies in the output and places cascaded notches on them
+"""
+
+import math
+import time
+
+import numpy as np
+
+from smoothing import channel_shape
+from startup import LazyModule
+
+signal = LazyModule('scipy.signal')
+
+# Notch slots; every slot is one second-order section of the cascade
+MAX_NOTCHES = 4
+NOTCH_Q = 20.0             # Narrow enough to leave the voice around it alone
+NOTCH_DEPTH_DB = -12.0     # Cut when a howl is first found
+NOTCH_STEP_DB = -6.0       # Extra cut each time it is found again
+NOTCH_MAX_DEPTH_DB = -36.0
+
+# Howl detection on a decimated copy of the output
+DECIMATION = 2             # Pairs of samples averaged: analysis covers up to fs/4
+ANALYSIS_SIZE = 1024       # Decimated samples per FFT (~21.5 Hz bins at 44.1 kHz)
+ANALYSIS_INTERVAL = 2      # Blocks between analyses when within budget
+MAX_ANALYSIS_INTERVAL = 16
+MIN_HOWL_FREQ = 200.0      # Hz; below this it is voice or rumble, not ringing
+HOWL_LEVEL_DB = -30.0      # Peak level (dBFS) a howl must reach
+HOWL_PROMINENCE_DB = 25.0  # How far the peak must stand above the median bin
+HOWL_PERSISTENCE = 4       # Consecutive analyses the same peak must survive
+HOWL_TOLERANCE = 0.03      # Relative frequency difference counted as the same peak
+
+# Notches not re-detected for this long fade out and free their slot
+RELEASE_TIME = 5.0         # seconds
+RELEASE_STEP_DB = 1.0      # dB of cut removed per analysis while releasing
+
+# Share of the block period the suppressor may use before it analyses less often
+CPU_BUDGET = 0.05
+
+# Pass-through second-order section for unused slots
+IDENTITY_SECTION = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def peaking_section(freq, gain_db, q, sample_rate):
+    """Second-order peaking EQ section (RBJ cookbook); negative gain cuts"""
+    amplitude = 10.0 ** (gain_db / 40.0)
+    w0 = 2.0 * math.pi * freq / sample_rate
+    alpha = math.sin(w0) / (2.0 * q)
+    cos_w0 = math.cos(w0)
+    a0 = 1.0 + alpha / amplitude
+    return ((1.0 + alpha * amplitude) / a0, -2.0 * cos_w0 / a0, (1.0 - alpha * amplitude) / a0,
+            1.0, -2.0 * cos_w0 / a0, (1.0 - alpha / amplitude) / a0)
+
+
+class FeedbackSuppressor:
+    """Tracks howling in the output and notches it out of the input
+
+    process() runs the notch cascade on the incoming block: one sosfilt
+    call over MAX_NOTCHES sections with persistent state, skipped entirely
+    while no notch is active. analyse() is fed the finished output block;
+    it decimates it into a history buffer and, every few blocks, looks for
+    a narrow, loud, persistent spectral peak. A peak that survives
+    HOWL_PERSISTENCE analyses gets a notch (or deepens an existing one);
+    notches that stop being needed are released gradually.
+
+    Its own processing time is measured every block. When the average
+    exceeds CPU_BUDGET of the block period the analysis interval doubles,
+    and it is halved again once there is room, so the suppressor never
+    takes more than its share of the callback.
+
+    With channels set it filters (frames, channels) blocks with state per
+    channel and looks for howling in their average.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, sample_rate, blocksize, max_notches=MAX_NOTCHES, budget=CPU_BUDGET,
+                 channels=None):
+        self.sample_rate = sample_rate
+        self._shape = channel_shape(channels)
+        self.analysis_rate = sample_rate / DECIMATION
+        self.budget = budget
+        self.sos = np.array([IDENTITY_SECTION] * max_notches)
+        self.zi = np.zeros((max_notches, 2) + self._shape)
+        self.freqs = np.zeros(max_notches)      # 0 marks a free slot
+        self.depths = np.zeros(max_notches)     # dB, negative while active
+        self.last_seen = np.zeros(max_notches)  # seconds of audio at last detection
+        self._sosfilt = signal.sosfilt  # resolved once, not per block
+
+        self._history = np.zeros(ANALYSIS_SIZE)
+        self._window = np.hanning(ANALYSIS_SIZE)
+        # Scale so a full-scale sine reads 0 dBFS at its peak bin
+        self._window_gain = 2.0 / self._window.sum()
+        self._min_bin = int(MIN_HOWL_FREQ * ANALYSIS_SIZE / self.analysis_rate)
+        self._decimated = np.zeros((blocksize // DECIMATION + 1,) + self._shape)
+        self._mixed = np.zeros(blocksize // DECIMATION + 1)
+        self._candidate = 0.0
+        self._candidate_count = 0
+
+        self.interval = ANALYSIS_INTERVAL
+        self._until_analysis = self.interval
+        self.elapsed = 0.0        # seconds of audio seen
+        self.blocks = 0
+        self.analyses = 0
+        self.detections = 0
+        self.cost_total = 0.0     # seconds spent in process() and analyse()
+        self.load = 0.0           # recent cost as a fraction of the block period
+        self._pending_cost = 0.0
+
+    @property
+    def active(self):
+        return int(np.count_nonzero(self.freqs))
+
+    def reset(self):
+        self.zi[:] = 0.0
+        self._history[:] = 0.0
+
+    def process(self, block, out):
+        """Run the notch cascade over block into out"""
+        started = self.clock()
+        if self.freqs.any():
+            filtered, self.zi = self._sosfilt(self.sos, block, axis=0, zi=self.zi)
+            out[:] = filtered
+        elif out is not block:
+            out[:] = block
+        self._pending_cost += self.clock() - started
+        return out
+
+    def analyse(self, block):
+        """Feed one output block to the howl detector"""
+        started = self.clock()
+        frames = len(block)
+        usable = frames - frames % DECIMATION
+        if usable // DECIMATION > len(self._decimated):
+            # Longer block than configured
+            self._decimated = np.zeros((usable // DECIMATION,) + self._shape)
+            self._mixed = np.zeros(usable // DECIMATION)
+        decimated = self._decimated[:usable // DECIMATION]
+        np.add(block[0:usable:2], block[1:usable:2], out=decimated)
+        if self._shape:
+            mixed = self._mixed[:len(decimated)]
+            np.mean(decimated, axis=1, out=mixed)
+            decimated = mixed
+        decimated *= 0.5
+        count = min(len(decimated), ANALYSIS_SIZE)
+        self._history[:-count] = self._history[count:]
+        self._history[-count:] = decimated[-count:]
+        self.elapsed += frames / self.sample_rate
+        self.blocks += 1
+
+        self._until_analysis -= 1
+        if self._until_analysis <= 0:
+            self._until_analysis = self.interval
+            self._detect()
+            self._release()
+
+        cost = self.clock() - started + self._pending_cost
+        self._pending_cost = 0.0
+        self.cost_total += cost
+        self._budget(cost, frames / self.sample_rate)
+
+    def _detect(self):
+        self.analyses += 1
+        spectrum = np.abs(np.fft.rfft(self._history * self._window)) * self._window_gain
+        levels = 20.0 * np.log10(spectrum[self._min_bin:-1] + 1e-9)
+        peak = int(np.argmax(levels))
+        level = levels[peak]
+        if level < HOWL_LEVEL_DB or level - np.median(levels) < HOWL_PROMINENCE_DB:
+            self._candidate_count = 0
+            return
+
+        # Parabolic interpolation between neighbouring bins refines the frequency
+        offset = 0.0
+        if 0 < peak < len(levels) - 1:
+            left, right = levels[peak - 1], levels[peak + 1]
+            curvature = left - 2.0 * level + right
+            if curvature < 0:
+                offset = 0.5 * (left - right) / curvature
+        freq = (self._min_bin + peak + offset) * self.analysis_rate / ANALYSIS_SIZE
+
+        if self._candidate and abs(freq - self._candidate) <= HOWL_TOLERANCE * self._candidate:
+            self._candidate_count += 1
+        else:
+            self._candidate_count = 1
+        self._candidate = freq
+        if self._candidate_count >= HOWL_PERSISTENCE:
+            self._candidate_count = 0
+            self._engage(freq)
+
+    def _engage(self, freq):
+        """Place a notch at freq, or deepen the one already there"""
+        self.detections += 1
+        matches = np.flatnonzero(np.abs(self.freqs - freq) <= HOWL_TOLERANCE * freq)
+        if len(matches):
+            slot = int(matches[0])
+            depth = max(self.depths[slot] + NOTCH_STEP_DB, NOTCH_MAX_DEPTH_DB)
+        else:
+            free = np.flatnonzero(self.freqs == 0)
+            # All slots busy: reuse the one that has gone longest without a howl
+            slot = int(free[0]) if len(free) else int(np.argmin(self.last_seen))
+            self.zi[slot] = 0.0
+            depth = NOTCH_DEPTH_DB
+        self._set_notch(slot, freq, depth)
+        self.last_seen[slot] = self.elapsed
+
+    def _release(self):
+        """Fade out notches that have not been needed for RELEASE_TIME"""
+        stale = (self.freqs > 0) & (self.elapsed - self.last_seen > RELEASE_TIME)
+        for slot in np.flatnonzero(stale):
+            depth = self.depths[slot] + RELEASE_STEP_DB
+            if depth >= -RELEASE_STEP_DB:
+                self.freqs[slot] = 0.0
+                self.depths[slot] = 0.0
+                self.sos[slot] = IDENTITY_SECTION
+                self.zi[slot] = 0.0
+            else:
+                self._set_notch(slot, self.freqs[slot], depth)
+
+    def _set_notch(self, slot, freq, depth):
+        self.freqs[slot] = freq
+        self.depths[slot] = depth
+        self.sos[slot] = peaking_section(freq, depth, NOTCH_Q, self.sample_rate)
+
+    def _budget(self, cost, period):
+        """Analyse less often while over budget, more often when well under it"""
+        self.load += 0.1 * (cost / period - self.load)
+        if self.load > self.budget and self.interval < MAX_ANALYSIS_INTERVAL:
+            self.interval *= 2
+            self.load = self.budget / 2
+        elif self.load < self.budget / 4 and self.interval > ANALYSIS_INTERVAL:
+            self.interval //= 2
+
+    def status(self):
+        """JSON-serialisable state for /metrics"""
+        active = np.flatnonzero(self.freqs)
+        return {
+            'notches': [{'freq_hz': round(float(self.freqs[slot]), 1),
+                         'depth_db': round(float(self.depths[slot]), 1)} for slot in active],
+            'detections': self.detections,
+            'analyses': self.analyses,
+            'analysis_interval_blocks': self.interval,
+            'load': round(self.load, 4),
+            'budget': self.budget,
+            'cost_per_block_ms': 1000.0 * self.cost_total / max(self.blocks, 1),
+        }
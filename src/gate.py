@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Noise Gate for Dark Helmet Voice Changer
+Block-level voice activity detection so the effect chain can rest between words
+"""
+
+import numpy as np
+
+from smoothing import channel_shape
+
+# Input level (dBFS RMS) that opens the gate, and the lower level that keeps it open
+OPEN_DB = -45.0
+CLOSE_DB = -52.0
+
+# Zero crossings per sample above which a block is more hiss than voice; such
+# blocks need NOISY_MARGIN_DB more level to count as speech
+NOISY_ZCR = 0.3
+NOISY_MARGIN_DB = 10.0
+
+# How long the gate stays open after the last voiced block (seconds); covers
+# the gaps between syllables and the pitch shifter's buffered audio
+HANGOVER_TIME = 0.3
+
+
+class NoiseGate:
+    """Decides per block whether the wearer is talking
+
+    update() looks at one input block: its RMS level and zero-crossing
+    rate, with separate open/close thresholds (hysteresis) and a hangover
+    so the gate does not chatter inside words. record() is given the time
+    the engine spent on each block, split by gate state, which is what
+    the CPU savings estimate is based on. With channels set it judges
+    (frames, channels) blocks by their level and crossings over all channels.
+    """
+
+    def __init__(self, sample_rate, blocksize, open_db=OPEN_DB, close_db=CLOSE_DB,
+                 hangover=HANGOVER_TIME, channels=None):
+        self.open_db = open_db
+        self.close_db = close_db
+        self.hangover_samples = int(hangover * sample_rate)
+        self.open = False
+        self.level_db = -100.0
+        self.zcr = 0.0
+        self._quiet = self.hangover_samples  # samples since the last voiced block
+        self._shape = channel_shape(channels)
+        self.allocate(blocksize)
+
+        self.openings = 0
+        self.blocks_open = 0
+        self.blocks_gated = 0
+        self.seconds_open = 0.0
+        self.seconds_gated = 0.0
+
+    def allocate(self, blocksize):
+        self._signs = np.empty((blocksize,) + self._shape, dtype=bool)
+        self._crossings = np.empty((max(blocksize - 1, 1),) + self._shape, dtype=bool)
+
+    def update(self, block):
+        """Classify one input block; True while the chain should run"""
+        frames = len(block)
+        if frames > len(self._signs):
+            self.allocate(frames)
+        energy = float(np.vdot(block, block)) / max(block.size, 1)
+        self.level_db = 10.0 * np.log10(energy) if energy > 1e-10 else -100.0
+
+        signs = self._signs[:frames]
+        crossings = self._crossings[:frames - 1]
+        np.signbit(block, out=signs)
+        np.not_equal(signs[1:], signs[:-1], out=crossings)
+        self.zcr = np.count_nonzero(crossings) / max(crossings.size, 1)
+
+        threshold = self.close_db if self.open else self.open_db
+        if self.zcr > NOISY_ZCR:
+            threshold += NOISY_MARGIN_DB
+        if self.level_db > threshold:
+            self._quiet = 0
+            if not self.open:
+                self.openings += 1
+            self.open = True
+        else:
+            self._quiet += frames
+            if self._quiet >= self.hangover_samples:
+                self.open = False
+        return self.open
+
+    def record(self, was_open, seconds):
+        """Account the engine time spent on one block"""
+        if was_open:
+            self.blocks_open += 1
+            self.seconds_open += seconds
+        else:
+            self.blocks_gated += 1
+            self.seconds_gated += seconds
+
+    @property
+    def cpu_saved(self):
+        """Estimated share of engine CPU saved versus running the chain on every block"""
+        if self.blocks_open == 0 or self.blocks_gated == 0:
+            return 0.0
+        per_open = self.seconds_open / self.blocks_open
+        per_gated = self.seconds_gated / self.blocks_gated
+        full = per_open * (self.blocks_open + self.blocks_gated)
+        return max(self.blocks_gated * (per_open - per_gated) / full, 0.0)
+
+    def status(self):
+        """JSON-serialisable state for /metrics"""
+        blocks = self.blocks_open + self.blocks_gated
+        return {
+            'open': self.open,
+            'level_db': round(float(self.level_db), 1),
+            'zcr': round(float(self.zcr), 3),
+            'openings': self.openings,
+            'gated_fraction': self.blocks_gated / blocks if blocks else 0.0,
+            'cpu_saved_fraction': round(self.cpu_saved, 4),
+        }
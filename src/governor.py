@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Adaptive Quality Governor for Dark Helmet Voice Changer
+Steps effect quality down before the callback runs out of time, and back up when there is headroom
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from dsp_engine import Quality
+from pitch_shifter import FFT_SIZE
+
+# Quality ladder, best first. Each step roughly halves the per-block cost:
+# reverb is about a third of the full chain, the vocoder most of the rest.
+QUALITY_LEVELS = (
+    ('full', Quality('vocoder', FFT_SIZE, True)),
+    ('no_reverb', Quality('vocoder', FFT_SIZE, False)),
+    ('delay_pitch', Quality('delay', None, False)),
+)
+
+# Deadline utilization (processing time / block period) thresholds
+STEP_DOWN_LOAD = 0.7   # p95 above this: drop a level now
+STEP_UP_LOAD = 0.3     # p95 below this for long enough: try the next level up
+
+# Evaluations of calm required before stepping up; doubles after a failed step up
+CALM_EVALUATIONS = 8
+MAX_CALM_EVALUATIONS = 256
+
+# Number of decisions kept for the control API
+DECISION_LOG_SIZE = 64
+
+
+class QualityGovernor:
+    """Chooses the engine's quality level from measured callback load
+
+    evaluate() runs on the control thread a few times a second. It reads
+    the utilization of blocks recorded since the last call, steps down a
+    level as soon as the 95th percentile crosses STEP_DOWN_LOAD, and steps
+    up only after sustained headroom. A step up that has to be undone
+    doubles the calm period required next time, so the level does not
+    oscillate. Changes are compiled through the parameter store, so the
+    audio thread only swaps in a ready-built stage.
+    """
+
+    def __init__(self, engine, store, metrics, levels=QUALITY_LEVELS, extra_latency=0, log=print):
+        self.engine = engine
+        self.store = store
+        self.metrics = metrics
+        self.levels = levels
+        self.extra_latency = extra_latency
+        self.log = log
+        self.enabled = True
+        self.level = 0
+        self.decisions = deque(maxlen=DECISION_LOG_SIZE)
+        self._seen = metrics.blocks
+        self._calm = 0
+        self._calm_needed = CALM_EVALUATIONS
+        self._stepped_up = False
+
+    @property
+    def level_name(self):
+        return self.levels[self.level][0]
+
+    def _recent_load(self):
+        """p95 utilization of blocks recorded since the last evaluation, or None"""
+        blocks = self.metrics.blocks
+        history = len(self.metrics.utilization)
+        count = min(blocks - self._seen, history)
+        self._seen = blocks
+        if count <= 0:
+            return None
+        slots = np.arange(blocks - count, blocks) % history
+        return float(np.percentile(self.metrics.utilization[slots], 95))
+
+    def evaluate(self):
+        """Look at recent load and change level if needed; returns the decision or None"""
+        load = self._recent_load()
+        self.metrics.engine_latency = self.engine.latency + self.extra_latency
+        if load is None or not self.enabled:
+            return None
+
+        if load > STEP_DOWN_LOAD:
+            self._calm = 0
+            if self._stepped_up:
+                self._calm_needed = min(self._calm_needed * 2, MAX_CALM_EVALUATIONS)
+            self._stepped_up = False
+            if self.level + 1 < len(self.levels):
+                return self._set_level(self.level + 1,
+                                       f"p95 load {load:.2f} > {STEP_DOWN_LOAD}", load)
+            return None
+
+        if load < STEP_UP_LOAD and self.level > 0:
+            self._calm += 1
+            if self._calm >= self._calm_needed:
+                self._calm = 0
+                self._stepped_up = True
+                return self._set_level(self.level - 1,
+                                       f"p95 load {load:.2f} < {STEP_UP_LOAD} "
+                                       f"for {self._calm_needed} checks", load)
+        else:
+            self._calm = 0
+            if load < STEP_DOWN_LOAD / 2:
+                self._stepped_up = False
+        return None
+
+    def _set_level(self, level, reason, load=None):
+        previous = self.level_name
+        self.level = level
+        self.engine.requested_quality = self.levels[level][1]
+        self.store.refresh()
+        decision = {'time': time.time(), 'from': previous, 'to': self.level_name,
+                    'reason': reason, 'load_p95': load}
+        self.decisions.append(decision)
+        self.log(f"🎚️  Quality {previous} → {self.level_name}: {reason}")
+        return decision
+
+    def pin(self, name):
+        """Hold a level chosen by name and stop adapting"""
+        names = [level_name for level_name, _ in self.levels]
+        if name not in names:
+            raise ValueError(f"Unknown quality level: {name}")
+        self.enabled = False
+        if names.index(name) != self.level:
+            self._set_level(names.index(name), "pinned via control API")
+
+    def resume(self):
+        """Go back to adapting from the current level"""
+        self.enabled = True
+        self._calm = 0
+        self._seen = self.metrics.blocks
+
+    def status(self):
+        """JSON-serialisable state for the control API"""
+        return {
+            'enabled': self.enabled,
+            'level': self.level_name,
+            'quality': self.levels[self.level][1]._asdict(),
+            'levels': [name for name, _ in self.levels],
+            'latency_samples': self.engine.latency + self.extra_latency,
+            'calm_needed': self._calm_needed,
+            'decisions': list(self.decisions),
+        }
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Level Meters for Dark Helmet Voice Changer
+Per-block input/output RMS and peak from the audio thread, read at display rate
+"""
+
+import math
+
+import numpy as np
+
+# Blocks of history kept between reads (~1.5 s at 44.1 kHz / 1024)
+METER_HISTORY = 64
+
+# Level reported for silence
+SILENCE_DB = -100.0
+
+
+def to_db(value):
+    return 20.0 * math.log10(value) if value > 1e-5 else SILENCE_DB
+
+
+class LevelMeter:
+    """Records one peak and energy figure per block for input and output
+
+    record() runs in the audio thread and does two reductions per signal
+    (max/min and a dot product) straight into preallocated slots. read()
+    runs on the event loop and folds together every block since its last
+    call, so meters are decimated to whatever rate the UI is pushed at.
+    """
+
+    def __init__(self, history=METER_HISTORY):
+        self.peaks = np.zeros((history, 2))
+        self.energy = np.zeros((history, 2))
+        self.frames = np.zeros(history)
+        self.blocks = 0
+        self._read = 0
+
+    def record(self, indata, outdata):
+        """Measure one input block and its processed output (mono, or all channels together)"""
+        slot = self.blocks % len(self.frames)
+        self.peaks[slot, 0] = max(indata.max(), -indata.min())
+        self.peaks[slot, 1] = max(outdata.max(), -outdata.min())
+        self.energy[slot, 0] = np.vdot(indata, indata)
+        self.energy[slot, 1] = np.vdot(outdata, outdata)
+        self.frames[slot] = indata.size
+        self.blocks += 1
+
+    def read(self):
+        """Levels in dBFS over the blocks since the previous read, or None"""
+        blocks = self.blocks
+        count = min(blocks - self._read, len(self.frames))
+        self._read = blocks
+        if count <= 0:
+            return None
+        slots = np.arange(blocks - count, blocks) % len(self.frames)
+        peaks = self.peaks[slots].max(axis=0)
+        rms = np.sqrt(self.energy[slots].sum(axis=0) / max(self.frames[slots].sum(), 1.0))
+        return {
+            side: {'rms_db': round(to_db(rms[i]), 1), 'peak_db': round(to_db(peaks[i]), 1)}
+            for i, side in enumerate(('input', 'output'))
+        }
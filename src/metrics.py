@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Callback Timing Metrics for Dark Helmet Voice Changer
+Low-overhead per-block timing, deadline utilization, xrun and error counters for /metrics
+"""
+
+import time
+
+import numpy as np
+
+# Number of recent blocks kept for percentiles (~95 s at 44.1 kHz / 1024)
+HISTORY_SIZE = 4096
+
+# Deadline utilization histogram bucket upper bounds (fraction of the block period)
+UTILIZATION_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, float('inf'))
+
+# PortAudio callback flags counted as xruns
+XRUN_FLAGS = ('input_underflow', 'input_overflow', 'output_underflow', 'output_overflow')
+
+
+class CallbackMetrics:
+    """Records how long each audio callback takes relative to its deadline
+
+    record() is called from the PortAudio thread and only writes into
+    preallocated arrays and integer counters; summaries are computed on
+    demand by the web thread.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, sample_rate, history_size=HISTORY_SIZE):
+        self.sample_rate = sample_rate
+        self.durations = np.zeros(history_size)
+        self.utilization = np.zeros(history_size)
+        self.histogram = np.zeros(len(UTILIZATION_BUCKETS), dtype=np.int64)
+        self.xruns = dict.fromkeys(XRUN_FLAGS, 0)
+        self.blocks = 0
+        self.utilization_total = 0.0
+        self.deadline_misses = 0
+        self.errors = 0
+        self.last_error = None
+        self.stream_latency = None
+        self.engine_latency = None
+        self.feedback = None  # FeedbackSuppressor whose cost and notches are reported
+        self.gate = None      # NoiseGate whose state and CPU savings are reported
+        self._bucket_edges = UTILIZATION_BUCKETS[:-1]
+
+    def record(self, started, frames, status=None):
+        """Record one callback that began at `started` (a clock() reading)"""
+        elapsed = self.clock() - started
+        budget = frames / self.sample_rate
+        load = elapsed / budget
+
+        slot = self.blocks % len(self.durations)
+        self.durations[slot] = elapsed
+        self.utilization[slot] = load
+        self.utilization_total += load
+        self.blocks += 1
+
+        bucket = 0
+        for edge in self._bucket_edges:
+            if load <= edge:
+                break
+            bucket += 1
+        self.histogram[bucket] += 1
+        if load > 1.0:
+            self.deadline_misses += 1
+        self.record_xruns(status)
+
+    def record_xruns(self, status):
+        """Count the xrun flags in a PortAudio callback status"""
+        if status:
+            for flag in XRUN_FLAGS:
+                if getattr(status, flag, False):
+                    self.xruns[flag] += 1
+
+    def record_error(self, error):
+        """Count a block whose processing raised; reported later, never printed here"""
+        self.errors += 1
+        self.last_error = error
+
+    @property
+    def xrun_count(self):
+        return sum(self.xruns.values())
+
+    def set_stream_latency(self, latency):
+        """Store PortAudio's reported (input, output) latency in seconds"""
+        if isinstance(latency, (tuple, list)):
+            self.stream_latency = {'input': float(latency[0]), 'output': float(latency[1])}
+        elif latency is not None:
+            self.stream_latency = {'input': float(latency), 'output': float(latency)}
+
+    def summary(self):
+        """JSON-serialisable view of the collected metrics"""
+        count = min(self.blocks, len(self.durations))
+        durations = self.durations[:count]
+        utilization = self.utilization[:count]
+
+        def percentiles(values, scale=1.0):
+            if count == 0:
+                return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+            p50, p99 = np.percentile(values, (50, 99))
+            return {'p50': float(p50) * scale, 'p99': float(p99) * scale,
+                    'max': float(values.max()) * scale}
+
+        return {
+            'blocks': self.blocks,
+            'sample_rate': self.sample_rate,
+            'processing_ms': percentiles(durations, 1000.0),
+            'deadline_utilization': percentiles(utilization),
+            'deadline_misses': self.deadline_misses,
+            'utilization_histogram': {
+                ('+Inf' if edge == float('inf') else str(edge)): int(n)
+                for edge, n in zip(UTILIZATION_BUCKETS, self.histogram)
+            },
+            'xruns': dict(self.xruns),
+            'errors': self.errors,
+            'last_error': None if self.last_error is None else repr(self.last_error),
+            'stream_latency_s': self.stream_latency,
+            'engine_latency_samples': self.engine_latency,
+            'feedback_suppressor': self.feedback.status() if self.feedback is not None else None,
+            'noise_gate': self.gate.status() if self.gate is not None else None,
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition of the same metrics"""
+        summary = self.summary()
+        lines = [
+            '# TYPE darkhelmet_callback_blocks_total counter',
+            f"darkhelmet_callback_blocks_total {summary['blocks']}",
+            '# TYPE darkhelmet_deadline_misses_total counter',
+            f"darkhelmet_deadline_misses_total {summary['deadline_misses']}",
+            '# TYPE darkhelmet_processing_seconds gauge',
+        ]
+        for name, value in summary['processing_ms'].items():
+            lines.append(f'darkhelmet_processing_seconds{{stat="{name}"}} {value / 1000.0:.9f}')
+
+        lines.append('# TYPE darkhelmet_deadline_utilization histogram')
+        cumulative = 0
+        for edge, n in zip(UTILIZATION_BUCKETS, self.histogram):
+            cumulative += int(n)
+            label = '+Inf' if edge == float('inf') else edge
+            lines.append(f'darkhelmet_deadline_utilization_bucket{{le="{label}"}} {cumulative}')
+        lines.append(f'darkhelmet_deadline_utilization_sum {self.utilization_total:.6f}')
+        lines.append(f'darkhelmet_deadline_utilization_count {cumulative}')
+
+        lines.append('# TYPE darkhelmet_callback_errors_total counter')
+        lines.append(f"darkhelmet_callback_errors_total {summary['errors']}")
+
+        lines.append('# TYPE darkhelmet_xruns_total counter')
+        for flag, n in summary['xruns'].items():
+            lines.append(f'darkhelmet_xruns_total{{flag="{flag}"}} {n}')
+
+        if self.stream_latency:
+            lines.append('# TYPE darkhelmet_stream_latency_seconds gauge')
+            for direction, value in self.stream_latency.items():
+                lines.append(f'darkhelmet_stream_latency_seconds{{direction="{direction}"}} {value}')
+        if self.engine_latency is not None:
+            lines.append('# TYPE darkhelmet_engine_latency_samples gauge')
+            lines.append(f'darkhelmet_engine_latency_samples {self.engine_latency}')
+        feedback = summary['feedback_suppressor']
+        if feedback is not None:
+            lines += [
+                '# TYPE darkhelmet_feedback_notches gauge',
+                f"darkhelmet_feedback_notches {len(feedback['notches'])}",
+                '# TYPE darkhelmet_feedback_detections_total counter',
+                f"darkhelmet_feedback_detections_total {feedback['detections']}",
+                '# TYPE darkhelmet_feedback_load gauge',
+                f"darkhelmet_feedback_load {feedback['load']}",
+            ]
+        gate = summary['noise_gate']
+        if gate is not None:
+            lines += [
+                '# TYPE darkhelmet_gate_open gauge',
+                f"darkhelmet_gate_open {int(gate['open'])}",
+                '# TYPE darkhelmet_gate_gated_fraction gauge',
+                f"darkhelmet_gate_gated_fraction {gate['gated_fraction']:.4f}",
+                '# TYPE darkhelmet_gate_cpu_saved_fraction gauge',
+                f"darkhelmet_gate_cpu_saved_fraction {gate['cpu_saved_fraction']}",
+            ]
+        return '\n'.join(lines) + '\n'
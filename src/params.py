@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Lock-Free Effect Parameters for Dark Helmet Voice Changer
+Immutable parameter snapshots published by the web thread and read by the audio thread
+"""
+
+import math
+import threading
+from collections import namedtuple
+
+# Voice effect parameters
+EffectParams = namedtuple('EffectParams', [
+    'pitch_shift',       # Octaves; negative lowers Dark Helmet's voice
+    'distortion_gain',   # Drive amount for the gritty effect
+    'reverb_room_size',  # 0.0 (dry) to 1.0 (large helmet)
+    'volume',            # Output volume (0.0 to 1.0)
+    'notch_freq',        # Fixed feedback notch centre frequency (Hz); 0 turns it off
+    'notch_q',           # Fixed feedback notch Q (higher is narrower)
+    'vocoder_mix',       # Robot vocoder blend: 0.0 (voice) to 1.0 (fully vocoded)
+    'vocoder_pitch',     # Vocoder carrier pitch (Hz)
+    'ring_mix',          # Ring modulator blend: 0.0 (off) to 1.0 (full)
+    'ring_freq',         # Ring modulator frequency (Hz)
+], defaults=(0.0, 30.0, 0.0, 100.0, 0.0, 30.0))
+
+DEFAULT_PARAMS = EffectParams(
+    pitch_shift=-0.3,      # Lower pitch for Dark Helmet's deep voice
+    distortion_gain=1.5,   # Slight distortion for gritty effect
+    reverb_room_size=0.5,  # Medium reverb for helmet effect
+    volume=0.8,            # Output volume (0.0 to 1.0)
+    notch_freq=0.0,        # Off: the adaptive feedback suppressor finds the howl
+    notch_q=30.0,
+    vocoder_mix=0.0,       # Robot effects off for the classic voice
+    vocoder_pitch=100.0,
+    ring_mix=0.0,
+    ring_freq=30.0,
+)
+
+# Accepted range of every parameter (inclusive); anything else never reaches the DSP
+PARAM_RANGES = {
+    'pitch_shift': (-2.0, 2.0),
+    'distortion_gain': (0.0, 50.0),
+    'reverb_room_size': (0.0, 1.0),
+    'volume': (0.0, 1.0),
+    'notch_freq': (0.0, 20000.0),
+    'notch_q': (0.1, 100.0),
+    'vocoder_mix': (0.0, 1.0),
+    'vocoder_pitch': (20.0, 2000.0),
+    'ring_mix': (0.0, 1.0),
+    'ring_freq': (0.0, 5000.0),
+}
+
+
+def parse_param(name, value):
+    """Convert one parameter value to a float within its range, or raise ValueError"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, not {value!r}") from None
+    low, high = PARAM_RANGES[name]
+    if not math.isfinite(number) or not low <= number <= high:
+        raise ValueError(f"{name} must be between {low:g} and {high:g}, not {value!r}")
+    return number
+
+
+def parse_params(values):
+    """Validate the known parameters in a mapping; unknown names are ignored"""
+    return {name: parse_param(name, value) for name, value in values.items()
+            if name in EffectParams._fields}
+
+
+# What the audio thread sees: the raw parameters plus DSP state derived from them
+Snapshot = namedtuple('Snapshot', ['params', 'compiled'])
+
+
+class ParamStore:
+    """Publishes immutable parameter snapshots with a single reference swap
+
+    Writers (the web server) serialise among themselves, parse values and run
+    the bound compiler to derive coefficients before publishing. Readers (the
+    PortAudio callback) just read `snapshot`, which is an atomic attribute load
+    under the GIL, so the audio thread never waits on a lock.
+    """
+
+    def __init__(self, params=DEFAULT_PARAMS):
+        self._write_lock = threading.Lock()
+        self._compiler = None
+        self.snapshot = Snapshot(params, None)
+
+    @property
+    def params(self):
+        return self.snapshot.params
+
+    def bind(self, compiler):
+        """Derive DSP state with compiler(params, previous_params) for every published snapshot"""
+        with self._write_lock:
+            self._compiler = compiler
+            self._publish(self.snapshot.params)
+
+    def update(self, **changes):
+        """Publish a new snapshot with the given parameters replaced
+
+        Every value is checked before anything is published: one bad field
+        raises ValueError and leaves the current snapshot in place.
+        """
+        values = parse_params(changes)
+        with self._write_lock:
+            self._publish(self.snapshot.params._replace(**values))
+        return self.snapshot.params
+
+    def publish(self, params, compiled):
+        """Swap in parameters whose DSP state was compiled ahead of time (presets)"""
+        with self._write_lock:
+            self.snapshot = Snapshot(params, compiled)
+
+    def refresh(self):
+        """Recompile and republish the current parameters (e.g. after a quality change)"""
+        with self._write_lock:
+            self._publish(self.snapshot.params)
+
+    def _publish(self, params):
+        compiled = self._compiler(params, self.snapshot.params) if self._compiler else None
+        self.snapshot = Snapshot(params, compiled)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Streaming Phase Vocoder Pitch Shifter for Dark Helmet Voice Changer
+Duration-preserving pitch shift with persistent analysis state and a fixed latency
+"""
+
+import math
+
+import numpy as np
+
+from stft import StreamingSTFT
+
+# Default analysis settings (~23 ms frames at 44.1 kHz, 75% overlap)
+FFT_SIZE = 1024
+OVERLAP = 4
+
+
+class PhaseVocoderPitchShifter(StreamingSTFT):
+    """Overlap-add phase vocoder that shifts pitch by moving spectral peaks
+
+    Input is framed every hop samples. All frames that complete within a
+    callback block are analysed with a single batched rFFT. Every bin
+    belongs to the region of its nearest spectral peak, and each region is
+    moved as a whole to the peak's shifted bin and phase-rotated to its
+    shifted frequency (Laroche & Dolson), so the shape of every partial and
+    with it the level is kept. The resynthesised frames are overlap-added
+    into an output FIFO. The output is delayed by exactly
+    `latency` samples regardless of block size. With channels set it takes
+    (frames, channels) blocks and every channel rides along in the same
+    batched transforms.
+    """
+
+    def __init__(self, sample_rate, blocksize, fft_size=FFT_SIZE, overlap=OVERLAP, channels=None):
+        super().__init__(sample_rate, blocksize, fft_size, overlap, channels)
+        self.omega = 2.0 * np.pi * np.arange(self.bins) / fft_size
+        self._index = np.arange(self.bins)
+        self.apply_plan(self.plan(0.0))
+        self.reset()
+
+    def plan(self, semitones):
+        """Derive the bin mapping for a shift; pure, so it can run off the audio thread"""
+        if not math.isfinite(semitones):
+            raise ValueError(f"pitch shift must be finite, not {semitones!r}")
+        ratio = 2.0 ** (semitones / 12.0)
+        # Bins a partial moves by, per rad/sample of its frequency
+        return ratio, (ratio - 1.0) * self.fft_size / (2.0 * np.pi)
+
+    def apply_plan(self, plan):
+        """Switch to a precomputed plan (reference swaps only)"""
+        self.ratio, self._bins_moved = plan
+
+    def set_semitones(self, semitones):
+        self.apply_plan(self.plan(semitones))
+
+    def reset(self):
+        """Clear analysis/synthesis state and re-prime the fixed latency"""
+        super().reset()
+        self._last_phase = np.zeros(self._shape + (self.bins,))
+        self._rotation = np.zeros(self._shape + (self.bins,))
+
+    def _allocate_scratch(self):
+        """Work arrays for the most frames one block can complete"""
+        super()._allocate_scratch()
+        n, bins = self.fft_size, self.bins
+        most = self.blocksize // self.hop + 1
+        spectral = (most,) + self._shape + (bins,)
+        self._frames = np.empty((most,) + self._shape + (n,), dtype=np.float32)
+        self._resynth = np.empty((most,) + self._shape + (n,), dtype=np.float32)
+        self._magnitude = np.empty(spectral)
+        self._phase = np.empty(spectral)
+        self._freq = np.empty(spectral)
+        self._synth = np.empty(spectral)
+        self._trig = np.empty(spectral)
+        self._spectrum = np.empty(spectral, dtype=np.complex128)
+
+    def _transform(self, n_frames):
+        """Analyse n_frames hops from the input FIFO and resynthesise them shifted
+
+        Spectra are shaped (frames, [channels,] bins); the peak regions are
+        found for every frame and channel as one row. Everything but the two
+        transforms and the region bookkeeping writes into preallocated work
+        arrays.
+        """
+        n, hop = self.fft_size, self.hop
+        frames = self._frames[:n_frames]
+        np.multiply(self._framed(self._input, n_frames), self.window, out=frames)
+        spectrum = np.fft.rfft(frames, axis=-1)
+        magnitude = self._magnitude[:n_frames]
+        phase = self._phase[:n_frames]
+        np.abs(spectrum, out=magnitude)
+        np.arctan2(spectrum.imag, spectrum.real, out=phase)
+
+        # True frequency of each bin from the phase advance since the previous frame
+        freq = self._freq[:n_frames]
+        wrap = self._trig[:n_frames]
+        np.subtract(phase[0], self._last_phase, out=freq[0])
+        np.subtract(phase[1:], phase[:-1], out=freq[1:])
+        freq -= self.omega * hop
+        np.multiply(freq, 1.0 / (2.0 * np.pi), out=wrap)
+        np.round(wrap, out=wrap)
+        wrap *= 2.0 * np.pi
+        freq -= wrap
+        freq /= hop
+        freq += self.omega
+        self._last_phase[...] = phase[-1]
+
+        # Rotation that takes each bin from its own frequency to the shifted
+        # one, accumulated frame by frame
+        rotation = self._synth[:n_frames]
+        np.multiply(freq, (self.ratio - 1.0) * hop, out=rotation)
+        rotation[0] += self._rotation
+        np.cumsum(rotation, axis=0, out=rotation)
+        np.mod(rotation[-1], 2.0 * np.pi, out=self._rotation)
+
+        # Every bin follows its nearest peak: the region moves by the peak's
+        # bin offset and turns by the peak's rotation (batched over frames)
+        rows = magnitude.size // self.bins
+        mag = magnitude.reshape(rows, -1)
+        index = self._index
+        peak = np.zeros(mag.shape, dtype=bool)
+        peak[:, 1:-1] = (mag[:, 1:-1] > mag[:, :-2]) & (mag[:, 1:-1] >= mag[:, 2:])
+        below = np.maximum.accumulate(np.where(peak, index, -self.bins), axis=1)
+        above = np.minimum.accumulate(np.where(peak, index, 2 * self.bins)[:, ::-1], axis=1)[:, ::-1]
+        owner = np.where(above - index < index - below, above, below)
+        owner = np.where(peak.any(axis=1, keepdims=True), owner, index)
+        # Bins the peak's true frequency moves by
+        offset = np.rint(np.take_along_axis(freq.reshape(rows, -1), owner, axis=1)
+                         * self._bins_moved).astype(np.int64)
+        target = index + offset
+        keep = (target >= 0) & (target < self.bins)
+        turned = phase.reshape(rows, -1) + np.take_along_axis(rotation.reshape(rows, -1), owner, axis=1)
+
+        # Moved regions that overlap add up, as the partials they hold would
+        flat = (target + (np.arange(rows) * self.bins)[:, None])[keep]
+        kept_mag, kept_phase = mag[keep], turned[keep]
+        shifted = self._spectrum[:n_frames]
+        size = rows * self.bins
+        shifted.real = np.bincount(flat, kept_mag * np.cos(kept_phase), size).reshape(shifted.shape)
+        shifted.imag = np.bincount(flat, kept_mag * np.sin(kept_phase), size).reshape(shifted.shape)
+        resynth = self._resynth[:n_frames]
+        np.multiply(np.fft.irfft(shifted, n=n, axis=-1), self.window, out=resynth)
+        return resynth
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Effect Presets for Dark Helmet Voice Changer
+Named parameter sets saved on disk, kept precompiled for instant switching
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+from dsp_engine import MAX_GLIDE_TIME
+from params import DEFAULT_PARAMS, EffectParams, parse_params
+from startup import write_json
+
+# Where user presets are saved between runs
+PRESETS_PATH = os.environ.get(
+    'DARK_HELMET_PRESETS',
+    os.path.join(os.path.expanduser('~'), '.config', 'dark_helmet', 'presets.json'))
+
+# Presets that are always available and cannot be deleted
+BUILTIN_PRESETS = {
+    'dark_helmet': DEFAULT_PARAMS,
+    'lord_helmet': DEFAULT_PARAMS._replace(pitch_shift=-0.45, distortion_gain=2.5, reverb_room_size=0.7),
+    'barf': DEFAULT_PARAMS._replace(pitch_shift=-0.15, distortion_gain=3.0, reverb_room_size=0.2),
+    'dot_matrix': DEFAULT_PARAMS._replace(pitch_shift=0.4, distortion_gain=1.0, reverb_room_size=0.1,
+                                          vocoder_mix=0.7, vocoder_pitch=140.0, ring_mix=0.3, ring_freq=50.0),
+    'clean': EffectParams(0.0, 1.0, 0.0, 0.8),
+}
+
+# Compiled presets kept in memory (one per preset and quality level)
+PRESET_CACHE_SIZE = 8
+
+
+class PresetStore:
+    """Named presets with their DSP state compiled ahead of time
+
+    Switching preset is the expensive part of a live show: a new filter
+    design, pitch tables and a reverb impulse response. activate() takes
+    the compiled state from an LRU cache when it can, so the switch itself
+    is one snapshot swap in the parameter store. Cached entries are only
+    reused while they match the engine's current pitch stage, so a quality
+    change from the governor just causes a recompile on next use.
+    """
+
+    def __init__(self, engine, store, path=PRESETS_PATH, cache_size=PRESET_CACHE_SIZE):
+        self.engine = engine
+        self.store = store
+        self.path = path
+        self.cache_size = cache_size
+        self.active = None
+        self._cache = OrderedDict()
+        self.user = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        presets = {}
+        for name, values in entries.items() if isinstance(entries, dict) else ():
+            try:
+                presets[name] = EffectParams(**parse_params(values))
+            except (AttributeError, TypeError, ValueError):
+                print(f"⚠️  Skipping invalid preset '{name}' in {self.path}")
+        return presets
+
+    def _write(self):
+        try:
+            write_json(self.path, {name: params._asdict() for name, params in self.user.items()})
+        except OSError as e:
+            print(f"⚠️  Could not save presets: {e}")
+
+    def names(self):
+        return sorted(set(BUILTIN_PRESETS) | set(self.user))
+
+    def get(self, name):
+        """Parameters of a preset, or raise ValueError"""
+        params = self.user.get(name, BUILTIN_PRESETS.get(name))
+        if params is None:
+            raise ValueError(f"Unknown preset: {name}")
+        return params
+
+    def save(self, name, params):
+        if not name:
+            raise ValueError("Preset name is required")
+        self.user[name] = params
+        self._cache.pop(name, None)
+        self._write()
+
+    def delete(self, name):
+        if name not in self.user:
+            raise ValueError(f"Cannot delete preset: {name}")
+        del self.user[name]
+        self._cache.pop(name, None)
+        self._write()
+
+    def compiled(self, name):
+        """Compiled state for a preset as an instant switch, from the cache when current"""
+        compiled = self._cache.get(name)
+        if compiled is None or not self.engine.is_current(compiled):
+            compiled = self.engine.compile(self.get(name))
+            self._cache[name] = compiled
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(name)
+        return compiled
+
+    def warm(self, names=None):
+        """Precompile presets (all of them by default) before they are needed"""
+        for name in list(names or self.names())[-self.cache_size:]:
+            self.compiled(name)
+
+    def activate(self, name, crossfade=0.0):
+        """Switch to a preset; crossfade > 0 glides pitch over that many seconds
+
+        Gains and reverb always ramp over the engine's smoothing time, so
+        an instant switch does not click; crossfade only adds a pitch glide.
+        """
+        try:
+            crossfade = float(crossfade)
+        except (TypeError, ValueError):
+            raise ValueError(f"crossfade must be a number, not {crossfade!r}") from None
+        if not 0.0 <= crossfade <= MAX_GLIDE_TIME:  # also rejects nan
+            raise ValueError(f"crossfade must be between 0 and {MAX_GLIDE_TIME:g} seconds")
+        if crossfade > 0:
+            params = self.get(name)
+            compiled = self.engine.compile(params, self.store.params, glide_time=crossfade)
+        else:
+            compiled = self.compiled(name)
+        self.store.publish(compiled.params, compiled)
+        self.active = name
+        return compiled.params
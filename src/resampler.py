@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Streaming Sample-Rate Conversion for Dark Helmet Voice Changer
+Polyphase resamplers with persistent state, so the voice chain can run at one fixed internal rate
+"""
+
+from fractions import Fraction
+
+import numpy as np
+
+from smoothing import channel_shape
+from startup import LazyModule
+
+signal = LazyModule('scipy.signal')
+
+# Filter half-length in taps per unit of max(up, down), as in scipy's resample_poly
+HALF_TAPS = 10
+
+# Lowpass cutoff as a fraction of the lower rate's Nyquist frequency; the
+# transition band ends near Nyquist instead of straddling it
+ROLLOFF = 0.9
+
+# Kaiser window beta for the anti-aliasing / anti-imaging filter
+KAISER_BETA = 5.0
+
+# Largest denominator accepted when turning a rate ratio into up/down factors
+MAX_RATIO_DENOMINATOR = 1000
+
+
+class PolyphaseResampler:
+    """Streaming rational resampler: up by `up`, filter, down by `down`
+
+    The lowpass prototype is split into `up` phases of `taps` coefficients.
+    Each output sample picks its phase and the last `taps` input samples,
+    so one block is a single gather and one einsum however long it is. The
+    last taps - 1 input samples are carried to the next block, making the
+    output identical to resampling the whole stream at once. Integer
+    interpolation and decimation skip the gather and run as one matrix
+    product over the input windows. The number of
+    output samples per block varies by one as the phase wraps.
+    """
+
+    def __init__(self, up, down, channels=None):
+        self.up = up
+        self.down = down
+        half = HALF_TAPS * max(up, down)
+        taps = -(-(2 * half + 1) // up)  # per phase, rounded up
+        prototype = np.zeros(taps * up)
+        prototype[:2 * half + 1] = signal.firwin(2 * half + 1, ROLLOFF / max(up, down),
+                                                 window=('kaiser', KAISER_BETA)) * up
+        # polyphase[p, k] multiplies input[base - k]; stored reversed to match window order
+        self.polyphase = prototype.reshape(taps, up).T[:, ::-1].astype(np.float32)
+        self.taps = taps
+        # Group delay of the prototype, in output samples
+        self.delay = half / down
+        self._shape = channel_shape(channels)
+        self._subscripts = 'nk,nk->n' if channels is None else 'nck,nk->nc'
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros((self.taps - 1,) + self._shape, dtype=np.float32)
+        self._next = 0      # up * (input index) of the next output sample, relative to _history's end
+        self._consumed = 0  # input samples seen so far
+
+    def max_output(self, frames):
+        """Most output samples a block of `frames` inputs can produce"""
+        return -(-frames * self.up // self.down) + 1
+
+    def process(self, block):
+        """Resample one block; returns a new array of 0..max_output() samples"""
+        frames = len(block)
+        buffer = np.concatenate([self._history, block])
+        end = (self._consumed + frames) * self.up
+        count = max(-(-(end - self._next) // self.down), 0)
+        positions = self._next + self.down * np.arange(count)
+        bases = positions // self.up - self._consumed   # newest input index within block
+        phases = positions % self.up
+
+        if not count:
+            out = np.zeros((0,) + self._shape, dtype=np.float32)
+        elif self.down == 1:
+            # Integer interpolation: every input sample yields all `up` phases in turn
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps, axis=0)
+            phased = windows @ self.polyphase.T
+            if self._shape:
+                phased = phased.transpose(0, 2, 1)
+            out = phased.reshape((count,) + self._shape)
+        elif self.up == 1:
+            # Integer decimation: one phase, every down-th window
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps, axis=0)
+            out = windows[bases[0]::self.down][:count] @ self.polyphase[0]
+        else:
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps, axis=0)
+            out = np.einsum(self._subscripts, windows[bases], self.polyphase[phases]).astype(np.float32)
+
+        self._next += self.down * count
+        self._consumed += frames
+        self._history = buffer[len(buffer) - (self.taps - 1):].copy()
+        return out
+
+
+class RateConverter:
+    """Runs a block processor at an internal rate inside a stream at another
+
+    Each stream block is decimated to the internal rate, processed, and
+    interpolated back. The two resamplers produce a block length that
+    wobbles by a sample or two, so the result goes through a small FIFO
+    that is primed with silence and always hands back exactly as many
+    samples as came in.
+    """
+
+    def __init__(self, stream_rate, internal_rate, blocksize, channels=None):
+        ratio = Fraction(internal_rate, stream_rate).limit_denominator(MAX_RATIO_DENOMINATOR)
+        self.stream_rate = stream_rate
+        self.internal_rate = stream_rate * ratio.numerator / ratio.denominator
+        self.down = PolyphaseResampler(ratio.numerator, ratio.denominator, channels)
+        self.up = PolyphaseResampler(ratio.denominator, ratio.numerator, channels)
+        self.internal_blocksize = self.down.max_output(blocksize)
+        self._shape = channel_shape(channels)
+
+        # Enough silence that the FIFO never runs dry when a block comes up short
+        self.prime = 2 * (ratio.denominator // ratio.numerator + 2)
+        capacity = 2 * blocksize + self.up.max_output(self.internal_blocksize) + self.prime
+        self._fifo = np.zeros((capacity,) + self._shape, dtype=np.float32)
+        self._out = np.zeros((blocksize,) + self._shape, dtype=np.float32)
+        self.reset()
+
+    @property
+    def latency(self):
+        """Stream samples added by the two filters and the FIFO (the chain's own is extra)"""
+        return int(round(self.down.delay * self.stream_rate / self.internal_rate + self.up.delay)) + self.prime
+
+    def reset(self):
+        self.down.reset()
+        self.up.reset()
+        self._fifo[:self.prime] = 0.0
+        self._fill = self.prime
+
+    def process(self, block, out, process):
+        """Run `process(internal_block)` on block at the internal rate; writes len(block) samples to out"""
+        frames = len(block)
+        if out is None:
+            if frames > len(self._out):
+                self._out = np.zeros((frames,) + self._shape, dtype=np.float32)
+            out = self._out[:frames]
+
+        internal = self.down.process(block)
+        resampled = self.up.process(process(internal))
+        count = len(resampled)
+        if self._fill + count > len(self._fifo):
+            self._fifo = np.concatenate([self._fifo, np.zeros_like(self._fifo)])
+        self._fifo[self._fill:self._fill + count] = resampled
+        self._fill += count
+
+        available = min(frames, self._fill)
+        out[:available] = self._fifo[:available]
+        out[available:] = 0.0  # underrun: never expected once primed
+        remaining = self._fill - available
+        self._fifo[:remaining] = self._fifo[available:self._fill].copy()
+        self._fill = remaining
+        return out
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Streaming Helmet Reverb for Dark Helmet Voice Changer
+Uniformly partitioned FFT convolution with bounded, measurable cost per block
+"""
+
+import time
+
+import numpy as np
+
+from effects import helmet_impulse_response
+from smoothing import RAMP_TIME, SmoothedParam, channel_shape
+
+# Partition length in samples; also the wet-path pre-delay (~5.8 ms at 44.1 kHz)
+PARTITION_SIZE = 256
+
+# Wet level at room_size = 1.0 (matches effects.reverb)
+WET_GAIN = 0.35
+
+# Number of room sizes whose IR spectra are kept around
+SPECTRA_CACHE_SIZE = 8
+
+
+class PartitionedConvolutionReverb:
+    """Uniformly partitioned overlap-save convolution with the helmet IR
+
+    The impulse response is cut into K partitions of PARTITION_SIZE samples
+    whose spectra are precomputed. Every partition of input costs one rFFT,
+    K complex multiply-adds per bin and one irFFT, so the work per callback
+    block is fixed by the block size and room size and never by the signal.
+    With channels set, (frames, channels) blocks are convolved with the same
+    IR spectra per channel in one einsum.
+    """
+
+    def __init__(self, sample_rate, blocksize, partition_size=PARTITION_SIZE,
+                 ramp_time=RAMP_TIME, channels=None):
+        self.sample_rate = sample_rate
+        self.partition_size = partition_size
+        self.bins = partition_size + 1
+        self.latency = partition_size  # wet path only; dry is not delayed
+        self.room_size = None
+        self._shape = channel_shape(channels)
+        # Delay-line spectra are stored (partition, [channel,] bin) so bins stay contiguous
+        self._subscripts = 'kb,kb->b' if channels is None else 'kcb,kb->cb'
+        self.wet = SmoothedParam(0.0, ramp_time * sample_rate, blocksize, channels)
+        self.last_block_seconds = 0.0
+        self._spectra_cache = {}
+        self._fdl = None
+        self.blocksize = blocksize
+        self.set_room_size(0.0)
+
+    def _ir_spectra(self, room_size):
+        """Partition spectra of the helmet IR, cached per room size"""
+        spectra = self._spectra_cache.get(room_size)
+        if spectra is None:
+            p = self.partition_size
+            ir = helmet_impulse_response(self.sample_rate, room_size)
+            count = -(-len(ir) // p)
+            padded = np.zeros(count * p, dtype=np.float32)
+            padded[:len(ir)] = ir
+            spectra = np.fft.rfft(padded.reshape(count, p), n=2 * p, axis=1).astype(np.complex64)
+            if len(self._spectra_cache) >= SPECTRA_CACHE_SIZE:
+                self._spectra_cache.pop(next(iter(self._spectra_cache)))
+            self._spectra_cache[room_size] = spectra
+        return spectra
+
+    @property
+    def wet_gain(self):
+        """Wet level the reverb is heading to"""
+        return self.wet.target
+
+    @property
+    def tail_samples(self):
+        """Samples after the input falls silent until the wet output is exactly zero"""
+        return (self.partitions + 2) * self.partition_size + self.blocksize
+
+    @property
+    def bypassed(self):
+        return self.wet.target == 0.0 and not self.wet.ramping
+
+    def plan(self, room_size):
+        """Look up (or build) the IR spectra for room_size; 0 fades the wet path out"""
+        room_size = round(float(np.clip(room_size, 0.0, 1.0)), 2)
+        if room_size > 0:
+            return room_size, self._ir_spectra(room_size)
+        return room_size, None
+
+    def apply_plan(self, plan):
+        """Switch IR; the delay line keeps its recent spectra so tails carry over"""
+        room_size, spectra = plan
+        if room_size == self.room_size:
+            return
+        was_bypassed = self.bypassed
+        self.room_size = room_size
+        self.wet.set_target(WET_GAIN * room_size)
+        if spectra is None:
+            # Keep the current IR while the wet level ramps down
+            if self._fdl is None:
+                self.spectra = np.zeros((1, self.bins), dtype=np.complex64)
+                self.partitions = 1
+                self.reset()
+            return
+
+        self.spectra = spectra
+        if self._fdl is None or was_bypassed:
+            # Nothing audible is carried: start clean, the tail builds up naturally
+            self.partitions = len(spectra)
+            self.reset()
+            self.wet.jump(WET_GAIN * room_size)
+        elif len(spectra) != self.partitions:
+            self._resize_delay_line(len(spectra))
+
+    def set_room_size(self, room_size):
+        self.apply_plan(self.plan(room_size))
+
+    def _resize_delay_line(self, count):
+        """Change the partition count while keeping the most recent input spectra"""
+        recent = np.concatenate([self._fdl[self._head::-1], self._fdl[:self._head:-1]])
+        kept = min(count, len(recent))
+        self._fdl = np.zeros((count,) + self._shape + (self.bins,), dtype=np.complex64)
+        self._fdl[:kept] = recent[:kept][::-1]
+        self._head = kept - 1
+        self.partitions = count
+
+    def reset(self):
+        """Clear the frequency-domain delay line and FIFOs"""
+        p = self.partition_size
+        capacity = self.blocksize + 2 * p
+        self.wet.allocate(self.blocksize)
+        self._scratch = np.zeros((self.blocksize,) + self._shape, dtype=np.float32)
+        self._fdl = np.zeros((self.partitions,) + self._shape + (self.bins,), dtype=np.complex64)
+        self._head = 0
+        self._window = np.zeros((2 * p,) + self._shape, dtype=np.float32)
+        self._input = np.zeros((capacity,) + self._shape, dtype=np.float32)
+        self._input_fill = 0
+        self._wet = np.zeros((capacity + p,) + self._shape, dtype=np.float32)
+        self._wet_fill = p
+
+    def cost_per_block(self, frames=None):
+        """Complex multiply-adds needed for a block of `frames` samples"""
+        frames = self.blocksize if frames is None else frames
+        return (frames / self.partition_size) * self.partitions * self.bins
+
+    def _convolve_partition(self, start):
+        """Convolve one input partition and append its wet output"""
+        p = self.partition_size
+        self._window[:p] = self._window[p:]
+        self._window[p:] = self._input[start:start + p]
+
+        self._head = (self._head + 1) % self.partitions
+        self._fdl[self._head] = np.fft.rfft(self._window, axis=0).T
+
+        # Sum X[n - k] * H[k] over the ring without reordering it
+        head = self._head
+        spectrum = np.einsum(self._subscripts, self._fdl[head::-1], self.spectra[:head + 1])
+        if head + 1 < self.partitions:
+            spectrum += np.einsum(self._subscripts, self._fdl[:head:-1], self.spectra[head + 1:])
+
+        self._wet[self._wet_fill:self._wet_fill + p] = np.fft.irfft(spectrum, n=2 * p)[..., p:].T
+        self._wet_fill += p
+
+    def process(self, block, out):
+        """Add the reverb tail to block, writing into out (may alias block)"""
+        started = time.perf_counter()
+        frames = len(block)
+        if frames > self.blocksize:
+            self.blocksize = frames
+            self.reset()
+
+        if self.bypassed:
+            if out is not block:
+                out[:] = block
+            self.last_block_seconds = time.perf_counter() - started
+            return out
+
+        p = self.partition_size
+        self._input[self._input_fill:self._input_fill + frames] = block
+        self._input_fill += frames
+        consumed = 0
+        while self._input_fill - consumed >= p:
+            self._convolve_partition(consumed)
+            consumed += p
+        leftover = self._input_fill - consumed
+        self._input[:leftover] = self._input[consumed:self._input_fill].copy()
+        self._input_fill = leftover
+
+        if out is not block:
+            out[:] = block
+        wet = self._scratch[:frames]
+        np.multiply(self._wet[:frames], self.wet.next_block(frames), out=wet)
+        out += wet
+        remaining = self._wet_fill - frames
+        self._wet[:remaining] = self._wet[frames:self._wet_fill].copy()
+        self._wet_fill = remaining
+
+        self.last_block_seconds = time.perf_counter() - started
+        return out
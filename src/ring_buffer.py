@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Pipelined Processing for Dark Helmet Voice Changer
+Lock-free single-producer/single-consumer block rings between PortAudio and a DSP thread
+"""
+
+import threading
+
+import numpy as np
+
+# Default number of blocks the processing thread may run behind the callback
+LOOKAHEAD_BLOCKS = 2
+
+
+class RingBuffer:
+    """Fixed-capacity ring of preallocated (blocksize, channels) blocks
+
+    Safe for exactly one writer thread and one reader thread without locks:
+    each side only advances its own counter, and only after the block has
+    been copied, so the other side never sees a half-written slot.
+    """
+
+    def __init__(self, capacity, blocksize, channels):
+        self.slots = np.zeros((capacity, blocksize, channels), dtype=np.float32)
+        self.capacity = capacity
+        self._written = 0  # advanced by the producer only
+        self._read = 0     # advanced by the consumer only
+
+    @property
+    def available(self):
+        return self._written - self._read
+
+    @property
+    def free(self):
+        return self.capacity - self.available
+
+    def write(self, block):
+        """Copy a block in; returns False (dropping it) when the ring is full"""
+        if self._written - self._read >= self.capacity:
+            return False
+        slot = self.slots[self._written % self.capacity]
+        slot[:len(block)] = block
+        self._written += 1
+        return True
+
+    def read(self, out):
+        """Copy the oldest block out; returns False when the ring is empty"""
+        if self._written == self._read:
+            return False
+        out[:] = self.slots[self._read % self.capacity][:len(out)]
+        self._read += 1
+        return True
+
+    def skip(self):
+        """Discard the oldest block without copying it"""
+        if self._written != self._read:
+            self._read += 1
+
+    def reset(self):
+        self._written = self._read = 0
+
+
+class PipelinedProcessor:
+    """Runs block processing on its own thread, lookahead blocks behind the callback
+
+    callback() only copies the input block in and a finished output block
+    out. The output ring starts with `lookahead` blocks of silence, so the
+    processing thread has that many block periods to finish each block and
+    the extra latency is exactly lookahead * blocksize samples. A block that
+    is still late is replaced by silence and the late one dropped when it
+    arrives, so the latency never drifts.
+    """
+
+    def __init__(self, process, blocksize, channels, lookahead=LOOKAHEAD_BLOCKS, metrics=None):
+        if lookahead < 1:
+            raise ValueError("lookahead must be at least one block")
+        self.process = process
+        self.blocksize = blocksize
+        self.channels = channels
+        self.lookahead = lookahead
+        self.metrics = metrics
+        self.inbox = RingBuffer(lookahead + 2, blocksize, channels)
+        self.outbox = RingBuffer(lookahead + 2, blocksize, channels)
+        self.underruns = 0
+        self.overruns = 0
+        self.errors = 0
+        self._late = 0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self._prime()
+
+    @property
+    def latency(self):
+        """Extra latency added by the pipeline, in samples"""
+        return self.lookahead * self.blocksize
+
+    def _prime(self):
+        self.inbox.reset()
+        self.outbox.reset()
+        silence = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        for _ in range(self.lookahead):
+            self.outbox.write(silence)
+        self._late = 0
+
+    def callback(self, indata, outdata, status=None):
+        """Audio-thread side: copy in, copy out, never process"""
+        if self.metrics is not None and status:
+            self.metrics.record_xruns(status)
+
+        if not self.inbox.write(indata):
+            # This block will never produce output; it cancels one pending drop
+            self.overruns += 1
+            self._late -= 1
+            self._count('input_overflow')
+
+        while self._late > 0 and self.outbox.available > 1:
+            self.outbox.skip()
+            self._late -= 1
+        if not self.outbox.read(outdata):
+            outdata.fill(0)
+            self.underruns += 1
+            self._late += 1
+            self._count('output_underflow')
+        self._wake.set()
+
+    def _count(self, flag):
+        if self.metrics is not None:
+            self.metrics.xruns[flag] += 1
+
+    def _run(self):
+        indata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        clock = self.metrics.clock if self.metrics is not None else None
+        while self._running:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            while self._running and self.inbox.read(indata):
+                started = clock() if clock else 0.0
+                try:
+                    self.process(indata, outdata)
+                except Exception as e:
+                    self.errors += 1
+                    if self.metrics is not None:
+                        self.metrics.record_error(e)
+                    outdata.fill(0)
+                if clock:
+                    self.metrics.record(started, self.blocksize)
+                self.outbox.write(outdata)
+
+    def start(self):
+        self._prime()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='dsp-pipeline', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
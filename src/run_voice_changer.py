@@ -4,6 +4,7 @@ Dark Helmet Voice Changer Launcher
 Ensures proper environment and launches the voice changer with all checks
 """
 
+import importlib.util
 import os
 import sys
 import subprocess
@@ -20,14 +21,13 @@ def check_spaceBalls_environment():
 def check_dependencies():
     """Check if all required packages are installed"""
     required_packages = [
-        'numpy', 'scipy', 'sounddevice', 'sox'
+        'numpy', 'scipy', 'sounddevice'
     ]
     
+    # find_spec checks a package is installed without paying for importing it
     missing_packages = []
     for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
+        if importlib.util.find_spec(package) is None:
             missing_packages.append(package)
     
     return missing_packages
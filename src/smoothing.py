@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Parameter Smoothing for Dark Helmet Voice Changer
+Linear per-sample ramps so live control changes never step, zipper or click
+"""
+
+import numpy as np
+
+# Default ramp length for gain-like parameters (seconds)
+RAMP_TIME = 0.03
+
+
+def channel_shape(channels):
+    """Trailing buffer shape for a stage: () for mono 1-D blocks, (channels,) for 2-D"""
+    return () if channels is None else (channels,)
+
+
+class SmoothedParam:
+    """A parameter that glides linearly to each new target over ramp_samples
+
+    next_block() returns a plain float while the value is settled, so the
+    steady state costs one scalar multiply, and a view of a preallocated
+    per-sample ramp buffer while it is moving. With channels set the ramp
+    is a (frames, 1) column that broadcasts across (frames, channels) blocks.
+    """
+
+    def __init__(self, value, ramp_samples, blocksize, channels=None):
+        self.value = float(value)
+        self.target = float(value)
+        self.ramp_samples = max(int(ramp_samples), 1)
+        self._step = 0.0
+        self._remaining = 0
+        self._trailing = () if channels is None else (1,)
+        self.allocate(blocksize)
+
+    def allocate(self, blocksize):
+        """Size the ramp buffers for blocks up to blocksize"""
+        self._offsets = np.arange(1, blocksize + 1, dtype=np.float32).reshape((blocksize,) + self._trailing)
+        self._buffer = np.empty((blocksize,) + self._trailing, dtype=np.float32)
+
+    @property
+    def ramping(self):
+        return self._remaining > 0
+
+    def set_target(self, target):
+        """Start a ramp from the current value to target"""
+        target = float(target)
+        if target == self.target:
+            return
+        self.target = target
+        self._remaining = self.ramp_samples
+        self._step = (target - self.value) / self.ramp_samples
+
+    def jump(self, value):
+        """Set the value immediately without ramping"""
+        self.value = self.target = float(value)
+        self._remaining = 0
+
+    def next_block(self, frames):
+        """Values for the next `frames` samples: a float, or a per-sample ramp"""
+        if self._remaining == 0:
+            return self.value
+        if frames > len(self._buffer):
+            self.allocate(frames)
+
+        ramp = self._buffer[:frames]
+        np.multiply(self._offsets[:frames], self._step, out=ramp)
+        ramp += self.value
+        if frames >= self._remaining:
+            ramp[self._remaining:] = self.target
+            self.value = self.target
+            self._remaining = 0
+        else:
+            self.value += self._step * frames
+            self._remaining -= frames
+        return ramp
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Fast Startup Helpers for Dark Helmet Voice Changer
+Lazy module imports, a startup time breakdown and a cache of the last working audio config
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Where the last known-good audio configuration is remembered between boots
+CONFIG_CACHE_PATH = os.environ.get(
+    'DARK_HELMET_CONFIG_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'dark_helmet', 'audio_config.json'))
+
+# ALSA's list of sound cards; changes whenever a card is added, removed or renumbered
+ALSA_CARDS_PATH = '/proc/asound/cards'
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access
+
+    Lets heavy modules (scipy.signal, sounddevice) stay off the import path
+    until they are actually used, while code keeps writing `sd.Stream(...)`.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        # Introspection (hasattr(x, '__code__'), asyncio's '_is_coroutine' probe)
+        # must not trigger the import
+        if attr.startswith('_') and self._module is None:
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def prefetch(*names):
+    """Import modules on a background thread so the cost overlaps other startup work"""
+    def load():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except (ImportError, OSError):
+                pass  # Reported properly when the module is first used
+    thread = threading.Thread(target=load, name='import-prefetch', daemon=True)
+    thread.start()
+    return thread
+
+
+class StartupTimer:
+    """Collects how long each startup phase takes"""
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self):
+        self.started = self.clock()
+        self.phases = []
+
+    def add(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.add(name, self.clock() - started)
+
+    def report(self):
+        """Print the breakdown and total time since the timer was created"""
+        print("\n⏱️  Startup time breakdown:")
+        for name, seconds in self.phases:
+            print(f"   {name:<22} {1000 * seconds:8.1f} ms")
+        print(f"   {'total':<22} {1000 * (self.clock() - self.started):8.1f} ms")
+
+
+def alsa_cards(path=ALSA_CARDS_PATH):
+    """Contents of the ALSA card list, or '' where there is none"""
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def config_key(device_name, cards):
+    """Cache key for an audio device on a particular set of sound cards"""
+    return hashlib.sha1(f"{device_name}\n{cards}".encode()).hexdigest()[:16]
+
+
+def write_json(path, data):
+    """Save data as JSON at path, write-then-rename so a power cut never leaves a half-written file
+
+    Creates the parent directory if needed; raises OSError on failure.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+class DeviceConfigCache:
+    """JSON file of known-good audio configurations keyed by config_key()"""
+
+    def __init__(self, path=CONFIG_CACHE_PATH):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, key):
+        return self._read().get(key)
+
+    def save(self, key, config):
+        entries = self._read()
+        entries[key] = config
+        self._write(entries)
+
+    def forget(self, key):
+        entries = self._read()
+        if entries.pop(key, None) is not None:
+            self._write(entries)
+
+    def _write(self, entries):
+        try:
+            write_json(self.path, entries)
+        except OSError as e:
+            print(f"⚠️  Could not save audio config cache: {e}")
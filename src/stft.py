@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Streaming STFT Framework for Dark Helmet Voice Changer
+Fixed-latency framing, overlap-add and FIFO bookkeeping shared by the spectral effects
+"""
+
+import numpy as np
+
+from smoothing import channel_shape
+
+
+class StreamingSTFT:
+    """Frames a stream every hop samples and overlap-adds the resynthesis
+
+    Subclasses implement _transform(n_frames), which reads the frames that
+    completed within a block from the input FIFO and returns them
+    resynthesised and windowed, shaped (frames, [channels,] fft_size). The
+    base class buffers input, overlap-adds the result into an output FIFO
+    and delays the stream by exactly `latency` samples regardless of block
+    size. Channel layout follows the pitch shifter: with channels set,
+    blocks are (frames, channels). Subclasses call reset() once their own
+    state is set up.
+    """
+
+    def __init__(self, sample_rate, blocksize, fft_size, overlap, channels=None):
+        self.sample_rate = sample_rate
+        self._shape = channel_shape(channels)
+        self.fft_size = fft_size
+        self.hop = fft_size // overlap
+        self.bins = fft_size // 2 + 1
+        self.latency = fft_size  # samples
+
+        # Periodic Hann analysis/synthesis pair, normalised for constant overlap-add
+        self.window = np.hanning(fft_size + 1)[:fft_size].astype(np.float32)
+        self.ola_gain = np.float32(1.0 / (np.sum(self.window ** 2) / self.hop))
+        self.blocksize = blocksize
+
+    def reset(self):
+        """Clear the FIFOs and re-prime the fixed latency"""
+        n = self.fft_size
+        capacity = n + self.blocksize + self.hop
+        self._input = np.zeros((capacity,) + self._shape, dtype=np.float32)
+        self._input_fill = n - self.hop
+        self._accum = np.zeros((capacity + n,) + self._shape, dtype=np.float32)
+        self._output = np.zeros((capacity + n,) + self._shape, dtype=np.float32)
+        self._output_fill = self.hop
+        self._allocate_scratch()
+
+    def _allocate_scratch(self):
+        """Work arrays sized for the configured blocksize; subclasses add their own"""
+        self._scratch = np.empty_like(self._output)
+
+    def _grow(self, frames):
+        """Enlarge FIFOs for blocks longer than the configured blocksize"""
+        self.blocksize = frames
+        extra = np.zeros((frames + self.hop,) + self._shape, dtype=np.float32)
+        self._input = np.concatenate([self._input, extra])
+        self._accum = np.concatenate([self._accum, extra])
+        self._output = np.concatenate([self._output, extra])
+        self._allocate_scratch()
+
+    def _slide(self, fifo, start, stop, scratch=None):
+        """Move fifo[start:stop] to the front through a scratch buffer (no allocation)"""
+        scratch = self._scratch if scratch is None else scratch
+        count = stop - start
+        scratch[:count] = fifo[start:stop]
+        fifo[:count] = scratch[:count]
+        return count
+
+    def _framed(self, fifo, n_frames):
+        """Strided view of the first n_frames analysis frames in fifo, frames first"""
+        span = (n_frames - 1) * self.hop + self.fft_size
+        return np.lib.stride_tricks.sliding_window_view(fifo[:span], self.fft_size, axis=0)[::self.hop]
+
+    def _push(self, block):
+        """Append block to the input FIFO"""
+        fill = self._input_fill
+        self._input[fill:fill + len(block)] = block
+        self._input_fill += len(block)
+
+    def _consume(self, done):
+        """Drop `done` analysed samples from the front of the input FIFO"""
+        self._input_fill = self._slide(self._input, done, self._input_fill)
+
+    def _overlap_add(self, resynth):
+        """Overlap-add windowed frames; each frame completes `hop` more output samples"""
+        n, hop = self.fft_size, self.hop
+        for i in range(len(resynth)):
+            self._accum[i * hop:i * hop + n] += resynth[i].T
+        done = len(resynth) * hop
+        start = self._output_fill
+        np.multiply(self._accum[:done], self.ola_gain, out=self._output[start:start + done])
+        self._output_fill += done
+        self._slide(self._accum, done, done + n)
+        self._accum[n:] = 0.0
+        return done
+
+    def _transform(self, n_frames):
+        raise NotImplementedError
+
+    def process(self, block, out):
+        """Run block through the effect into out; output lags input by self.latency samples
+
+        If anything fails part way the FIFOs are re-primed before the error
+        propagates, so one bad block cannot leave input and output out of step.
+        """
+        frames = len(block)
+        if frames > self.blocksize:
+            self._grow(frames)
+        try:
+            self._push(block)
+            n_frames = (self._input_fill - self.fft_size) // self.hop + 1
+            if n_frames > 0:
+                self._consume(self._overlap_add(self._transform(n_frames)))
+
+            out[:] = self._output[:frames]
+            self._output_fill = self._slide(self._output, frames, self._output_fill)
+        except Exception:
+            self.reset()
+            raise
+        return out
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Audio Stream Backends for Dark Helmet Voice Changer
+PortAudio for the helmet, plus a hardware-free loopback that drives the same callback
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from startup import LazyModule
+
+# Only needed for WAV sources and output, so imported on first use
+signal = LazyModule('scipy.signal')
+wavfile = LazyModule('scipy.io.wavfile')
+
+# Callback flags that PortAudio can report; the loopback raises the same ones
+CALLBACK_FLAGS = ('input_underflow', 'input_overflow', 'output_underflow',
+                  'output_overflow', 'priming_output')
+
+# Mirrors the time info struct sounddevice passes to callbacks
+StreamTime = namedtuple('StreamTime', ['inputBufferAdcTime', 'outputBufferDacTime', 'currentTime'])
+
+
+def synthetic_voice(sample_rate, seconds, channels=2, seed=0):
+    """Deterministic voice-like test signal: buzzy harmonics, vibrato and breath noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 120 * (1 + 0.03 * np.sin(2 * np.pi * 5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+
+    # Syllable-like amplitude envelope with pauses
+    envelope = np.clip(np.sin(2 * np.pi * 1.5 * t), 0, None) ** 0.5
+    audio = 0.2 * envelope * voice + 0.01 * rng.standard_normal(len(t))
+    audio = audio.astype(np.float32)
+    return np.repeat(audio[:, None], channels, axis=1)
+
+
+def load_wav(path, sample_rate, channels=2):
+    """Read a WAV file as float32 at sample_rate with the given channel count"""
+    rate, data = wavfile.read(path)
+    if np.issubdtype(data.dtype, np.integer):
+        data = data.astype(np.float32) / np.iinfo(data.dtype).max
+    data = data.astype(np.float32)
+    if data.ndim == 1:
+        data = data[:, None]
+    data = data.mean(axis=1, keepdims=True)
+    if rate != sample_rate:
+        g = np.gcd(rate, sample_rate)
+        data = signal.resample_poly(data, sample_rate // g, rate // g, axis=0).astype(np.float32)
+    return np.repeat(data, channels, axis=1)
+
+
+class CallbackFlags:
+    """Minimal stand-in for sounddevice.CallbackFlags"""
+
+    def __init__(self, **flags):
+        for name in CALLBACK_FLAGS:
+            setattr(self, name, bool(flags.get(name, False)))
+
+    def __bool__(self):
+        return any(getattr(self, name) for name in CALLBACK_FLAGS)
+
+    def __repr__(self):
+        active = [name for name in CALLBACK_FLAGS if getattr(self, name)]
+        return f"CallbackFlags({', '.join(active)})"
+
+
+class LoopbackStream:
+    """Drives a PortAudio-style callback from an in-memory signal
+
+    Blocks are handed to the callback as (blocksize, channels) float32
+    arrays, exactly as sounddevice would. With clock='realtime' each block
+    is paced to its wall-clock deadline and an overrun is reported to the
+    next callback as output_underflow; with clock='fast' blocks run back to
+    back to measure throughput. The output is kept and can be written to WAV.
+    """
+
+    def __init__(self, source, samplerate, blocksize, channels, callback,
+                 clock='fast', output_path=None, dtype='float32', **ignored):
+        if dtype != 'float32':
+            raise ValueError("LoopbackStream only supports float32")
+        self.source = np.ascontiguousarray(source, dtype=np.float32)
+        if self.source.ndim == 1:
+            self.source = self.source[:, None]
+        if self.source.shape[1] != channels:
+            self.source = np.repeat(self.source.mean(axis=1, keepdims=True), channels, axis=1)
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.callback = callback
+        self.clock = clock
+        self.output_path = output_path
+        self.latency = (blocksize / samplerate, blocksize / samplerate)
+
+        n_blocks = len(self.source) // blocksize
+        self.output = np.zeros((n_blocks * blocksize, channels), dtype=np.float32)
+        self.stats = {'blocks': 0, 'xruns': 0, 'wall_seconds': 0.0,
+                      'audio_seconds': n_blocks * blocksize / samplerate}
+        self._n_blocks = n_blocks
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        indata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        status = CallbackFlags()
+        started = time.perf_counter()
+
+        for i in range(self._n_blocks):
+            if self._stop.is_set():
+                break
+            start = i * self.blocksize
+            indata[:] = self.source[start:start + self.blocksize]
+            outdata.fill(0)
+
+            stream_time = start / self.samplerate
+            block_started = time.perf_counter()
+            self.callback(indata, outdata, self.blocksize,
+                          StreamTime(stream_time, stream_time + period, stream_time),
+                          status)
+            self.output[start:start + self.blocksize] = outdata
+            self.stats['blocks'] += 1
+
+            status = CallbackFlags()
+            if self.clock == 'realtime':
+                deadline = started + (i + 1) * period
+                now = time.perf_counter()
+                if now - block_started > period:
+                    self.stats['xruns'] += 1
+                    status = CallbackFlags(output_underflow=True)
+                elif deadline > now:
+                    time.sleep(deadline - now)
+
+        self.stats['wall_seconds'] = time.perf_counter() - started
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='loopback-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+        if self.output_path:
+            wavfile.write(self.output_path, self.samplerate, self.output[:self.stats['blocks'] * self.blocksize])
+
+    def wait(self):
+        """Block until the whole source has been processed"""
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_stream(backend='portaudio', clock='fast', output_path=None, seconds=10.0, **stream_args):
+    """Open an audio stream for a backend spec
+
+    'portaudio'          the real sound card via sounddevice
+    'synthetic[:secs]'   loopback of the synthetic voice signal
+    'file:<path.wav>'    loopback of a recorded WAV file
+    """
+    name, _, arg = backend.partition(':')
+    if name == 'portaudio':
+        import sounddevice as sd
+        return sd.Stream(**stream_args)
+
+    samplerate = stream_args['samplerate']
+    channels = stream_args['channels']
+    if name == 'synthetic':
+        source = synthetic_voice(samplerate, float(arg) if arg else seconds, channels)
+    elif name == 'file':
+        source = load_wav(arg, samplerate, channels)
+    else:
+        raise ValueError(f"Unknown stream backend: {backend}")
+    return LoopbackStream(source, clock=clock, output_path=output_path, **stream_args)
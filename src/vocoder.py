@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Robot Voice Effects for Dark Helmet Voice Changer
+Channel vocoder on an FFT filterbank and a ring modulator, both streaming with persistent state
+"""
+
+import numpy as np
+
+from smoothing import RAMP_TIME, SmoothedParam
+from startup import LazyModule
+from stft import StreamingSTFT
+
+signal = LazyModule('scipy.signal')
+
+# Filterbank analysis settings (~12 ms frames at 44.1 kHz, 75% overlap)
+VOCODER_FFT_SIZE = 512
+VOCODER_OVERLAP = 4
+
+# Band layout: log-spaced between these frequencies (Hz)
+VOCODER_BANDS = 16
+BAND_LOW = 150.0
+BAND_HIGH = 7000.0
+
+# Band envelope smoothing time constant (seconds), applied per frame
+ENVELOPE_TIME = 0.015
+
+# Carrier band energy below this fraction of the mean is treated as empty
+CARRIER_FLOOR = 1e-3
+
+
+def band_matrix(sample_rate, fft_size, bands, low=BAND_LOW, high=BAND_HIGH):
+    """Triangular log-spaced band weights, shape (bins, bands)
+
+    Neighbouring bands overlap by half so the bin gains interpolate
+    smoothly; a band too narrow to reach any bin centre gets its nearest
+    bin. Bins outside [low, high] belong to no band.
+    """
+    high = min(high, 0.45 * sample_rate)
+    freqs = np.fft.rfftfreq(fft_size, 1.0 / sample_rate)
+    edges = np.geomspace(low, high, bands + 2)
+    weights = np.zeros((len(freqs), bands))
+    for b in range(bands):
+        lo, centre, hi = edges[b:b + 3]
+        rising = (freqs - lo) / (centre - lo)
+        falling = (hi - freqs) / (hi - centre)
+        weights[:, b] = np.clip(np.minimum(rising, falling), 0.0, None)
+        if not weights[:, b].any():
+            weights[np.argmin(np.abs(freqs - centre)), b] = 1.0
+    return weights
+
+
+class ChannelVocoder(StreamingSTFT):
+    """Imposes the voice's band envelopes on a buzzing carrier
+
+    Input is framed like the phase vocoder pitch shifter: every frame that
+    completes within a block goes through one batched rFFT together with
+    the matching frames of a band-limited pulse-train carrier. Band
+    energies for all frames are one matrix product with the filterbank
+    weights, smoothed per band with lfilter along the frame axis, and the
+    per-band gains are spread back onto the bins by a second product, so
+    the cost barely depends on the number of bands. The output is the
+    carrier through those gains blended with the resynthesised voice by
+    mix, and lags the input by `latency` samples whatever the mix. At mix 0
+    the transforms are skipped (an unmodified spectrum resynthesises to the
+    windowed frame itself), so the stage then costs little more than its
+    delay. With channels set each channel gets its own envelopes over a
+    shared carrier.
+    """
+
+    def __init__(self, sample_rate, blocksize, bands=VOCODER_BANDS, fft_size=VOCODER_FFT_SIZE,
+                 overlap=VOCODER_OVERLAP, channels=None):
+        super().__init__(sample_rate, blocksize, fft_size, overlap, channels)
+        self.bands = bands
+        self._window_squared = self.window * self.window
+        weights = band_matrix(sample_rate, fft_size, bands)
+        self._analysis = weights / weights.sum(axis=0)  # mean power per band
+        coverage = weights.sum(axis=1, keepdims=True)
+        self._synthesis = np.divide(weights, coverage, out=np.zeros_like(weights),
+                                    where=coverage > 0).T  # (bands, bins)
+        self._smooth = np.exp(-self.hop / (ENVELOPE_TIME * sample_rate))
+        self.apply_plan(self.plan(0.0, 100.0))
+        self.reset()
+
+    def plan(self, mix, pitch):
+        """Mix and carrier settings for parameters; pure, so it can run off the audio thread"""
+        pitch = float(np.clip(pitch, 20.0, 0.25 * self.sample_rate))
+        harmonics = max(int(0.5 * self.sample_rate / pitch) - 1, 1)
+        return float(np.clip(mix, 0.0, 1.0)), 2.0 * np.pi * pitch / self.sample_rate, harmonics
+
+    def apply_plan(self, plan):
+        """Switch to a precomputed plan (reference swaps only)"""
+        self.mix, self._increment, self._harmonics = plan
+
+    def reset(self):
+        """Clear analysis/synthesis state and re-prime the fixed latency"""
+        super().reset()
+        self._carrier = np.zeros(len(self._input), dtype=np.float32)
+        self._phase = 0.0
+        self._envelope = np.zeros((1,) + self._shape + (self.bands,))
+
+    def _allocate_scratch(self):
+        super()._allocate_scratch()
+        self._carrier_scratch = np.empty(len(self._input), dtype=np.float32)
+
+    def _grow(self, frames):
+        super()._grow(frames)
+        self._carrier = np.concatenate([self._carrier, np.zeros(frames + self.hop, dtype=np.float32)])
+
+    def _buzz(self, frames):
+        """Next `frames` samples of a band-limited pulse train (all harmonics at equal level)"""
+        phase = self._phase + self._increment * np.arange(1, frames + 1)
+        self._phase = float(np.mod(phase[-1], 2.0 * np.pi))
+        k = self._harmonics
+        half = np.sin(0.5 * phase)
+        safe = np.where(np.abs(half) < 1e-9, 1.0, half)
+        buzz = np.where(np.abs(half) < 1e-9, k, np.sin((k + 0.5) * phase) / (2.0 * safe) - 0.5)
+        return buzz / k
+
+    def _push(self, block):
+        """Append block to the input FIFO and the matching carrier samples to theirs"""
+        fill = self._input_fill
+        self._carrier[fill:fill + len(block)] = self._buzz(len(block))
+        super()._push(block)
+
+    def _consume(self, done):
+        self._slide(self._carrier, done, self._input_fill, self._carrier_scratch)
+        super()._consume(done)
+
+    def _transform(self, n_frames):
+        """Vocode n_frames hops from the input FIFO; band envelopes only track while mix > 0"""
+        voice = self._framed(self._input, n_frames)
+        mix = self.mix
+        if mix == 0.0:
+            return voice * self._window_squared
+        carrier = self._framed(self._carrier, n_frames)
+        if self._shape:
+            carrier = np.broadcast_to(carrier[:, None], voice.shape)
+        spectra = np.fft.rfft(np.stack([voice, carrier]) * self.window, axis=-1)
+        voice_spectrum, carrier_spectrum = spectra
+
+        # Band energies for every frame (and channel) at once
+        power = spectra.real ** 2 + spectra.imag ** 2
+        voice_bands, carrier_bands = power @ self._analysis
+        voice_bands, self._envelope = signal.lfilter([1.0 - self._smooth], [1.0, -self._smooth],
+                                                     voice_bands, axis=0, zi=self._envelope)
+        floor = CARRIER_FLOOR * carrier_bands.mean(axis=-1, keepdims=True) + 1e-12
+        gains = np.sqrt(np.maximum(voice_bands, 0.0) / (carrier_bands + floor))
+
+        spectrum = (mix * (gains @ self._synthesis)) * carrier_spectrum
+        if mix < 1.0:
+            spectrum += (1.0 - mix) * voice_spectrum
+        return (np.fft.irfft(spectrum, n=self.fft_size, axis=-1) * self.window).astype(np.float32)
+
+
+class RingModulator:
+    """Multiplies the voice by a sine: the classic metallic robot
+
+    mix blends from the dry voice (0) to full ring modulation (1) and
+    ramps per sample like the other gains; the oscillator phase carries
+    across blocks. With channels set the sine is a (frames, 1) column
+    shared by every channel.
+    """
+
+    def __init__(self, sample_rate, blocksize, ramp_time=RAMP_TIME, channels=None):
+        self.sample_rate = sample_rate
+        self._trailing = () if channels is None else (1,)
+        self.mix = SmoothedParam(0.0, ramp_time * sample_rate, blocksize, channels)
+        self._phase = 0.0
+        self.apply_plan(self.plan(0.0, 30.0))
+
+    def plan(self, mix, freq):
+        """Mix target and phase increment for parameters; pure"""
+        return float(np.clip(mix, 0.0, 1.0)), 2.0 * np.pi * float(freq) / self.sample_rate
+
+    def apply_plan(self, plan):
+        mix, self._increment = plan
+        self.mix.set_target(mix)
+
+    @property
+    def active(self):
+        return self.mix.ramping or self.mix.value > 0.0
+
+    def reset(self):
+        self._phase = 0.0
+
+    def process(self, block, out):
+        """out = block * (1 - mix + mix * sin); block and out may be the same array"""
+        frames = len(block)
+        phase = self._phase + self._increment * np.arange(1, frames + 1)
+        self._phase = float(np.mod(phase[-1], 2.0 * np.pi)) if frames else self._phase
+        gain = np.sin(phase).astype(np.float32).reshape((frames,) + self._trailing)
+        gain -= 1.0
+        gain *= self.mix.next_block(frames)
+        gain += 1.0
+        np.multiply(block, gain, out=out)
+        return out
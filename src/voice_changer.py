@@ -1,17 +1,29 @@
+import time
+_import_started = time.perf_counter()
+
 import asyncio
 import platform
 import numpy as np
-import sounddevice as sd
-import scipy.signal as signal
-from scipy.io import wavfile
-import sox
 import os
 import sys
-import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
 import json
-import urllib.parse
-import time
+import effects
+from dsp_engine import DSPEngine
+from params import ParamStore, parse_params
+from metrics import CallbackMetrics
+from stream_backends import LoopbackStream, open_stream
+from ring_buffer import PipelinedProcessor
+from callbacks import build_callback, snapshot_processor
+from governor import QualityGovernor
+from control_server import ControlServer, Response, request_json
+from meters import LevelMeter
+from presets import PresetStore
+from startup import (LazyModule, StartupTimer, DeviceConfigCache, alsa_cards,
+                     config_key, prefetch)
+
+# sounddevice initialises PortAudio on import, so it is loaded on first use
+sd = LazyModule('sounddevice')
+MODULE_IMPORT_SECONDS = time.perf_counter() - _import_started
 
 def check_virtual_environment():
     """Check if we're running in the SpaceBalls virtual environment"""
@@ -32,125 +44,120 @@ SAMPLE_RATE = 44100  # Hz, WM8960 supports up to 48kHz
 BLOCK_SIZE = 1024    # Samples per block for real-time processing
 CHANNELS = 2         # Stereo for WM8960
 
-# Voice effect parameters (initial values)
-pitch_shift = -0.3   # Lower pitch for Dark Helmet's deep voice
-distortion_gain = 1.5  # Slight distortion for gritty effect
-reverb_room_size = 0.5  # Medium reverb for helmet effect
-volume = 0.8         # Output volume (0.0 to 1.0)
+# Stream backend: 'portaudio' (sound card), 'synthetic[:seconds]' or 'file:<input.wav>'
+STREAM_BACKEND = os.environ.get('DARK_HELMET_STREAM', 'portaudio')
+STREAM_CLOCK = os.environ.get('DARK_HELMET_CLOCK', 'fast')  # loopback: 'fast' or 'realtime'
+STREAM_OUTPUT = os.environ.get('DARK_HELMET_OUTPUT')        # loopback: output WAV path
+
+# Blocks of lookahead for a separate DSP thread; 0 processes inside the audio callback
+PIPELINE_BLOCKS = int(os.environ.get('DARK_HELMET_PIPELINE', '0'))
+
+# Adapt effect quality to measured CPU headroom (set DARK_HELMET_GOVERNOR=0 to disable)
+GOVERNOR_ENABLED = os.environ.get('DARK_HELMET_GOVERNOR', '1') != '0'
+GOVERNOR_INTERVAL = 0.25  # seconds between load checks
+
+# Track howling in the output and notch it out (set DARK_HELMET_FEEDBACK=0 to disable)
+FEEDBACK_SUPPRESSION = os.environ.get('DARK_HELMET_FEEDBACK', '1') != '0'
+
+# Skip the effect chain while the wearer is silent (set DARK_HELMET_GATE=0 to disable)
+NOISE_GATE = os.environ.get('DARK_HELMET_GATE', '1') != '0'
+
+# Process every channel separately instead of a mono downmix (true stereo / dual mic)
+MULTICHANNEL = os.environ.get('DARK_HELMET_MULTICHANNEL', '0') == '1'
+
+# Run the voice chain at this rate whatever the device opens at, e.g. 16000 or 22050
+# (unset or 0: process at the stream rate)
+INTERNAL_RATE = int(os.environ.get('DARK_HELMET_INTERNAL_RATE', '0')) or None
+
+# Distortion: oversampling factor (1, 2 or 4) and tanh implementation ('tanh' or 'table')
+OVERSAMPLE = int(os.environ.get('DARK_HELMET_OVERSAMPLE', '2'))
+WAVESHAPER = os.environ.get('DARK_HELMET_WAVESHAPER', 'tanh')
+
+# Channel vocoder stage for the robot presets; off by default as it adds its latency to every preset
+CHANNEL_VOCODER = os.environ.get('DARK_HELMET_CHANNEL_VOCODER', '0') != '0'
+
+# Voice effect parameters, published as immutable snapshots (see params.py)
+effect_params = ParamStore()
 
-# Lock for thread-safe parameter updates
-param_lock = threading.Lock()
+# Streaming DSP engine for the active audio stream
+dsp_engine = None
 
-# SoX transformer for effects
-tfm = sox.Transformer()
+# Callback timing and xrun metrics for the active audio stream
+callback_metrics = None
+
+# Quality governor for the active audio stream
+quality_governor = None
+
+# Last known-good audio configuration per device and sound card set
+device_cache = DeviceConfigCache()
+
+# Named presets for the active audio stream, precompiled for instant switching
+preset_store = None
+
+# Input/output levels measured in the audio thread, pushed to WebSocket clients
+level_meter = LevelMeter()
+telemetry_clients = set()
+TELEMETRY_INTERVAL = 0.1  # seconds between meter pushes (10 Hz)
 
 def apply_effects(audio):
     """Apply Dark Helmet voice effects to audio data."""
-    global pitch_shift, distortion_gain, reverb_room_size, volume
-    with param_lock:
-        local_pitch = pitch_shift
-        local_distortion = distortion_gain
-        local_reverb = reverb_room_size
-        local_volume = volume
-
-    # Convert audio to numpy array if not already
-    audio = np.array(audio, dtype=np.float32)
-
-    # Save input audio to temporary file
-    temp_input = "temp_input.wav"
-    temp_output = "temp_output.wav"
-    wavfile.write(temp_input, SAMPLE_RATE, audio)
-
-    # Configure SoX effects
-    tfm = sox.Transformer()
-    tfm.pitch(local_pitch * 12)  # Pitch shift in semitones
-    tfm.overdrive(local_distortion)  # Distortion effect
-    tfm.reverb(reverb_room_size=reverb_room_size, wet_only=False)  # Reverb
-    tfm.vol(local_volume)  # Volume adjustment
-
-    # Process audio
-    tfm.build(temp_input, temp_output)
-    _, processed_audio = wavfile.read(temp_output)
-
-    # Clean up temporary files
-    os.remove(temp_input)
-    os.remove(temp_output)
+    params = effect_params.params
+
+    # Process entirely in memory (no temp files or SoX subprocess)
+    processed_audio = effects.apply_effect_chain(
+        audio, SAMPLE_RATE, params.pitch_shift, params.distortion_gain,
+        params.reverb_room_size, params.volume)
 
     # Ensure output is stereo and float32
-    if processed_audio.ndim == 1:
-        processed_audio = np.stack([processed_audio, processed_audio], axis=1)
-    processed_audio = processed_audio.astype(np.float32) / 32768.0
-    return processed_audio
+    return np.stack([processed_audio, processed_audio], axis=1)
+
+def create_engine(sample_rate, channels, blocksize):
+    """DSP engine for a stream with the configured stages, bound to effect_params
+
+    Allocates and designs filters, so call it before the stream opens,
+    never from the audio callback.
+    """
+    engine = DSPEngine(sample_rate, channels, blocksize, feedback=FEEDBACK_SUPPRESSION,
+                       gate=NOISE_GATE, multichannel=MULTICHANNEL, internal_rate=INTERNAL_RATE,
+                       oversample=OVERSAMPLE, waveshaper=WAVESHAPER, channel_vocoder=CHANNEL_VOCODER)
+    engine.meter = level_meter
+    effect_params.bind(engine.compile)
+    return engine
+
+def create_metrics(engine):
+    """Callback metrics for a stream processed by engine"""
+    metrics = CallbackMetrics(engine.stream_rate)
+    metrics.engine_latency = engine.latency
+    metrics.feedback = engine.feedback
+    metrics.gate = engine.gate
+    return metrics
+
+# Callback for the default configuration, built by prepare_default_callback()
+default_callback = None
+
+def prepare_default_callback(in_channels=None, out_channels=None):
+    """Build the engine and callback audio_callback runs, before its stream opens"""
+    global dsp_engine, callback_metrics, default_callback
+    dsp_engine = create_engine(SAMPLE_RATE, CHANNELS, BLOCK_SIZE)
+    callback_metrics = create_metrics(dsp_engine)
+    default_callback = build_callback(dsp_engine, effect_params, callback_metrics,
+                                      in_channels or CHANNELS, out_channels or CHANNELS)
+    return default_callback
 
 def audio_callback(indata, outdata, frames, time, status):
-    """Real-time audio processing callback with flexible channel handling."""
-    if status:
-        print(f"Audio callback status: {status}")
-    
-    try:
-        # Handle different input/output channel configurations
-        input_data = indata.copy()
-        
-        # Convert to mono if needed for processing
-        if input_data.ndim == 2 and input_data.shape[1] > 1:
-            # Mix stereo to mono for processing
-            mono_input = np.mean(input_data, axis=1, keepdims=True)
-        else:
-            mono_input = input_data
-        
-        # Apply notch filter to reduce feedback (centered at 1kHz)
-        notch_freq = 1000  # Hz
-        Q = 30.0  # Quality factor
-        # Use the actual sample rate from the stream
-        current_sample_rate = 44100  # Will be updated in main()
-        try:
-            b, a = signal.iirnotch(notch_freq / (current_sample_rate / 2), Q)
-            filtered_data = signal.lfilter(b, a, mono_input, axis=0)
-        except:
-            # If filter fails, just use the original data
-            filtered_data = mono_input
-        
-        # Apply voice effects (simplified for real-time processing)
-        try:
-            processed = apply_effects_realtime(filtered_data)
-        except:
-            # Fallback: just apply basic volume and pitch
-            processed = apply_basic_effects(filtered_data)
-        
-        # Match output channels to the expected output format
-        if outdata.ndim == 2:
-            if processed.ndim == 1:
-                # Duplicate mono to stereo
-                outdata[:, 0] = processed[:frames].flatten()
-                if outdata.shape[1] > 1:
-                    outdata[:, 1] = processed[:frames].flatten()
-            else:
-                # Copy processed data, ensuring frame count matches
-                outdata[:] = processed[:frames]
-        else:
-            # Mono output
-            outdata[:] = processed[:frames].flatten()
-            
-    except Exception as e:
-        # On any error, just pass through the input with volume reduction
-        print(f"Audio processing error: {e}")
-        try:
-            if outdata.shape == indata.shape:
-                outdata[:] = indata * 0.5  # Reduce volume to prevent feedback
-            else:
-                # Handle shape mismatch
-                outdata.fill(0)
-        except:
-            outdata.fill(0)  # Silence on critical error
+    """Real-time audio callback for the default settings (SAMPLE_RATE, BLOCK_SIZE)"""
+    if default_callback is None:
+        # Not prepared: stay silent rather than build the engine on the audio thread
+        outdata.fill(0)
+        return
+    default_callback(indata, outdata, frames, time, status)
 
 def apply_effects_realtime(audio):
     """Apply simplified effects for real-time processing"""
-    global pitch_shift, distortion_gain, reverb_room_size, volume
-    
-    with param_lock:
-        local_pitch = pitch_shift
-        local_volume = volume
-        local_distortion = distortion_gain
+    params = effect_params.params
+    local_pitch = params.pitch_shift
+    local_volume = params.volume
+    local_distortion = params.distortion_gain
     
     # Simple pitch shift using interpolation (faster than SoX)
     if local_pitch != 0:
@@ -180,61 +187,147 @@ def apply_effects_realtime(audio):
 
 def apply_basic_effects(audio):
     """Very basic effects as fallback"""
-    global volume
-    with param_lock:
-        local_volume = volume
-    return audio * local_volume
-
-# Web server for control interface
-class WebInterface(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/":
-            self.send_response(200)
-            self.send_header("Content-type", "text/html")
-            self.end_headers()
-            with open("index.html", "rb") as f:
-                self.wfile.write(f.read())
-        elif self.path == "/settings":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            with param_lock:
-                settings = {
-                    "pitch_shift": pitch_shift,
-                    "distortion_gain": distortion_gain,
-                    "reverb_room_size": reverb_room_size,
-                    "volume": volume
-                }
-            self.wfile.write(json.dumps(settings).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-    def do_POST(self):
-        if self.path == "/settings":
-            content_length = int(self.headers["Content-Length"])
-            post_data = self.rfile.read(content_length)
-            params = json.loads(post_data.decode())
-            
-            with param_lock:
-                global pitch_shift, distortion_gain, reverb_room_size, volume
-                pitch_shift = float(params.get("pitch_shift", pitch_shift))
-                distortion_gain = float(params.get("distortion_gain", distortion_gain))
-                reverb_room_size = float(params.get("reverb_room_size", reverb_room_size))
-                volume = float(params.get("volume", volume))
-            
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "success"}).encode())
+    return audio * effect_params.params.volume
+
+# Control plane: runs on the main event loop next to the audio stream
+def get_settings(request):
+    return Response.json(effect_params.params._asdict())
+
+def post_settings(request):
+    # Coefficients are compiled here, on the event loop; the audio thread
+    # only picks up the finished snapshot
+    effect_params.update(**request_json(request))
+    return Response.json({"status": "success"})
+
+def get_metrics(request):
+    """Callback metrics as JSON, or Prometheus text with ?format=prometheus"""
+    if callback_metrics is None:
+        return Response(503, b"Audio stream not running")
+    if request.query.get("format", "json") == "prometheus":
+        return Response(200, callback_metrics.prometheus().encode(), "text/plain; version=0.0.4")
+    return Response.json(callback_metrics.summary())
+
+def get_governor(request):
+    """The quality governor's level and decision log"""
+    if quality_governor is None:
+        return Response(503, b"Audio stream not running")
+    return Response.json(quality_governor.status())
+
+def post_governor(request):
+    # {"level": "<name>"} pins a level, {"enabled": true} resumes adapting
+    if quality_governor is None:
+        return Response(503, b"Audio stream not running")
+    command = request_json(request)
+    if "level" in command:
+        quality_governor.pin(command["level"])
+    if command.get("enabled"):
+        quality_governor.resume()
+    return Response.json(quality_governor.status())
+
+def get_presets(request):
+    if preset_store is None:
+        return Response(503, b"Audio stream not running")
+    return Response.json({"active": preset_store.active,
+                          "presets": {name: preset_store.get(name)._asdict() for name in preset_store.names()}})
+
+def post_presets(request):
+    # {"name": ..., <fields>} saves a preset; missing fields come from the current settings
+    if preset_store is None:
+        return Response(503, b"Audio stream not running")
+    data = request_json(request)
+    params = effect_params.params._replace(**parse_params(data))
+    preset_store.save(str(data.get("name", "")), params)
+    return Response.json({"status": "success"})
+
+def delete_presets(request):
+    if preset_store is None:
+        return Response(503, b"Audio stream not running")
+    preset_store.delete(request.query.get("name", ""))
+    return Response.json({"status": "success"})
+
+def post_preset_activate(request):
+    # {"name": ..., "crossfade": seconds}
+    if preset_store is None:
+        return Response(503, b"Audio stream not running")
+    data = request_json(request)
+    preset_store.activate(str(data.get("name", "")), data.get("crossfade", 0.0))
+    broadcast(params_message())
+    return Response.json({"status": "success", "active": preset_store.active})
+
+def params_message():
+    return {"type": "params", "preset": preset_store.active if preset_store else None,
+            **effect_params.params._asdict()}
+
+async def websocket_control(ws):
+    """Live control channel: parameter changes in, parameters to every client out"""
+    # Meters and latency are pushed separately by push_telemetry()
+    telemetry_clients.add(ws)
+    try:
+        ws.send_json(params_message())
+        while True:
+            message = await ws.receive()
+            if message is None:
+                break
+            try:
+                changes = json.loads(message)
+                if not isinstance(changes, dict):
+                    raise ValueError("expected a JSON object")
+                if "preset" in changes:
+                    if preset_store is None:
+                        raise ValueError("Audio stream not running")
+                    preset_store.activate(str(changes.pop("preset")), changes.pop("crossfade", 0.0))
+                if changes:
+                    effect_params.update(**changes)
+            except (TypeError, ValueError) as e:
+                ws.send_json({"type": "error", "message": str(e)})
+                continue
+            broadcast(params_message())
+    finally:
+        telemetry_clients.discard(ws)
+
+def broadcast(data):
+    """Send one message to every WebSocket client, encoding it once"""
+    text = json.dumps(data, separators=(",", ":"))
+    for ws in list(telemetry_clients):
+        ws.send(text)
+
+def telemetry_message():
+    metrics = callback_metrics
+    return {
+        "type": "meters",
+        "levels": level_meter.read(),
+        "latency": {
+            "engine_samples": metrics.engine_latency if metrics else None,
+            "stream_s": metrics.stream_latency if metrics else None,
+            "sample_rate": SAMPLE_RATE,
+        },
+    }
+
+async def push_telemetry(interval=TELEMETRY_INTERVAL):
+    """Push decimated meters and latency to WebSocket clients at a fixed rate"""
+    while True:
+        await asyncio.sleep(interval)
+        if telemetry_clients:
+            broadcast(telemetry_message())
         else:
-            self.send_response(404)
-            self.end_headers()
+            level_meter.read()  # keep the read position current
 
-def run_server():
-    """Run the web server."""
-    server = HTTPServer(("0.0.0.0", 8000), WebInterface)
-    server.serve_forever()
+def create_control_server(host="0.0.0.0", port=8000):
+    """Build the control server with the web UI and JSON endpoints"""
+    server = ControlServer(host, port)
+    server.static("/", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html"),
+                  "text/html; charset=utf-8")
+    server.route("GET", "/settings", get_settings)
+    server.route("POST", "/settings", post_settings)
+    server.route("GET", "/metrics", get_metrics)
+    server.route("GET", "/governor", get_governor)
+    server.route("POST", "/governor", post_governor)
+    server.route("GET", "/presets", get_presets)
+    server.route("POST", "/presets", post_presets)
+    server.route("DELETE", "/presets", delete_presets)
+    server.route("POST", "/presets/activate", post_preset_activate)
+    server.websocket("/ws", websocket_control)
+    return server
 
 def find_suitable_audio_device():
     """Find a suitable audio device with input and output capabilities"""
@@ -303,9 +396,30 @@ def test_audio_configuration(device_id=None, sample_rate=44100, channels=2, bloc
         print(f"❌ Audio configuration test failed: {e}")
         return False
 
+def cached_audio_config(cached):
+    """(sample_rate, channels, blocksize) from a cache entry, or None if it is malformed"""
+    try:
+        config = tuple(cached[name] for name in ('sample_rate', 'channels', 'blocksize'))
+    except (KeyError, TypeError):
+        return None
+    if not all(type(value) is int and value > 0 for value in config):
+        return None
+    return config
+
 def get_best_audio_config():
-    """Find the best working audio configuration"""
+    """Find the best working audio configuration, trying the cached one first"""
     device_id, device_info = find_suitable_audio_device()
+    device_name = device_info['name'] if device_info else 'default'
+    key = config_key(device_name, alsa_cards())
+    
+    cached = cached_audio_config(device_cache.load(key))
+    if cached:
+        sample_rate, channels, blocksize = cached
+        print(f"\n⚡ Trying cached configuration: {sample_rate}Hz, {channels}ch, {blocksize} samples")
+        if test_audio_configuration(device_id, sample_rate, channels, blocksize):
+            return device_id, sample_rate, channels, blocksize
+        print("⚠️  Cached configuration no longer works, probing again")
+        device_cache.forget(key)
     
     # Test different configurations
     configs = [
@@ -321,6 +435,8 @@ def get_best_audio_config():
     for sample_rate, channels, blocksize in configs:
         print(f"\n🔧 Trying configuration: {sample_rate}Hz, {channels}ch, {blocksize} samples")
         if test_audio_configuration(device_id, sample_rate, channels, blocksize):
+            device_cache.save(key, {'device_name': device_name, 'sample_rate': sample_rate,
+                                    'channels': channels, 'blocksize': blocksize})
             return device_id, sample_rate, channels, blocksize
     
     # If all else fails, try default device with basic config
@@ -329,39 +445,15 @@ def get_best_audio_config():
         return None, 22050, 1, 512
     
     raise Exception("No working audio configuration found")
-    
-    try:
-        # Start audio stream
-        with sd.Stream(device=(device, device) if device else None,
-                       samplerate=SAMPLE_RATE,
-                       blocksize=BLOCK_SIZE,
-                       channels=CHANNELS,
-                       callback=audio_callback,
-                       dtype="float32"):
-            
-            print("\n" + "=" * 60)
-            print("🎤 Voice changer is now running!")
-            print("=" * 60)
-            print("Access the web interface at:")
-            print("  • Local: http://localhost:8000")
-            print("  • Network: http://<your-ip>:8000")
-            print("\nPress Ctrl+C to stop...")
-            print("=" * 60)
-            
-            # Keep the stream alive
-            while True:
-                await asyncio.sleep(1)
-                
-    except KeyboardInterrupt:
-        print("\n🛑 Voice changer stopped by user")
-    except Exception as e:
-        print(f"\n❌ Error starting audio stream: {e}")
-        print("Make sure:")
-        print("  • Audio devices are properly connected")
-        print("  • No other applications are using the audio device")
-        print("  • You're running in the SpaceBalls virtual environment")
 
 async def main():
+    global SAMPLE_RATE, CHANNELS, BLOCK_SIZE, dsp_engine, callback_metrics, quality_governor, preset_store
+    timer = StartupTimer()
+    timer.add("module imports", MODULE_IMPORT_SECONDS)
+    
+    # Load scipy.signal (and PortAudio) in the background while we print and probe
+    prefetch('scipy.signal', *(['sounddevice'] if STREAM_BACKEND == 'portaudio' else []))
+    
     print("=" * 60)
     print("🎭 Dark Helmet Voice Changer - SpaceBalls Edition")
     print("=" * 60)
@@ -373,18 +465,22 @@ async def main():
     print(f"Python version: {sys.version}")
     print(f"Platform: {platform.system()} {platform.machine()}")
     
-    # Start web server in a separate thread
-    server_thread = threading.Thread(target=run_server, daemon=True)
-    server_thread.start()
-    print(f"🌐 Web interface started at http://0.0.0.0:8000")
+    # Serve the control interface from this event loop (no server thread)
+    with timer.phase("web server"):
+        control_server = await create_control_server().start()
+    print(f"🌐 Web interface started at http://0.0.0.0:{control_server.port}")
     
     try:
         # Find the best audio configuration
         print("\n🔧 Configuring audio system...")
-        device_id, sample_rate, channels, blocksize = get_best_audio_config()
+        with timer.phase("audio config"):
+            if STREAM_BACKEND == 'portaudio':
+                device_id, sample_rate, channels, blocksize = get_best_audio_config()
+            else:
+                print(f"🔁 Using hardware-free loopback backend: {STREAM_BACKEND} ({STREAM_CLOCK} clock)")
+                device_id, sample_rate, channels, blocksize = None, SAMPLE_RATE, CHANNELS, BLOCK_SIZE
         
         # Update global variables with working configuration
-        global SAMPLE_RATE, CHANNELS, BLOCK_SIZE
         SAMPLE_RATE = sample_rate
         CHANNELS = channels
         BLOCK_SIZE = blocksize
@@ -395,65 +491,55 @@ async def main():
         print(f"   Channels: {channels}")
         print(f"   Block size: {blocksize}")
         
-        # Update the audio callback to know the current sample rate
-        def audio_callback_with_config(indata, outdata, frames, time, status):
-            """Audio callback with current configuration"""
-            if status:
-                print(f"Audio callback status: {status}")
-            
-            try:
-                # Handle different input/output channel configurations
-                input_data = indata.copy()
-                
-                # Convert to mono if needed for processing
-                if input_data.ndim == 2 and input_data.shape[1] > 1:
-                    mono_input = np.mean(input_data, axis=1, keepdims=True)
-                else:
-                    mono_input = input_data
-                
-                # Apply notch filter to reduce feedback
-                notch_freq = 1000  # Hz
-                Q = 30.0
-                try:
-                    b, a = signal.iirnotch(notch_freq / (sample_rate / 2), Q)
-                    filtered_data = signal.lfilter(b, a, mono_input, axis=0)
-                except:
-                    filtered_data = mono_input
-                
-                # Apply voice effects
-                try:
-                    processed = apply_effects_realtime(filtered_data)
-                except:
-                    processed = apply_basic_effects(filtered_data)
-                
-                # Match output channels
-                if outdata.ndim == 2:
-                    if processed.ndim == 1 or processed.shape[1] == 1:
-                        # Duplicate mono to stereo
-                        mono_data = processed.flatten()[:frames]
-                        outdata[:len(mono_data), 0] = mono_data
-                        if outdata.shape[1] > 1:
-                            outdata[:len(mono_data), 1] = mono_data
-                        # Fill remaining with zeros
-                        if len(mono_data) < frames:
-                            outdata[len(mono_data):] = 0
-                    else:
-                        outdata[:] = processed[:frames]
-                else:
-                    outdata[:] = processed[:frames].flatten()
-                    
-            except Exception as e:
-                print(f"Audio processing error: {e}")
-                # Silence output on error
-                outdata.fill(0)
+        # One engine per stream: coefficients are designed once for this sample rate
+        with timer.phase("DSP engine"):
+            engine = create_engine(sample_rate, channels, blocksize)
+            presets = PresetStore(engine, effect_params)
+            presets.warm()
+        preset_store = presets
+        dsp_engine = engine
+        metrics = create_metrics(engine)
+        callback_metrics = metrics
+        if engine.resampler is not None:
+            print(f"   Internal DSP rate: {engine.sample_rate:g}Hz "
+                  f"(polyphase resampling adds {engine.resampler.latency} samples)")
+        print(f"   Effect chain latency: {engine.latency} samples "
+              f"({1000 * engine.latency / sample_rate:.1f} ms)")
+
+        pipeline = None
+        if PIPELINE_BLOCKS > 0:
+            # The DSP thread records block timings; the callback only copies
+            process_block = snapshot_processor(engine, effect_params, channels, channels)
+            pipeline = PipelinedProcessor(process_block, blocksize, channels, PIPELINE_BLOCKS, metrics)
+            metrics.engine_latency += pipeline.latency
+            print(f"   Pipelined DSP thread: {PIPELINE_BLOCKS} blocks lookahead, +{pipeline.latency} samples "
+                  f"({1000 * pipeline.latency / sample_rate:.1f} ms)")
+            pipeline.start()
+
+        governor = QualityGovernor(engine, effect_params, metrics,
+                                   extra_latency=pipeline.latency if pipeline else 0)
+        governor.enabled = GOVERNOR_ENABLED
+        quality_governor = governor
+
+        # Built once for this stream's channel layout; no per-block shape checks
+        audio_callback_with_config = build_callback(engine, effect_params, metrics,
+                                                    channels, channels, pipeline)
         
         # Start audio stream with the working configuration
-        with sd.Stream(device=(device_id, device_id) if device_id else None,
-                       samplerate=sample_rate,
-                       blocksize=blocksize,
-                       channels=channels,
-                       callback=audio_callback_with_config,
-                       dtype="float32"):
+        stream_started = timer.clock()
+        with open_stream(STREAM_BACKEND,
+                         clock=STREAM_CLOCK,
+                         output_path=STREAM_OUTPUT,
+                         device=(device_id, device_id) if device_id else None,
+                         samplerate=sample_rate,
+                         blocksize=blocksize,
+                         channels=channels,
+                         callback=audio_callback_with_config,
+                         dtype="float32") as stream:
+            metrics.set_stream_latency(stream.latency)
+            telemetry_task = asyncio.create_task(push_telemetry())
+            timer.add("stream start", timer.clock() - stream_started)
+            timer.report()
             
             print("\n" + "=" * 60)
             print("🎤 Dark Helmet Voice Changer is now running!")
@@ -466,13 +552,43 @@ async def main():
             print("  • Distortion: Add robotic/helmet effect")
             print("  • Reverb: Simulate helmet acoustics")
             print("  • Volume: Control output level")
-            print(f"\n⚙️  Audio: {sample_rate}Hz, {channels}ch, {blocksize} samples")
+            print(f"\n⚙️  Audio: {sample_rate}Hz, {channels}ch, {blocksize} samples "
+                  f"({'per-channel' if MULTICHANNEL else 'mono'} processing)")
+            print("📈 Callback metrics at http://<your-ip>:8000/metrics")
+            print("📡 Live controls and meters over WebSocket at ws://<your-ip>:8000/ws")
+            print(f"🎚️  Quality governor {'on' if GOVERNOR_ENABLED else 'off'}: http://<your-ip>:8000/governor")
             print("\n🛑 Press Ctrl+C to stop...")
             print("=" * 60)
             
-            # Keep the stream alive
-            while True:
-                await asyncio.sleep(1)
+            # Keep the stream alive, adapting quality and reporting xruns outside the audio thread
+            reported_xruns = reported_errors = 0
+            while stream.active:
+                await asyncio.sleep(GOVERNOR_INTERVAL)
+                governor.evaluate()
+                if metrics.xrun_count != reported_xruns:
+                    reported_xruns = metrics.xrun_count
+                    print(f"⚠️  Audio xruns so far: {metrics.xruns}")
+                if metrics.errors != reported_errors:
+                    # At most one line per interval however many blocks failed
+                    print(f"❌ Audio processing errors: {metrics.errors - reported_errors} "
+                          f"(last: {metrics.last_error!r})")
+                    reported_errors = metrics.errors
+
+        telemetry_task.cancel()
+        if pipeline is not None:
+            pipeline.stop()
+
+        if isinstance(stream, LoopbackStream):
+            stats = stream.stats
+            print(f"\n🔁 Loopback finished: {stats['blocks']} blocks, "
+                  f"{stats['audio_seconds']:.1f}s audio in {stats['wall_seconds']:.2f}s "
+                  f"({stats['audio_seconds'] / max(stats['wall_seconds'], 1e-9):.1f}x realtime), "
+                  f"{stats['xruns']} xruns")
+            summary = metrics.summary()
+            print(f"   Block time p50/p99/max: {summary['processing_ms']['p50']:.2f}/"
+                  f"{summary['processing_ms']['p99']:.2f}/{summary['processing_ms']['max']:.2f} ms")
+            if STREAM_OUTPUT:
+                print(f"   Output written to {STREAM_OUTPUT}")
                 
     except KeyboardInterrupt:
         print("\n🛑 Voice changer stopped by user")
@@ -487,6 +603,8 @@ async def main():
         print("  • Ensure you're in the SpaceBalls virtual environment")
         print("\n💡 On Raspberry Pi, try:")
         print("  sudo apt update && sudo apt install alsa-utils pulseaudio")
+    finally:
+        await control_server.close()
 
 if platform.system() == "Emscripten":
     asyncio.ensure_future(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Streaming WAV I/O for Dark Helmet Voice Changer
+Memory-mapped, block-by-block reading and writing so long recordings never load into RAM
+"""
+
+import struct
+
+import numpy as np
+
+from startup import LazyModule
+
+wavfile = LazyModule('scipy.io.wavfile')
+
+# WAVE format tags for the sample types we map directly
+WAVE_FORMATS = {np.dtype('<i2'): 1, np.dtype('<f4'): 3}
+
+# Size of the canonical RIFF/fmt/data header written by WavWriter
+HEADER_SIZE = 44
+
+
+class WavReader:
+    """Memory-mapped int16 or float32 WAV file read as float32 blocks
+
+    Nothing is read until a block is asked for; each block is converted
+    into a reused buffer, so memory use does not grow with file length.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sample_rate, data = wavfile.read(path, mmap=True)
+        self.data = data if data.ndim == 2 else data[:, None]
+        self.mono = data.ndim == 1
+        self.frames, self.channels = self.data.shape
+        self.dtype = data.dtype
+        self.scale = None
+        if np.issubdtype(self.dtype, np.integer):
+            self.scale = np.float32(1.0 / np.iinfo(self.dtype).max)
+
+    @property
+    def seconds(self):
+        return self.frames / self.sample_rate
+
+    def read(self, start, stop, out=None):
+        """Frames [start, stop) as float32, zero padded outside the file"""
+        if out is None:
+            out = np.empty((stop - start, self.channels), dtype=np.float32)
+        lo, hi = max(start, 0), min(stop, self.frames)
+        if hi <= lo:
+            out.fill(0)
+            return out
+        out[:lo - start] = 0
+        out[hi - start:] = 0
+        target = out[lo - start:hi - start]
+        target[:] = self.data[lo:hi]
+        if self.scale is not None:
+            target *= self.scale
+        return out
+
+    def blocks(self, blocksize, start=0, stop=None):
+        """Iterate float32 (blocksize, channels) blocks; the final one is zero padded
+
+        The same buffer is yielded every time, so copy a block to keep it.
+        """
+        stop = self.frames if stop is None else stop
+        buffer = np.empty((blocksize, self.channels), dtype=np.float32)
+        for position in range(start, stop, blocksize):
+            yield self.read(position, position + blocksize, buffer)
+
+    def close(self):
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class WavWriter:
+    """Memory-mapped WAV file of known length written block by block
+
+    The file is created at its final size and its data chunk mapped, so
+    writes go straight to the page cache instead of accumulating in RAM.
+    Float blocks are converted to the file's sample type (int16 or float32).
+    """
+
+    def __init__(self, path, sample_rate, channels, frames, dtype=np.int16):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = frames
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        if self.dtype not in WAVE_FORMATS:
+            raise ValueError(f"Unsupported WAV sample type: {dtype}")
+        self.position = 0
+        self._buffer = None
+
+        data_size = frames * channels * self.dtype.itemsize
+        with open(path, 'wb') as f:
+            f.write(self._header(data_size))
+            f.truncate(HEADER_SIZE + data_size)
+        self.data = None
+        if frames:
+            self.data = np.memmap(path, dtype=self.dtype, mode='r+', offset=HEADER_SIZE,
+                                  shape=(frames, channels))
+
+    def _header(self, data_size):
+        width = self.dtype.itemsize
+        return (b'RIFF' + struct.pack('<I', HEADER_SIZE - 8 + data_size) + b'WAVE'
+                + b'fmt ' + struct.pack('<IHHIIHH', 16, WAVE_FORMATS[self.dtype], self.channels,
+                                        self.sample_rate, self.sample_rate * self.channels * width,
+                                        self.channels * width, 8 * width)
+                + b'data' + struct.pack('<I', data_size))
+
+    def write(self, block):
+        """Append a float (frames, channels) block; anything past the end is dropped"""
+        frames = min(len(block), self.frames - self.position)
+        if frames <= 0:
+            return
+        target = self.data[self.position:self.position + frames]
+        if self.dtype.kind == 'f':
+            target[:] = block[:frames]
+        else:
+            if self._buffer is None or len(self._buffer) < frames:
+                self._buffer = np.empty((max(frames, 1024), self.channels), dtype=np.float32)
+            peak = np.iinfo(self.dtype).max
+            scaled = self._buffer[:frames]
+            np.multiply(block[:frames], peak, out=scaled)
+            np.rint(scaled, out=scaled)
+            np.clip(scaled, -peak - 1, peak, out=scaled)
+            target[:] = scaled
+        self.position += frames
+
+    def close(self):
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,57 @@
+# Unit tests for the offline realtime benchmark
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from scipy.io import wavfile
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    """Tests for the headless benchmark harness"""
+
+    def test_reports_latency_and_rtf(self):
+        """Each case reports real-time factor and per-block latency percentiles"""
+        results = benchmark.run_benchmarks(['notch', 'engine_delay'], configs=[(22050, 512)],
+                                           seconds=0.5)
+        self.assertEqual(len(results), 2)
+        for result in results:
+            for key in ('rtf', 'p50_ms', 'p99_ms', 'max_ms', 'alloc_kib_per_block'):
+                self.assertIn(key, result)
+            self.assertGreater(result['rtf'], 0.0)
+            self.assertLessEqual(result['p50_ms'], result['max_ms'])
+
+    def test_live_config_case(self):
+        """The shipped chain (feedback, gate, oversampling, vocoder) is benchmarked too"""
+        results = benchmark.run_benchmarks(['engine_live_robot'], configs=[(22050, 512)],
+                                           seconds=0.5, measure_allocations=False)
+        self.assertGreater(results[0]['rtf'], 0.0)
+
+    def test_recorded_wav_is_resampled(self):
+        """Recorded input is converted to the benchmark rate and channel count"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'line.wav')
+            wavfile.write(path, 16000, (np.ones(16000) * 1000).astype(np.int16))
+            audio = benchmark.load_wav(path, 22050, channels=2)
+        self.assertEqual(audio.shape, (22050, 2))
+        self.assertEqual(audio.dtype, np.float32)
+
+    def test_max_rtf_gate(self):
+        """The CLI fails when a case is slower than the allowed real-time factor"""
+        argv = ['--case', 'notch', '--seconds', '0.2', '--no-alloc', '--max-rtf', '0']
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                self.assertEqual(benchmark.main(argv), 1)
+            finally:
+                sys.stdout = stdout
+
+
+if __name__ == '__main__':
+    unittest.main()
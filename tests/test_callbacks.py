@@ -0,0 +1,122 @@
+# Unit tests for the layout-specialised audio callback builder
+import unittest
+import sys
+import os
+import contextlib
+import io
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from callbacks import build_callback, layout_processor
+from dsp_engine import DSPEngine
+from meters import LevelMeter
+from metrics import CallbackMetrics
+from params import ParamStore
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 256
+
+
+def noise(frames, channels, seed=0):
+    rng = np.random.default_rng(seed)
+    return (0.1 * rng.standard_normal((frames, channels))).astype(np.float32)
+
+
+class TestLayoutProcessor(unittest.TestCase):
+    """Specialised layouts must match a plain downmix, chain and upmix"""
+
+    def check_layout(self, in_channels, out_channels):
+        reference = DSPEngine(SAMPLE_RATE, in_channels, BLOCK_SIZE)
+        engine = DSPEngine(SAMPLE_RATE, in_channels, BLOCK_SIZE)
+        for e in (reference, engine):
+            e.set_params(-0.3, 1.5, 0.5, 0.8)
+        process = layout_processor(engine, in_channels, out_channels)
+
+        for seed in range(8):
+            indata = noise(BLOCK_SIZE, in_channels, seed)
+            expected = np.zeros((BLOCK_SIZE, out_channels), dtype=np.float32)
+            outdata = np.zeros((BLOCK_SIZE, out_channels), dtype=np.float32)
+            expected[:] = reference.process_block(indata.mean(axis=1))[:, None]
+            process(indata, outdata)
+            np.testing.assert_allclose(outdata, expected, atol=1e-6)
+
+    def test_mono_to_mono(self):
+        self.check_layout(1, 1)
+
+    def test_stereo_to_stereo(self):
+        self.check_layout(2, 2)
+
+    def test_mono_to_stereo(self):
+        self.check_layout(1, 2)
+
+    def test_multichannel_engine_passes_blocks_through(self):
+        """A multichannel engine processes the stream's blocks directly"""
+        engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE, multichannel=True)
+        reference = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE, multichannel=True)
+        process = layout_processor(engine, 2, 2)
+        indata = noise(BLOCK_SIZE, 2)
+        outdata = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+        expected = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+        process(indata, outdata)
+        reference.process_block(indata, expected)
+        np.testing.assert_array_equal(outdata, expected)
+        with self.assertRaises(ValueError):
+            layout_processor(engine, 1, 2)
+
+    def test_meter_is_fed(self):
+        """An engine with a meter gets one reading per block"""
+        engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE)
+        engine.meter = LevelMeter()
+        process = layout_processor(engine, 2, 2)
+        process(noise(BLOCK_SIZE, 2), np.zeros((BLOCK_SIZE, 2), dtype=np.float32))
+        self.assertEqual(engine.meter.blocks, 1)
+
+
+class TestBuildCallback(unittest.TestCase):
+    """Tests for the callback wrapped around a processor"""
+
+    def setUp(self):
+        self.engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE)
+        self.store = ParamStore()
+        self.store.bind(self.engine.compile)
+        self.metrics = CallbackMetrics(SAMPLE_RATE)
+
+    def test_applies_snapshot_and_records_timing(self):
+        callback = build_callback(self.engine, self.store, self.metrics, 2, 2)
+        outdata = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+        callback(noise(BLOCK_SIZE, 2), outdata, BLOCK_SIZE, None, None)
+        self.assertIs(self.engine.compiled, self.store.snapshot.compiled)
+        self.assertEqual(self.metrics.blocks, 1)
+
+    def test_error_silences_output(self):
+        """A failing block produces silence rather than raising into PortAudio"""
+        callback = build_callback(self.engine, self.store, self.metrics, 2, 2)
+        outdata = np.ones((2 * BLOCK_SIZE, 2), dtype=np.float32)
+        with contextlib.redirect_stdout(io.StringIO()) as printed:
+            for _ in range(3):
+                callback(noise(2 * BLOCK_SIZE, 2), outdata, 2 * BLOCK_SIZE, None, None)
+        self.assertFalse(outdata.any())
+        self.assertEqual(printed.getvalue(), '')
+        self.assertEqual(self.metrics.errors, 3)
+        self.assertEqual(self.metrics.summary()['errors'], 3)
+        self.assertIn('darkhelmet_callback_errors_total 3', self.metrics.prometheus())
+
+    def test_pipeline_only_exchanges_blocks(self):
+        """With a pipeline the callback hands blocks over without processing"""
+        calls = []
+
+        class Pipeline:
+            def callback(self, indata, outdata, status):
+                calls.append(status)
+
+        callback = build_callback(self.engine, self.store, self.metrics, 2, 2, Pipeline())
+        callback(noise(BLOCK_SIZE, 2), np.zeros((BLOCK_SIZE, 2), dtype=np.float32), BLOCK_SIZE, None, 'ok')
+        self.assertEqual(calls, ['ok'])
+        self.assertEqual(self.metrics.blocks, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+# Unit tests for the asyncio control server
+import unittest
+import sys
+import os
+import asyncio
+import base64
+import contextlib
+import gzip
+import io
+import json
+import tempfile
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from control_server import ControlServer, Response, WebSocket, request_json
+
+
+async def send(reader, writer, method, path, headers=None, body=b''):
+    """Send one request on an open connection and read the response"""
+    lines = [f"{method} {path} HTTP/1.1", "Host: helmet"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    lines.append(f"Content-Length: {len(body)}")
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode().split('\r\n')
+    status = int(head[0].split()[1])
+    response_headers = dict(line.split(': ', 1) for line in head[1:] if line)
+    payload = await reader.readexactly(int(response_headers['Content-Length']))
+    return status, response_headers, payload
+
+
+async def open_websocket(port, path='/ws'):
+    """Connect and complete the WebSocket handshake"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET {path} HTTP/1.1\r\nHost: helmet\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                  f"Sec-WebSocket-Version: 13\r\n\r\n").encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    return reader, writer, head
+
+
+def client_frame(opcode, payload, fin=True):
+    """A masked client-to-server frame"""
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bytes(((0x80 if fin else 0) | opcode, 0x80 | len(payload))) + mask + masked
+
+
+async def server_frame(reader):
+    first, length = await reader.readexactly(2)
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), 'big')
+    return first & 0x0F, await reader.readexactly(length)
+
+
+class TestControlServer(unittest.TestCase):
+    """Tests for routing, keep-alive and cached static assets"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = os.path.join(self.tmp.name, 'index.html')
+        with open(self.index, 'w') as f:
+            f.write('<html>' + 'Dark Helmet ' * 200 + '</html>')
+        self.settings = {'volume': 0.8}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def post_settings(self, request):
+        self.settings.update(request_json(request))
+        return Response.json({'status': 'success'})
+
+    def run_client(self, client):
+        async def scenario():
+            server = ControlServer('127.0.0.1', 0)
+            server.static('/', self.index, 'text/html')
+            server.route('GET', '/settings', lambda request: Response.json(self.settings))
+            server.route('POST', '/settings', self.post_settings)
+            server.route('POST', '/double', lambda request: Response.json(
+                {'volume': request_json(request)['volume'] * 2.0}))
+            server.route('GET', '/broken', lambda request: 1 / 0)
+            await server.start()
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                try:
+                    return await client(reader, writer)
+                finally:
+                    writer.close()
+            finally:
+                await server.close()
+        return asyncio.run(scenario())
+
+    def test_keep_alive_json_round_trip(self):
+        """Several requests share one connection"""
+        async def client(reader, writer):
+            results = [await send(reader, writer, 'POST', '/settings', body=b'{"volume": 0.5}')]
+            results.append(await send(reader, writer, 'GET', '/settings'))
+            results.append(await send(reader, writer, 'GET', '/nope'))
+            results.append(await send(reader, writer, 'DELETE', '/settings'))
+            results.append(await send(reader, writer, 'POST', '/settings', body=b'[1, 2]'))
+            return results
+
+        posted, fetched, missing, wrong_method, bad_json = self.run_client(client)
+        self.assertEqual(posted[0], 200)
+        self.assertEqual(json.loads(fetched[2]), {'volume': 0.5})
+        self.assertEqual(fetched[1]['Connection'], 'keep-alive')
+        self.assertEqual(missing[0], 404)
+        self.assertEqual(wrong_method[0], 405)
+        self.assertEqual(bad_json[0], 400)
+
+    def test_malformed_body_is_a_client_error(self):
+        """Missing fields and wrong JSON types answer 400 and keep the connection"""
+        async def client(reader, writer):
+            results = [await send(reader, writer, 'POST', '/double', body=b'{}')]
+            results.append(await send(reader, writer, 'POST', '/double', body=b'{"volume": [1]}'))
+            results.append(await send(reader, writer, 'POST', '/double', body=b'{"volume": 0.25}'))
+            return results
+
+        missing, wrong_type, ok = self.run_client(client)
+        self.assertEqual(missing[0], 400)
+        self.assertIn('volume', json.loads(missing[2])['message'])
+        self.assertEqual(wrong_type[0], 400)
+        self.assertEqual(json.loads(ok[2]), {'volume': 0.5})
+
+    def test_handler_error_is_a_server_error(self):
+        """An unexpected exception answers 500 and keeps the connection"""
+        async def client(reader, writer):
+            results = [await send(reader, writer, 'GET', '/broken')]
+            results.append(await send(reader, writer, 'GET', '/settings'))
+            return results
+
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            broken, ok = self.run_client(client)
+        self.assertEqual(broken[0], 500)
+        self.assertEqual(json.loads(broken[2])['status'], 'error')
+        self.assertEqual(ok[0], 200)
+        self.assertEqual(log.getvalue().count('ZeroDivisionError'), 1)
+
+    def test_static_asset_etag_and_gzip(self):
+        """index.html is served gzipped, then revalidated with 304"""
+        async def client(reader, writer):
+            first = await send(reader, writer, 'GET', '/', {'Accept-Encoding': 'gzip, deflate'})
+            second = await send(reader, writer, 'GET', '/', {'If-None-Match': first[1]['ETag']})
+            return first, second
+
+        first, second = self.run_client(client)
+        self.assertEqual(first[0], 200)
+        self.assertEqual(first[1]['Content-Encoding'], 'gzip')
+        self.assertIn(b'Dark Helmet', gzip.decompress(first[2]))
+        self.assertEqual(second[0], 304)
+        self.assertEqual(second[2], b'')
+
+    def test_static_asset_reloads_when_changed(self):
+        """Editing the file changes the body and ETag"""
+        async def client(reader, writer):
+            first = await send(reader, writer, 'GET', '/')
+            with open(self.index, 'w') as f:
+                f.write('<html>new</html>')
+            os.utime(self.index, ns=(0, 10 ** 9))
+            second = await send(reader, writer, 'GET', '/')
+            return first, second
+
+        first, second = self.run_client(client)
+        self.assertNotEqual(first[1]['ETag'], second[1]['ETag'])
+        self.assertEqual(second[2], b'<html>new</html>')
+
+    def test_many_concurrent_clients(self):
+        """Fifty simultaneous connections are all served"""
+        async def client(reader, writer):
+            async def one():
+                r, w = await asyncio.open_connection('127.0.0.1', writer.get_extra_info('peername')[1])
+                try:
+                    return (await send(r, w, 'GET', '/settings'))[0]
+                finally:
+                    w.close()
+            return await asyncio.gather(*(one() for _ in range(50)))
+
+        self.assertEqual(self.run_client(client), [200] * 50)
+
+
+class TestWebSocket(unittest.TestCase):
+    """Tests for the WebSocket upgrade and framing"""
+
+    def run_ws(self, client, handler):
+        async def scenario():
+            server = ControlServer('127.0.0.1', 0)
+            server.websocket('/ws', handler)
+            await server.start()
+            try:
+                return await client(server.port)
+            finally:
+                await server.close()
+        return asyncio.run(scenario())
+
+    def test_handshake_echo_ping_and_close(self):
+        """Fragmented text is reassembled, pings answered and close echoed"""
+        async def echo(ws):
+            while (message := await ws.receive()) is not None:
+                ws.send('echo:' + message)
+
+        async def client(port):
+            reader, writer, head = await open_websocket(port)
+            writer.write(client_frame(0x1, b'{"vol', fin=False))
+            writer.write(client_frame(0x0, b'ume": 1}'))
+            echoed = await server_frame(reader)
+            writer.write(client_frame(0x9, b'hi'))
+            pong = await server_frame(reader)
+            writer.write(client_frame(0x8, (1000).to_bytes(2, 'big')))
+            closed = await server_frame(reader)
+            writer.close()
+            return head, echoed, pong, closed
+
+        head, echoed, pong, closed = self.run_ws(client, echo)
+        self.assertIn(b'101 Switching Protocols', head)
+        self.assertEqual(echoed, (0x1, b'echo:{"volume": 1}'))
+        self.assertEqual(pong, (0xA, b'hi'))
+        self.assertEqual(closed, (0x8, (1000).to_bytes(2, 'big')))
+
+    def test_invalid_utf8_closes_with_1007(self):
+        """A text message that is not UTF-8 closes the socket instead of raising"""
+        received = []
+
+        async def record(ws):
+            received.append(await ws.receive())
+
+        async def client(port):
+            reader, writer, _ = await open_websocket(port)
+            writer.write(client_frame(0x1, b'\xff\xfe'))
+            closed = await server_frame(reader)
+            writer.close()
+            return closed
+
+        self.assertEqual(self.run_ws(client, record), (0x8, (1007).to_bytes(2, 'big')))
+        self.assertEqual(received, [None])
+
+    def test_accept_key(self):
+        """The handshake answers with the RFC 6455 sample accept value"""
+        async def idle(ws):
+            await ws.receive()
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b"GET /ws HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n")
+            head = await reader.readuntil(b'\r\n\r\n')
+            writer.close()
+            return head
+
+        self.assertIn(b'Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=', self.run_ws(client, idle))
+
+    def test_large_frames_use_extended_length(self):
+        self.assertEqual(WebSocket.frame(0x1, b'x' * 300)[:4], bytes((0x81, 126, 1, 44)))
+
+
+class TestVoiceChangerWebSocket(unittest.TestCase):
+    """The /ws control channel of the voice changer"""
+
+    def test_params_and_meters(self):
+        """Parameter changes are applied and broadcast; meters are pushed"""
+        import voice_changer
+        self.addCleanup(voice_changer.effect_params.update, **voice_changer.effect_params.params._asdict())
+
+        async def scenario():
+            server = await voice_changer.create_control_server('127.0.0.1', 0).start()
+            pusher = asyncio.create_task(voice_changer.push_telemetry(0.01))
+            try:
+                reader, writer, _ = await open_websocket(server.port)
+                hello = json.loads((await server_frame(reader))[1])
+                writer.write(client_frame(0x1, b'{"volume": 0.25}'))
+                messages = [json.loads((await server_frame(reader))[1]) for _ in range(3)]
+                writer.close()
+                return hello, messages
+            finally:
+                pusher.cancel()
+                await server.close()
+
+        hello, messages = asyncio.run(scenario())
+        self.assertEqual(hello['type'], 'params')
+        updates = [m for m in messages if m['type'] == 'params']
+        self.assertEqual(updates[0]['volume'], 0.25)
+        self.assertEqual(voice_changer.effect_params.params.volume, 0.25)
+        self.assertIn('meters', [m['type'] for m in messages])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# Unit tests for the streaming DSP engine
+import unittest
+import sys
+import os
+
+import numpy as np
+from scipy import signal
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import DSPEngine, NotchFilter
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 1024
+
+
+def noise(frames, channels=None, seed=0):
+    """Deterministic test noise"""
+    shape = (frames,) if channels is None else (frames, channels)
+    return (0.1 * np.random.default_rng(seed).standard_normal(shape)).astype(np.float32)
+
+
+class TestDSPEngine(unittest.TestCase):
+    """Tests for block-wise processing with carried state"""
+
+    def test_notch_state_matches_single_pass(self):
+        """Filtering block by block equals filtering the whole signal at once"""
+        audio = noise(BLOCK_SIZE * 8)
+        notch = NotchFilter(SAMPLE_RATE)
+        filtered = np.zeros_like(audio)
+        for i in range(0, len(audio), BLOCK_SIZE):
+            notch.process(audio[i:i + BLOCK_SIZE], filtered[i:i + BLOCK_SIZE])
+        b, a = signal.iirnotch(1000 / (SAMPLE_RATE / 2), 30.0)
+        np.testing.assert_allclose(filtered, signal.lfilter(b, a, audio), atol=1e-5)
+
+    def test_process_fills_stereo_output(self):
+        """Stereo in, stereo out with identical channels"""
+        engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE)
+        engine.set_params(-0.3, 1.5, 0.5, 0.8)
+        outdata = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+        engine.process(noise(BLOCK_SIZE, 2), outdata)
+        np.testing.assert_array_equal(outdata[:, 0], outdata[:, 1])
+        self.assertTrue(np.all(np.isfinite(outdata)))
+
+    def test_process_mono_layout(self):
+        """Mono (frames, 1) blocks are supported"""
+        engine = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE)
+        engine.set_params(0.0, 1.0, 0.0, 0.5)
+        indata = noise(BLOCK_SIZE, 1)
+        outdata = np.zeros_like(indata)
+        engine.process(indata, outdata)
+        self.assertGreater(np.max(np.abs(outdata)), 0.0)
+
+    def test_pitch_shift_is_continuous(self):
+        """The pitch shifter does not click at block boundaries"""
+        engine = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE)
+        engine.set_params(-0.3, 1.0, 0.0, 1.0)
+        t = np.arange(BLOCK_SIZE * 16) / SAMPLE_RATE
+        tone = (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)[:, None]
+        output = np.zeros_like(tone)
+        for i in range(0, len(tone), BLOCK_SIZE):
+            engine.process(tone[i:i + BLOCK_SIZE], output[i:i + BLOCK_SIZE])
+        steady = output[BLOCK_SIZE * 4:, 0]
+        self.assertLess(np.max(np.abs(np.diff(steady))), 0.05)
+
+    def test_long_blocks_run_in_stream_sized_pieces(self):
+        """process() accepts blocks longer than the stream blocksize"""
+        engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE)
+        reference = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE)
+        indata = noise(3 * BLOCK_SIZE, 2)
+        outdata = np.zeros_like(indata)
+        expected = np.zeros_like(indata)
+        engine.process(indata, outdata)
+        for i in range(0, len(indata), BLOCK_SIZE):
+            reference.process(indata[i:i + BLOCK_SIZE], expected[i:i + BLOCK_SIZE])
+        np.testing.assert_array_equal(outdata, expected)
+
+    def test_steady_state_reuses_buffers(self):
+        """Processing returns the same preallocated work buffer every block"""
+        engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE)
+        engine.set_params(-0.3, 1.5, 0.5, 0.8)
+        first = engine.process_block(noise(BLOCK_SIZE))
+        second = engine.process_block(noise(BLOCK_SIZE, seed=1))
+        self.assertTrue(np.shares_memory(first, second))
+
+
+class TestMultichannelEngine(unittest.TestCase):
+    """Tests for processing (frames, channels) blocks without a downmix"""
+
+    def check_matches_mono(self, pitch_algorithm):
+        """Each channel comes out exactly as a mono engine would process it alone"""
+        params = (-0.3, 1.5, 0.5, 0.8, 1000.0, 30.0)
+        stereo = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE, pitch_algorithm, multichannel=True)
+        monos = [DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE, pitch_algorithm) for _ in range(2)]
+        for engine in [stereo] + monos:
+            engine.set_params(*params)
+
+        outdata = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+        for seed in range(8):
+            indata = noise(BLOCK_SIZE, 2, seed)
+            stereo.process(indata, outdata)
+            for channel, mono in enumerate(monos):
+                expected = mono.process_block(np.ascontiguousarray(indata[:, channel]))
+                np.testing.assert_allclose(outdata[:, channel], expected, atol=1e-6)
+
+    def test_vocoder_channels_are_independent(self):
+        self.check_matches_mono('vocoder')
+
+    def test_delay_channels_are_independent(self):
+        self.check_matches_mono('delay')
+
+    def test_gated_and_suppressed(self):
+        """Gate and feedback suppressor accept 2-D blocks too"""
+        engine = DSPEngine(SAMPLE_RATE, 2, BLOCK_SIZE, feedback=True, gate=True, multichannel=True)
+        engine.set_params(-0.3, 1.5, 0.5, 0.8)
+        outdata = np.ones((BLOCK_SIZE, 2), dtype=np.float32)
+        engine.process(np.zeros((BLOCK_SIZE, 2), dtype=np.float32), outdata)
+        self.assertFalse(outdata.any())
+        engine.process(noise(BLOCK_SIZE, 2), outdata)
+        self.assertTrue(engine.gate.open)
+        self.assertTrue(outdata.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
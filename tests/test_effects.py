@@ -0,0 +1,72 @@
+# Unit tests for the native Dark Helmet effect chain
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import effects
+from stream_backends import synthetic_voice
+
+SAMPLE_RATE = 44100
+
+
+def sine(freq, seconds=1.0, amplitude=0.5, sample_rate=SAMPLE_RATE):
+    """Generate a test tone"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def dominant_frequency(audio, sample_rate=SAMPLE_RATE):
+    """Frequency of the strongest FFT bin"""
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    return np.argmax(spectrum) * sample_rate / len(audio)
+
+
+class TestEffects(unittest.TestCase):
+    """Tests for the in-memory effect chain"""
+
+    def test_pitch_shift_keeps_duration(self):
+        """Pitch shifting changes frequency but not length"""
+        audio = sine(220)
+        shifted = effects.pitch_shift(audio, -12)
+        self.assertEqual(len(shifted), len(audio))
+        self.assertAlmostEqual(dominant_frequency(shifted[4096:-4096]), 110, delta=3)
+
+    def test_pitch_shift_keeps_level(self):
+        """Output RMS stays within 1 dB of the input across the +/-12 semitone range"""
+        voice = synthetic_voice(SAMPLE_RATE, 2.0, 1)[:, 0]
+        for audio in (sine(220), voice):
+            level = audio[4096:-4096].std()
+            for semitones in (-12, -7, -3.6, -1, 1, 4.8, 7, 12):
+                shifted = effects.pitch_shift(audio, semitones)
+                change_db = 20 * np.log10(shifted[4096:-4096].std() / level)
+                self.assertLess(abs(change_db), 1.0, f"{semitones} semitones: {change_db:.2f} dB")
+
+    def test_overdrive_is_bounded(self):
+        """Overdrive output stays within the soft clip range"""
+        driven = effects.overdrive(sine(440, amplitude=1.0), 20)
+        self.assertLess(np.max(np.abs(driven)), 1.5)
+
+    def test_reverb_adds_tail(self):
+        """Reverb keeps energy after the dry signal stops"""
+        audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        audio[:441] = sine(440, seconds=0.01)
+        wet = effects.reverb(audio, SAMPLE_RATE, 0.5)
+        self.assertGreater(np.max(np.abs(wet[4410:8820])), 1e-4)
+        np.testing.assert_array_equal(effects.reverb(audio, SAMPLE_RATE, 0.0), audio)
+
+    def test_effect_chain_accepts_stereo(self):
+        """The full chain downmixes stereo input and returns float32 mono"""
+        stereo = np.stack([sine(300), sine(300)], axis=1)
+        processed = effects.apply_effect_chain(stereo, SAMPLE_RATE, -0.3, 1.5, 0.5, 0.8)
+        self.assertEqual(processed.shape, (SAMPLE_RATE,))
+        self.assertEqual(processed.dtype, np.float32)
+        self.assertTrue(np.all(np.isfinite(processed)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# Unit tests for the adaptive feedback suppressor
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import DSPEngine
+from feedback import FeedbackSuppressor, RELEASE_TIME
+from metrics import CallbackMetrics
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 1024
+
+
+class TestFeedbackSuppressor(unittest.TestCase):
+    """Tests for howl detection, notching and release"""
+
+    def setUp(self):
+        self.engine = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE, feedback=True)
+        self.engine.set_params(0.0, 1.0, 0.0, 1.0)
+
+    def feed(self, signal):
+        levels = []
+        for i in range(0, len(signal) - BLOCK_SIZE + 1, BLOCK_SIZE):
+            out = self.engine.process_block(signal[i:i + BLOCK_SIZE])
+            levels.append(np.sqrt(np.mean(out ** 2)))
+        return np.array(levels)
+
+    def test_sustained_howl_is_notched(self):
+        """A loud steady tone in the output gets a notch at its frequency"""
+        t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+        levels = self.feed((0.5 * np.sin(2 * np.pi * 2500 * t)).astype(np.float32))
+
+        notches = self.engine.feedback.status()['notches']
+        self.assertEqual(len(notches), 1)
+        self.assertAlmostEqual(notches[0]['freq_hz'], 2500, delta=10)
+        self.assertLess(levels[-1], levels[5] / 10)
+
+    def test_noise_leaves_chain_alone(self):
+        """Broadband sound never engages a notch"""
+        rng = np.random.default_rng(0)
+        self.feed(rng.normal(0, 0.1, 5 * SAMPLE_RATE).astype(np.float32))
+        self.assertEqual(self.engine.feedback.active, 0)
+        self.assertEqual(self.engine.feedback.detections, 0)
+
+    def test_notch_released_after_howl_stops(self):
+        """Notches fade out once the howl has been gone for RELEASE_TIME"""
+        t = np.arange(2 * SAMPLE_RATE) / SAMPLE_RATE
+        self.feed((0.5 * np.sin(2 * np.pi * 1200 * t)).astype(np.float32))
+        self.assertEqual(self.engine.feedback.active, 1)
+        self.feed(np.zeros(int((RELEASE_TIME + 3) * SAMPLE_RATE), dtype=np.float32))
+        self.assertEqual(self.engine.feedback.active, 0)
+
+    def test_over_budget_analyses_less_often(self):
+        """A tiny CPU budget stretches the analysis interval"""
+        suppressor = FeedbackSuppressor(SAMPLE_RATE, BLOCK_SIZE, budget=1e-6)
+        block = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        for _ in range(100):
+            suppressor.process(block, block)
+            suppressor.analyse(block)
+        self.assertGreater(suppressor.interval, 2)
+        self.assertGreater(suppressor.status()['cost_per_block_ms'], 0.0)
+
+    def test_reported_in_metrics(self):
+        """The suppressor's state shows up in /metrics output"""
+        metrics = CallbackMetrics(SAMPLE_RATE)
+        metrics.feedback = self.engine.feedback
+        self.assertIn('analysis_interval_blocks', metrics.summary()['feedback_suppressor'])
+        self.assertIn('darkhelmet_feedback_load', metrics.prometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Unit tests for the noise gate / voice activity detection
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import DSPEngine
+from gate import NoiseGate, HANGOVER_TIME
+from metrics import CallbackMetrics
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 256
+
+
+def tone(level_db, blocks=1, freq=200.0):
+    t = np.arange(blocks * BLOCK_SIZE) / SAMPLE_RATE
+    amplitude = np.sqrt(2) * 10 ** (level_db / 20)
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+class TestNoiseGate(unittest.TestCase):
+    """Tests for the open/close decision"""
+
+    def setUp(self):
+        self.gate = NoiseGate(SAMPLE_RATE, BLOCK_SIZE)
+
+    def test_hysteresis_and_hangover(self):
+        """Voice opens the gate, a level between thresholds holds it, silence closes it late"""
+        self.assertFalse(self.gate.update(tone(-48)))
+        self.assertTrue(self.gate.update(tone(-30)))
+        self.assertTrue(self.gate.update(tone(-48)))
+
+        silence = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        hangover_blocks = int(HANGOVER_TIME * SAMPLE_RATE) // BLOCK_SIZE
+        for _ in range(hangover_blocks - 1):
+            self.assertTrue(self.gate.update(silence))
+        self.gate.update(silence)
+        self.assertFalse(self.gate.update(silence))
+        self.assertEqual(self.gate.openings, 1)
+
+    def test_hiss_needs_more_level(self):
+        """High zero-crossing noise at a voice-like level keeps the gate shut"""
+        rng = np.random.default_rng(0)
+        hiss = rng.normal(0, 10 ** (-40 / 20), BLOCK_SIZE).astype(np.float32)
+        self.assertFalse(self.gate.update(hiss))
+        self.assertGreater(self.gate.zcr, 0.3)
+
+
+class TestGatedEngine(unittest.TestCase):
+    """Tests for skipping the chain while the gate is closed"""
+
+    def test_reverb_tail_rings_out_then_chain_rests(self):
+        """After speech the reverb decays naturally, then output is exact silence"""
+        engine = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE, gate=True)
+        engine.set_params(-0.3, 1.5, 0.8, 0.8)
+        speech = tone(-20, blocks=40)
+        for i in range(0, len(speech), BLOCK_SIZE):
+            engine.process_block(speech[i:i + BLOCK_SIZE])
+
+        silence = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        levels = [np.abs(engine.process_block(silence)).max() for _ in range(200)]
+        first_gated = int(HANGOVER_TIME * SAMPLE_RATE) // BLOCK_SIZE + 1
+        self.assertGreater(levels[first_gated], 0.0)
+        self.assertEqual(levels[-1], 0.0)
+
+        status = engine.gate.status()
+        self.assertFalse(status['open'])
+        self.assertGreater(status['gated_fraction'], 0.5)
+        self.assertGreater(status['cpu_saved_fraction'], 0.0)
+
+        metrics = CallbackMetrics(SAMPLE_RATE)
+        metrics.gate = engine.gate
+        self.assertEqual(metrics.summary()['noise_gate']['openings'], 1)
+        self.assertIn('darkhelmet_gate_cpu_saved_fraction', metrics.prometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Unit tests for the adaptive quality governor
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import DSPEngine, DelayLinePitchShifter
+from governor import QualityGovernor, CALM_EVALUATIONS
+from metrics import CallbackMetrics
+from params import ParamStore
+
+
+class TestQualityGovernor(unittest.TestCase):
+    """Tests for stepping effect quality with measured load"""
+
+    def setUp(self):
+        self.engine = DSPEngine(16000, 1, 256)
+        self.store = ParamStore()
+        self.store.bind(self.engine.compile)
+        self.metrics = CallbackMetrics(16000)
+        self.log = []
+        self.governor = QualityGovernor(self.engine, self.store, self.metrics, log=self.log.append)
+        self.block = np.zeros((256, 1), dtype=np.float32)
+
+    def run_blocks(self, load, count=20):
+        """Process blocks and record them as taking `load` of the deadline"""
+        budget = 256 / 16000
+        for _ in range(count):
+            self.engine.apply(self.store.snapshot.compiled)
+            self.engine.process(self.block, self.block)
+            self.metrics.record(self.metrics.clock() - load * budget, 256)
+        return self.governor.evaluate()
+
+    def test_steps_down_under_load(self):
+        """High load drops reverb, then swaps to the delay-line shifter"""
+        self.assertEqual(self.run_blocks(0.9)['to'], 'no_reverb')
+        self.run_blocks(0.1)
+        self.assertTrue(self.engine.reverb.bypassed or self.engine.reverb.wet_gain == 0.0)
+
+        self.assertEqual(self.run_blocks(0.9)['to'], 'delay_pitch')
+        self.run_blocks(0.1)
+        self.assertIsInstance(self.engine.pitch, DelayLinePitchShifter)
+        self.assertEqual(self.engine.pitch_algorithm, 'delay')
+        self.assertIsNone(self.run_blocks(0.9))
+        self.assertEqual(len(self.log), 2)
+
+    def test_reverb_step_keeps_the_pitch_stage(self):
+        """Dropping only the reverb does not restart the phase vocoder mid-stream"""
+        pitch = self.engine.pitch
+        self.assertEqual(self.run_blocks(0.9)['to'], 'no_reverb')
+        self.run_blocks(0.1)
+        self.assertIs(self.engine.pitch, pitch)
+        self.assertFalse(self.engine.quality.reverb)
+
+    def test_steps_up_after_sustained_headroom(self):
+        """Low load restores quality only after CALM_EVALUATIONS checks"""
+        self.run_blocks(0.9)
+        for _ in range(CALM_EVALUATIONS - 1):
+            self.assertIsNone(self.run_blocks(0.1))
+        self.assertEqual(self.run_blocks(0.1)['to'], 'full')
+        self.assertEqual(self.store.snapshot.compiled.quality.reverb, True)
+
+    def test_failed_step_up_backs_off(self):
+        """Stepping up into overload doubles the calm period"""
+        self.run_blocks(0.9)
+        for _ in range(CALM_EVALUATIONS):
+            self.run_blocks(0.1)
+        self.run_blocks(0.9)
+        self.assertEqual(self.governor.level_name, 'no_reverb')
+        self.assertEqual(self.governor.status()['calm_needed'], 2 * CALM_EVALUATIONS)
+
+    def test_pin_and_status(self):
+        """A pinned level holds regardless of load and shows up in status"""
+        self.governor.pin('delay_pitch')
+        self.assertIsNone(self.run_blocks(0.1))
+        status = self.governor.status()
+        self.assertFalse(status['enabled'])
+        self.assertEqual(status['level'], 'delay_pitch')
+        self.assertEqual(status['decisions'][-1]['reason'], 'pinned via control API')
+        self.assertEqual(self.metrics.engine_latency, self.engine.latency)
+        with self.assertRaises(ValueError):
+            self.governor.pin('potato')
+
+    def test_param_changes_keep_quality(self):
+        """Parameter updates after a step down stay at the reduced quality"""
+        self.run_blocks(0.9)
+        self.run_blocks(0.9)
+        self.store.update(pitch_shift=-0.5)
+        compiled = self.store.snapshot.compiled
+        self.assertEqual(compiled.quality.pitch_algorithm, 'delay')
+        self.assertEqual(compiled.pitch[-1], 2.0 ** -0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
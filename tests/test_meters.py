@@ -0,0 +1,51 @@
+# Unit tests for the audio-thread level meters
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import DSPEngine
+from meters import LevelMeter, SILENCE_DB
+
+
+class TestLevelMeter(unittest.TestCase):
+    """Tests for per-block RMS/peak measurement"""
+
+    def test_sine_levels(self):
+        """A full-scale sine reads 0 dB peak and -3 dB RMS; silence reads the floor"""
+        meter = LevelMeter()
+        sine = np.sin(2 * np.pi * np.arange(1024) / 64).astype(np.float32)
+        meter.record(sine, np.zeros(1024, dtype=np.float32))
+        levels = meter.read()
+        self.assertAlmostEqual(levels['input']['peak_db'], 0.0, places=1)
+        self.assertAlmostEqual(levels['input']['rms_db'], -3.0, places=1)
+        self.assertEqual(levels['output']['peak_db'], SILENCE_DB)
+
+    def test_read_folds_blocks_since_last_read(self):
+        """Peaks hold across blocks, and an idle read returns None"""
+        meter = LevelMeter(history=4)
+        quiet = np.full(256, 0.1, dtype=np.float32)
+        loud = np.full(256, 0.5, dtype=np.float32)
+        for block in (quiet, loud, quiet):
+            meter.record(block, block)
+        levels = meter.read()
+        self.assertAlmostEqual(levels['output']['peak_db'], 20 * np.log10(0.5), places=1)
+        self.assertIsNone(meter.read())
+
+    def test_engine_feeds_meter(self):
+        """DSPEngine measures its mono input and output when a meter is attached"""
+        engine = DSPEngine(16000, 2, 256)
+        engine.set_params(0.0, 1.0, 0.0, 0.5)
+        engine.meter = LevelMeter()
+        block = np.full((256, 2), 0.25, dtype=np.float32)
+        engine.process(block, np.zeros_like(block))
+        self.assertEqual(engine.meter.blocks, 1)
+        self.assertAlmostEqual(engine.meter.read()['input']['peak_db'], 20 * np.log10(0.25), places=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Unit tests for callback timing metrics
+import unittest
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import CallbackMetrics
+
+
+class TestCallbackMetrics(unittest.TestCase):
+    """Tests for per-block timing and xrun counting"""
+
+    def make_metrics(self, elapsed):
+        """Metrics whose clock advances by `elapsed` seconds per call"""
+        metrics = CallbackMetrics(1000, history_size=8)
+        ticks = iter(range(10000))
+        metrics.clock = lambda: next(ticks) * elapsed
+        return metrics
+
+    def test_utilization_relative_to_block_period(self):
+        """Half a block period of processing is 50% utilization"""
+        metrics = self.make_metrics(0.0625)
+        for _ in range(4):
+            started = metrics.clock()
+            metrics.record(started, 125)
+        summary = metrics.summary()
+        self.assertAlmostEqual(summary['deadline_utilization']['p50'], 0.5)
+        self.assertEqual(summary['utilization_histogram']['0.5'], 4)
+        self.assertEqual(summary['deadline_misses'], 0)
+        json.dumps(summary)
+
+    def test_history_is_a_ring(self):
+        """Only the most recent history_size blocks are kept, counts keep growing"""
+        metrics = self.make_metrics(0.2)
+        for _ in range(20):
+            metrics.record(metrics.clock(), 100)
+        self.assertEqual(metrics.blocks, 20)
+        self.assertEqual(metrics.deadline_misses, 20)
+        self.assertEqual(len(metrics.durations), 8)
+
+    def test_xruns_and_prometheus(self):
+        """Status flags are counted and exported in Prometheus text format"""
+        metrics = self.make_metrics(0.01)
+        status = SimpleNamespace(output_underflow=True, input_overflow=False)
+        metrics.record(metrics.clock(), 100, status)
+        metrics.set_stream_latency((0.01, 0.02))
+        self.assertEqual(metrics.xrun_count, 1)
+        text = metrics.prometheus()
+        self.assertIn('darkhelmet_xruns_total{flag="output_underflow"} 1', text)
+        self.assertIn('darkhelmet_deadline_utilization_bucket{le="+Inf"} 1', text)
+        self.assertIn('direction="output"} 0.02', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Unit tests for lock-free effect parameter snapshots
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from params import DEFAULT_PARAMS, ParamStore
+from dsp_engine import DSPEngine
+
+
+class TestParamStore(unittest.TestCase):
+    """Tests for snapshot publishing"""
+
+    def test_update_publishes_new_snapshot(self):
+        """Updates swap in a new immutable snapshot and leave the old one intact"""
+        store = ParamStore()
+        before = store.snapshot
+        store.update(volume="0.25", unknown=3)
+        self.assertIsNot(store.snapshot, before)
+        self.assertEqual(before.params, DEFAULT_PARAMS)
+        self.assertEqual(store.params.volume, 0.25)
+        self.assertFalse(hasattr(store.params, 'unknown'))
+
+    def test_invalid_values_are_rejected_before_publishing(self):
+        """Non-numbers, non-finite and out-of-range values raise and publish nothing"""
+        store = ParamStore()
+        before = store.snapshot
+        for changes in ({'pitch_shift': 'nan'}, {'volume': 'inf'}, {'volume': None},
+                        {'volume': [1]}, {'reverb_room_size': 2.0},
+                        {'volume': 0.5, 'pitch_shift': float('-inf')}):
+            with self.assertRaises(ValueError):
+                store.update(**changes)
+            self.assertIs(store.snapshot, before)
+
+    def test_bound_compiler_runs_on_publish(self):
+        """Derived DSP state is compiled by the writer, not the reader"""
+        store = ParamStore()
+        engine = DSPEngine(44100, 1, 1024)
+        store.bind(engine.compile)
+        store.update(pitch_shift=0.5, reverb_room_size=0.0)
+
+        compiled = store.snapshot.compiled
+        self.assertEqual(compiled.params, store.params)
+        self.assertAlmostEqual(compiled.pitch[-1][0], 2.0 ** 0.5)
+
+        engine.apply(compiled)
+        for _ in range(engine.glide_blocks):
+            engine.process_block(np.zeros(1024, dtype=np.float32))
+        self.assertAlmostEqual(engine.pitch.ratio, 2.0 ** 0.5)
+        self.assertEqual(engine.reverb.wet_gain, 0.0)
+        self.assertIs(engine.compiled, compiled)
+
+
+if __name__ == '__main__':
+    unittest.main()
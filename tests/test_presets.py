@@ -0,0 +1,157 @@
+# Unit tests for precompiled effect presets
+import unittest
+import sys
+import os
+import contextlib
+import io
+import json
+import tempfile
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import MAX_GLIDE_TIME, DSPEngine, Quality
+from params import DEFAULT_PARAMS, ParamStore
+from presets import PresetStore, BUILTIN_PRESETS
+
+
+class TestPresetStore(unittest.TestCase):
+    """Tests for saving, caching and switching presets"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'presets.json')
+        self.engine = DSPEngine(16000, 1, 256)
+        self.store = ParamStore()
+        self.store.bind(self.engine.compile)
+        self.presets = PresetStore(self.engine, self.store, self.path)
+
+    def test_save_persists_and_delete_protects_builtins(self):
+        """User presets survive a restart; built-in presets cannot be deleted"""
+        self.presets.save('squeaky', DEFAULT_PARAMS._replace(pitch_shift=0.5, notch_freq=2000.0))
+        reloaded = PresetStore(self.engine, self.store, self.path)
+        self.assertEqual(reloaded.get('squeaky').notch_freq, 2000.0)
+        self.assertIn('dark_helmet', reloaded.names())
+
+        with self.assertRaises(ValueError):
+            reloaded.delete('dark_helmet')
+        reloaded.delete('squeaky')
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {})
+        with self.assertRaises(ValueError):
+            reloaded.get('squeaky')
+
+    def test_invalid_saved_presets_are_skipped(self):
+        """Hand-edited entries out of range or of the wrong type are not loaded"""
+        good = DEFAULT_PARAMS._replace(volume=0.4)._asdict()
+        with open(self.path, 'w') as f:
+            json.dump({'good': good, 'nan': dict(good, pitch_shift='nan'),
+                       'loud': dict(good, volume=9.0), 'list': [1, 2]}, f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            presets = PresetStore(self.engine, self.store, self.path)
+        self.assertEqual(presets.get('good').volume, 0.4)
+        self.assertEqual(set(presets.user), {'good'})
+
+    def test_activate_is_one_precompiled_swap(self):
+        """A warmed preset is published as the cached snapshot and switches instantly"""
+        self.presets.warm()
+        cached = self.presets.compiled('barf')
+        self.presets.activate('barf')
+        self.assertIs(self.store.snapshot.compiled, cached)
+        self.assertEqual(self.store.params, BUILTIN_PRESETS['barf'])
+
+        self.engine.apply(self.store.snapshot.compiled)
+        self.engine.process_block(np.zeros(256, dtype=np.float32))
+        self.assertAlmostEqual(self.engine.pitch.ratio, 2.0 ** (BUILTIN_PRESETS['barf'].pitch_shift))
+
+    def test_crossfade_glides_pitch(self):
+        """A crossfade compiles a pitch glide from the current settings"""
+        self.presets.activate('dot_matrix', crossfade=0.5)
+        ratios = [plan[0] for plan in self.store.snapshot.compiled.pitch]
+        self.assertGreater(len(ratios), 1)
+        self.assertLess(ratios[0], ratios[-1])
+        with self.assertRaises(ValueError):
+            self.presets.activate('dot_matrix', crossfade=-1)
+
+    def test_crossfade_is_bounded(self):
+        """Huge crossfades are refused before any glide plans are built"""
+        before = self.store.snapshot
+        for crossfade in (2000, 1e308, float('inf'), float('nan')):
+            with self.assertRaises(ValueError):
+                self.presets.activate('dot_matrix', crossfade=crossfade)
+        self.assertIs(self.store.snapshot, before)
+        with self.assertRaises(ValueError):
+            self.engine.compile(BUILTIN_PRESETS['barf'], self.store.params, glide_time=1e308)
+        self.presets.activate('dot_matrix', crossfade=MAX_GLIDE_TIME)
+
+    def test_quality_change_recompiles(self):
+        """Cached presets built for an old pitch stage are not reused"""
+        cached = self.presets.compiled('clean')
+        self.engine.requested_quality = Quality('delay', None, False)
+        self.store.refresh()
+        recompiled = self.presets.compiled('clean')
+        self.assertIsNot(recompiled, cached)
+        self.assertEqual(recompiled.quality.pitch_algorithm, 'delay')
+
+    def test_reverb_quality_change_recompiles(self):
+        """A preset cached with reverb is not reused once the reverb is dropped"""
+        cached = self.presets.compiled('lord_helmet')
+        self.engine.requested_quality = self.engine.quality._replace(reverb=False)
+        self.store.refresh()
+        recompiled = self.presets.compiled('lord_helmet')
+        self.assertIsNot(recompiled, cached)
+        self.assertIs(recompiled.pitch_stage, cached.pitch_stage)
+        self.assertEqual(recompiled.reverb[0], 0.0)
+
+    def test_notch_follows_preset(self):
+        """Notch settings are part of a preset"""
+        self.presets.save('whine', DEFAULT_PARAMS._replace(notch_freq=3000.0, notch_q=10.0))
+        self.presets.activate('whine')
+        self.engine.apply(self.store.snapshot.compiled)
+        self.assertEqual((self.engine.notch.freq, self.engine.notch.q), (3000.0, 10.0))
+
+
+class TestPresetEndpoints(unittest.TestCase):
+    """The voice changer's /presets routes"""
+
+    def test_save_list_activate_delete(self):
+        import voice_changer
+        from control_server import Request
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = voice_changer.effect_params
+        self.addCleanup(store.update, **store.params._asdict())
+        engine = DSPEngine(16000, 1, 256)
+        store.bind(engine.compile)
+        self.addCleanup(store.bind, None)
+        voice_changer.preset_store = PresetStore(engine, store, os.path.join(tmp.name, 'presets.json'))
+        self.addCleanup(setattr, voice_changer, 'preset_store', None)
+        server = voice_changer.create_control_server('127.0.0.1', 0)
+
+        def call(method, path, body=None, query=None):
+            request = Request(method, path, query or {}, {}, json.dumps(body or {}).encode())
+            response = server.dispatch(request)
+            return response.status, json.loads(response.body)
+
+        self.assertEqual(call('POST', '/presets', {'name': 'mine', 'volume': 0.3})[0], 200)
+        status, listing = call('GET', '/presets')
+        self.assertEqual(listing['presets']['mine']['volume'], 0.3)
+
+        status, result = call('POST', '/presets/activate', {'name': 'mine', 'crossfade': 0.1})
+        self.assertEqual(result['active'], 'mine')
+        self.assertEqual(store.params.volume, 0.3)
+        self.assertEqual(call('POST', '/presets/activate', {'name': 'nope'})[0], 400)
+        self.assertEqual(call('POST', '/presets/activate', {'name': 'mine', 'crossfade': [1]})[0], 400)
+        self.assertEqual(call('POST', '/presets/activate', {'name': 'mine', 'crossfade': 1e308})[0], 400)
+        self.assertEqual(call('POST', '/presets', {'name': 'loud', 'volume': 'inf'})[0], 400)
+        self.assertNotIn('loud', call('GET', '/presets')[1]['presets'])
+
+        self.assertEqual(call('DELETE', '/presets', query={'name': 'mine'})[0], 200)
+        self.assertNotIn('mine', call('GET', '/presets')[1]['presets'])
+
+
+if __name__ == '__main__':
+    unittest.main()
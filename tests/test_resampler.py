@@ -0,0 +1,129 @@
+# Unit tests for streaming sample-rate conversion and the internal DSP rate
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from callbacks import layout_processor
+from dsp_engine import DSPEngine
+from resampler import PolyphaseResampler, RateConverter
+
+STREAM_RATE = 48000
+INTERNAL_RATE = 16000
+BLOCK_SIZE = 512
+
+
+def noise(frames, channels=None, seed=0):
+    shape = (frames,) if channels is None else (frames, channels)
+    return (0.1 * np.random.default_rng(seed).standard_normal(shape)).astype(np.float32)
+
+
+def tone_level_db(resampler, freq, rate):
+    t = np.arange(rate) / rate
+    out = resampler.process(np.sin(2 * np.pi * freq * t).astype(np.float32))
+    return 20 * np.log10(np.sqrt(2) * out[len(out) // 4:].std() + 1e-12)
+
+
+class TestPolyphaseResampler(unittest.TestCase):
+    """Tests for the streaming rational resampler"""
+
+    def test_block_boundaries_are_seamless(self):
+        """Any split into blocks gives the same samples as one long block"""
+        x = noise(20000, seed=1)
+        for up, down in [(1, 3), (147, 320), (320, 147)]:
+            resampler = PolyphaseResampler(up, down)
+            whole = resampler.process(x)
+            resampler.reset()
+            sizes = np.random.default_rng(2).integers(1, 700, 100)
+            edges = np.concatenate([[0], np.cumsum(sizes)])
+            edges = edges[edges < len(x)].tolist() + [len(x)]
+            parts = [resampler.process(x[a:b]) for a, b in zip(edges[:-1], edges[1:])]
+            np.testing.assert_allclose(np.concatenate(parts), whole, atol=1e-6)
+            self.assertAlmostEqual(len(whole), len(x) * up / down, delta=1)
+
+    def test_decimation_keeps_speech_and_rejects_aliases(self):
+        """48k -> 16k passes the voice band and stops what would fold back into it"""
+        self.assertGreater(tone_level_db(PolyphaseResampler(1, 3), 1000, STREAM_RATE), -0.5)
+        self.assertLess(tone_level_db(PolyphaseResampler(1, 3), 12000, STREAM_RATE), -60)
+
+    def test_multichannel_matches_mono(self):
+        """Each column of a (frames, channels) stream is resampled independently"""
+        stereo = noise(4000, channels=2, seed=3)
+        out = PolyphaseResampler(1, 3, channels=2).process(stereo)
+        for ch in range(2):
+            np.testing.assert_allclose(out[:, ch], PolyphaseResampler(1, 3).process(stereo[:, ch]),
+                                       atol=1e-6)
+
+
+class TestRateConverter(unittest.TestCase):
+    """Tests for running a processor at the internal rate"""
+
+    def test_returns_whole_blocks_with_stated_latency(self):
+        """Every block comes back full length; an impulse arrives after .latency samples"""
+        for stream_rate, internal_rate in [(48000, 16000), (48000, 22050), (44100, 22050)]:
+            converter = RateConverter(stream_rate, internal_rate, BLOCK_SIZE)
+            impulse = np.zeros(BLOCK_SIZE * 20, dtype=np.float32)
+            impulse[BLOCK_SIZE * 3] = 1.0
+            out = []
+            for i in range(0, len(impulse), BLOCK_SIZE):
+                block = converter.process(impulse[i:i + BLOCK_SIZE], None, lambda internal: internal)
+                self.assertEqual(len(block), BLOCK_SIZE)
+                out.append(block.copy())
+            peak = int(np.argmax(np.concatenate(out))) - BLOCK_SIZE * 3
+            self.assertAlmostEqual(peak, converter.latency, delta=1)
+
+
+class TestInternalRateEngine(unittest.TestCase):
+    """Tests for DSPEngine(internal_rate=...)"""
+
+    def test_stages_run_at_the_internal_rate(self):
+        engine = DSPEngine(STREAM_RATE, 1, BLOCK_SIZE, internal_rate=INTERNAL_RATE)
+        self.assertEqual(engine.sample_rate, INTERNAL_RATE)
+        self.assertEqual(engine.stream_rate, STREAM_RATE)
+        self.assertLess(engine.blocksize, BLOCK_SIZE)
+        self.assertEqual(engine.reverb.sample_rate, INTERNAL_RATE)
+        self.assertIsNone(DSPEngine(STREAM_RATE, 1, BLOCK_SIZE, internal_rate=STREAM_RATE).resampler)
+
+    def test_fft_frames_keep_their_duration(self):
+        """FFT sizes scale with the internal rate, so resampling barely adds latency"""
+        native = DSPEngine(44100, 1, 1024, channel_vocoder=True)
+        engine = DSPEngine(44100, 1, 1024, internal_rate=INTERNAL_RATE, channel_vocoder=True)
+        self.assertEqual(engine.pitch.fft_size, 372)
+        self.assertAlmostEqual(engine.pitch.fft_size / INTERNAL_RATE, native.pitch.fft_size / 44100, delta=1e-3)
+        self.assertLessEqual(engine.latency, native.latency + 2 * engine.resampler.latency)
+
+    def test_same_rate_chain_whatever_the_stream_rate(self):
+        """A tone through the chain comes out at the same level from 48 kHz and 22.05 kHz streams"""
+        levels = []
+        for stream_rate in (48000, 22050):
+            engine = DSPEngine(stream_rate, 1, BLOCK_SIZE, pitch_algorithm='delay',
+                               internal_rate=INTERNAL_RATE)
+            engine.set_params(0.0, 1.0, 0.0, 1.0)
+            t = np.arange(stream_rate) / stream_rate
+            x = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+            out = np.concatenate([engine.process_block(x[i:i + BLOCK_SIZE]).copy()
+                                  for i in range(0, len(x) - BLOCK_SIZE + 1, BLOCK_SIZE)])
+            levels.append(out[len(out) // 2:].std())
+        self.assertAlmostEqual(levels[0], levels[1], delta=0.02 * levels[0])
+
+    def test_stream_callbacks_see_stream_blocks(self):
+        """The layout processor fills whole stream blocks from a resampled engine"""
+        for multichannel in (False, True):
+            engine = DSPEngine(STREAM_RATE, 2, BLOCK_SIZE, internal_rate=INTERNAL_RATE,
+                               multichannel=multichannel)
+            engine.set_params(-0.3, 1.5, 0.5, 0.8)
+            process = layout_processor(engine, 2, 2)
+            outdata = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+            for seed in range(20):
+                process(noise(BLOCK_SIZE, 2, seed), outdata)
+            self.assertTrue(np.isfinite(outdata).all())
+            self.assertGreater(np.abs(outdata).max(), 0.0)
+            self.assertGreater(engine.latency, engine.resampler.latency)
+
+
+if __name__ == '__main__':
+    unittest.main()
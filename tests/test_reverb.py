@@ -0,0 +1,55 @@
+# Unit tests for the streaming partitioned-convolution reverb
+import unittest
+import sys
+import os
+
+import numpy as np
+from scipy import signal
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from effects import helmet_impulse_response
+from reverb import PartitionedConvolutionReverb, WET_GAIN
+
+SAMPLE_RATE = 44100
+
+
+class TestPartitionedConvolutionReverb(unittest.TestCase):
+    """Tests for block-wise helmet reverb"""
+
+    def test_matches_direct_convolution(self):
+        """The streamed wet signal equals a one-shot convolution delayed by one partition"""
+        for blocksize in (1024, 300):
+            reverb = PartitionedConvolutionReverb(SAMPLE_RATE, blocksize)
+            reverb.set_room_size(0.5)
+            audio = (0.1 * np.random.default_rng(0).standard_normal(SAMPLE_RATE // 2)).astype(np.float32)
+            output = np.zeros_like(audio)
+            for i in range(0, len(audio), blocksize):
+                reverb.process(audio[i:i + blocksize], output[i:i + blocksize])
+
+            wet = (output - audio) / (WET_GAIN * 0.5)
+            expected = signal.fftconvolve(audio, helmet_impulse_response(SAMPLE_RATE, 0.5))
+            np.testing.assert_allclose(wet[reverb.latency:], expected[:len(audio) - reverb.latency],
+                                       atol=1e-5)
+
+    def test_zero_room_size_is_bypass(self):
+        """room_size 0 passes the dry signal untouched"""
+        reverb = PartitionedConvolutionReverb(SAMPLE_RATE, 512)
+        block = np.ones(512, dtype=np.float32)
+        output = np.zeros_like(block)
+        reverb.process(block, output)
+        np.testing.assert_array_equal(output, block)
+
+    def test_cost_is_bounded_by_room_size(self):
+        """A larger room needs more partitions, but the count is fixed per setting"""
+        reverb = PartitionedConvolutionReverb(SAMPLE_RATE, 1024)
+        reverb.set_room_size(0.2)
+        small = reverb.cost_per_block()
+        reverb.set_room_size(1.0)
+        self.assertGreater(reverb.cost_per_block(), small)
+        self.assertEqual(reverb.partitions, len(reverb.spectra))
+
+
+if __name__ == '__main__':
+    unittest.main()
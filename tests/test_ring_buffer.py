@@ -0,0 +1,115 @@
+# Unit tests for the SPSC ring buffer and pipelined DSP thread
+import unittest
+import sys
+import os
+import threading
+import time
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import CallbackMetrics
+from ring_buffer import RingBuffer, PipelinedProcessor
+
+
+def block(value, blocksize=4, channels=2):
+    return np.full((blocksize, channels), value, dtype=np.float32)
+
+
+class TestRingBuffer(unittest.TestCase):
+    """Tests for the lock-free block ring"""
+
+    def test_fifo_full_and_empty(self):
+        """Blocks come out in order; writes fail when full, reads when empty"""
+        ring = RingBuffer(3, 4, 2)
+        out = block(0)
+        self.assertFalse(ring.read(out))
+        for value in (1, 2, 3):
+            self.assertTrue(ring.write(block(value)))
+        self.assertFalse(ring.write(block(4)))
+        self.assertEqual(ring.available, 3)
+        for value in (1, 2):
+            self.assertTrue(ring.read(out))
+            self.assertEqual(out[0, 0], value)
+        self.assertTrue(ring.write(block(5)))
+        ring.skip()
+        self.assertTrue(ring.read(out))
+        self.assertEqual(out[0, 0], 5)
+        self.assertEqual(ring.free, 3)
+
+    def test_threaded_transfer_keeps_order(self):
+        """A producer and consumer thread pass every block through intact"""
+        ring = RingBuffer(4, 4, 2)
+        received = []
+
+        def consume():
+            out = block(0)
+            while len(received) < 500:
+                if ring.read(out):
+                    received.append(int(out[0, 0]))
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        value = 0
+        while value < 500:
+            if ring.write(block(value)):
+                value += 1
+        consumer.join(5)
+        self.assertEqual(received, list(range(500)))
+
+
+class TestPipelinedProcessor(unittest.TestCase):
+    """Tests for the callback/DSP thread split"""
+
+    def drive(self, pipeline, values, settle=True):
+        outputs = []
+        out = block(0)
+        for value in values:
+            pipeline.callback(block(value), out)
+            outputs.append(float(out[0, 0]))
+            if settle:
+                deadline = time.time() + 1.0
+                while pipeline.inbox.available and time.time() < deadline:
+                    time.sleep(0.001)
+                time.sleep(0.002)
+        return outputs
+
+    def test_fixed_lookahead_latency(self):
+        """Output is the processed input exactly lookahead blocks later"""
+        with PipelinedProcessor(lambda i, o: np.multiply(i, 2, out=o), 4, 2, lookahead=3) as pipeline:
+            outputs = self.drive(pipeline, range(1, 9))
+        self.assertEqual(pipeline.latency, 12)
+        self.assertEqual(outputs, [0, 0, 0, 2, 4, 6, 8, 10])
+
+    def test_late_block_does_not_shift_latency(self):
+        """A slow block is replaced by silence and latency recovers"""
+        slow = threading.Event()
+
+        def process(indata, outdata):
+            if indata[0, 0] == 3:
+                slow.wait(1.0)
+            outdata[:] = indata
+
+        metrics = CallbackMetrics(8000)
+        pipeline = PipelinedProcessor(process, 4, 2, lookahead=1, metrics=metrics)
+        with pipeline:
+            outputs = self.drive(pipeline, [1, 2, 3], settle=True)[:2]
+            outputs += self.drive(pipeline, [4, 5], settle=False)
+            slow.set()
+            time.sleep(0.05)
+            outputs += self.drive(pipeline, [6, 7, 8])
+        self.assertEqual(outputs[:2], [0, 1])
+        self.assertEqual(outputs[-3:], [5, 6, 7])
+        self.assertGreaterEqual(pipeline.underruns, 1)
+        self.assertEqual(metrics.xruns['output_underflow'], pipeline.underruns)
+        self.assertGreater(metrics.blocks, 0)
+
+    def test_rejects_zero_lookahead(self):
+        with self.assertRaises(ValueError):
+            PipelinedProcessor(lambda i, o: None, 4, 2, lookahead=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+# Unit tests for parameter smoothing
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from smoothing import SmoothedParam
+from dsp_engine import DSPEngine
+
+
+class TestSmoothedParam(unittest.TestCase):
+    """Tests for linear parameter ramps"""
+
+    def test_settled_value_is_scalar(self):
+        """No ramp in progress means a plain float comes back"""
+        param = SmoothedParam(0.8, 100, 64)
+        self.assertEqual(param.next_block(64), 0.8)
+
+    def test_ramp_reaches_target_across_blocks(self):
+        """A ramp is linear, spans blocks and ends exactly on the target"""
+        param = SmoothedParam(0.0, 100, 64)
+        param.set_target(1.0)
+        first = param.next_block(64).copy()
+        second = param.next_block(64).copy()
+        ramp = np.concatenate([first, second])
+        np.testing.assert_allclose(ramp[:100], np.arange(1, 101) / 100, atol=1e-6)
+        np.testing.assert_array_equal(ramp[100:], 1.0)
+        self.assertFalse(param.ramping)
+        self.assertEqual(param.next_block(64), 1.0)
+
+    def test_volume_change_has_no_step(self):
+        """Changing volume on a live engine ramps instead of jumping"""
+        engine = DSPEngine(44100, 1, 512)
+        engine.set_params(0.0, 1.0, 0.0, 1.0)
+        dc = np.full(512, 0.5, dtype=np.float32)
+        for _ in range(8):
+            engine.process_block(dc)
+        engine.set_params(0.0, 1.0, 0.0, 0.2)
+        output = np.concatenate([engine.process_block(dc).copy() for _ in range(8)])
+        self.assertLess(np.max(np.abs(np.diff(output[2048:]))), 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
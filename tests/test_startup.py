@@ -0,0 +1,140 @@
+# Unit tests for lazy imports and the cached audio configuration
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from startup import LazyModule, StartupTimer, DeviceConfigCache, alsa_cards, config_key, write_json
+
+
+class TestLazyModule(unittest.TestCase):
+    """Tests for deferring heavy imports"""
+
+    def test_imports_on_first_use(self):
+        """The module is only imported when an attribute is used"""
+        sys.modules.pop('colorsys', None)
+        colorsys = LazyModule('colorsys')
+        self.assertFalse(colorsys.loaded)
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertTrue(colorsys.loaded)
+
+    def test_introspection_does_not_import(self):
+        """Mock and asyncio probes for private attributes leave it unloaded"""
+        module = LazyModule('module_that_does_not_exist')
+        self.assertFalse(hasattr(module, '__code__'))
+        self.assertFalse(hasattr(module, '_is_coroutine'))
+        with self.assertRaises(ImportError):
+            module.anything
+
+
+class TestStartupTimer(unittest.TestCase):
+    def test_phases_are_recorded(self):
+        timer = StartupTimer()
+        timer.add('imports', 0.5)
+        with timer.phase('work'):
+            pass
+        self.assertEqual([name for name, _ in timer.phases], ['imports', 'work'])
+        self.assertGreaterEqual(timer.phases[1][1], 0.0)
+
+
+class TestDeviceConfigCache(unittest.TestCase):
+    """Tests for remembering the last working audio configuration"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache', 'audio_config.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_load_forget(self):
+        cache = DeviceConfigCache(self.path)
+        self.assertIsNone(cache.load('k'))
+        cache.save('k', {'sample_rate': 48000})
+        self.assertEqual(DeviceConfigCache(self.path).load('k'), {'sample_rate': 48000})
+        cache.forget('k')
+        self.assertIsNone(cache.load('k'))
+
+    def test_write_json_replaces_atomically(self):
+        """The file is swapped in whole and no temporary is left behind"""
+        write_json(self.path, {'a': 1})
+        write_json(self.path, {'b': 2})
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'b': 2})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['audio_config.json'])
+
+    def test_corrupt_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        self.assertIsNone(DeviceConfigCache(self.path).load('k'))
+
+    def test_key_depends_on_device_and_cards(self):
+        cards = ' 0 [wm8960soundcard]: simple-card - wm8960-soundcard\n'
+        self.assertEqual(config_key('wm8960', cards), config_key('wm8960', cards))
+        self.assertNotEqual(config_key('wm8960', cards), config_key('USB Audio', cards))
+        self.assertNotEqual(config_key('wm8960', cards), config_key('wm8960', cards + ' 1 [Device]\n'))
+        self.assertEqual(alsa_cards(os.path.join(self.tmp.name, 'missing')), '')
+
+
+class TestCachedAudioConfig(unittest.TestCase):
+    """Tests for get_best_audio_config using the cache"""
+
+    def setUp(self):
+        import voice_changer
+        self.vc = voice_changer
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DeviceConfigCache(os.path.join(self.tmp.name, 'audio_config.json'))
+        device = {'name': 'wm8960-soundcard'}
+        patchers = [
+            patch.object(voice_changer, 'device_cache', self.cache),
+            patch.object(voice_changer, 'find_suitable_audio_device', return_value=(3, device)),
+            patch.object(voice_changer, 'alsa_cards', return_value='0 [wm8960]\n'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_probe_then_cached(self):
+        """The first boot probes and saves; the next tries only the cached config"""
+        with patch.object(self.vc, 'test_audio_configuration',
+                          side_effect=lambda d, r, c, b: (r, c) == (22050, 1)) as probe:
+            self.assertEqual(self.vc.get_best_audio_config(), (3, 22050, 1, 512))
+            self.assertEqual(probe.call_count, 4)
+        with patch.object(self.vc, 'test_audio_configuration', return_value=True) as probe:
+            self.assertEqual(self.vc.get_best_audio_config(), (3, 22050, 1, 512))
+            self.assertEqual(probe.call_count, 1)
+
+    def test_stale_cache_falls_back_to_probe(self):
+        """A cached config that no longer opens is dropped and the probe runs"""
+        key = config_key('wm8960-soundcard', '0 [wm8960]\n')
+        self.cache.save(key, {'sample_rate': 96000, 'channels': 2, 'blocksize': 256})
+        with patch.object(self.vc, 'test_audio_configuration',
+                          side_effect=lambda d, r, c, b: r == 44100) as probe:
+            self.assertEqual(self.vc.get_best_audio_config(), (3, 44100, 2, 1024))
+            self.assertEqual(probe.call_count, 2)
+        self.assertEqual(self.cache.load(key)['sample_rate'], 44100)
+
+    def test_malformed_cache_entry_is_a_miss(self):
+        """Entries with missing keys or wrong types are ignored and replaced by a probe"""
+        key = config_key('wm8960-soundcard', '0 [wm8960]\n')
+        for entry in ({'sample_rate': 48000}, {'sample_rate': '48000', 'channels': 2, 'blocksize': 256},
+                      {'sample_rate': 48000, 'channels': 2.5, 'blocksize': 256}, [48000, 2, 256], 'junk'):
+            self.cache.save(key, entry)
+            with patch.object(self.vc, 'test_audio_configuration', return_value=True) as probe:
+                self.assertEqual(self.vc.get_best_audio_config(), (3, 44100, 2, 1024))
+                self.assertEqual(probe.call_count, 1)
+            self.assertEqual(self.cache.load(key)['sample_rate'], 44100)
+
+
+if __name__ == '__main__':
+    unittest.main()
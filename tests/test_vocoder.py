@@ -0,0 +1,126 @@
+# Unit tests for the channel vocoder and ring modulator
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dsp_engine import DSPEngine
+from params import ParamStore
+from stream_backends import synthetic_voice
+from vocoder import ChannelVocoder, RingModulator, band_matrix
+
+SAMPLE_RATE = 22050
+BLOCK_SIZE = 512
+
+
+def run(stage, x):
+    out = np.zeros_like(x)
+    for i in range(0, len(x) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        stage.process(x[i:i + BLOCK_SIZE], out[i:i + BLOCK_SIZE])
+    return out
+
+
+def voice(seconds=2.0):
+    return np.ascontiguousarray(synthetic_voice(SAMPLE_RATE, seconds, 1)[:, 0], dtype=np.float32)
+
+
+class TestChannelVocoder(unittest.TestCase):
+    """Tests for the FFT filterbank vocoder"""
+
+    def test_band_matrix_covers_every_band(self):
+        weights = band_matrix(SAMPLE_RATE, 512, 32)
+        self.assertEqual(weights.shape, (257, 32))
+        self.assertTrue((weights.sum(axis=0) > 0).all())
+
+    def test_dry_mix_is_a_pure_delay(self):
+        """At mix 0 the output is the input, latency samples late"""
+        x = voice()
+        vocoder = ChannelVocoder(SAMPLE_RATE, BLOCK_SIZE)
+        y = run(vocoder, x)
+        lag = vocoder.latency
+        np.testing.assert_allclose(y[lag:-BLOCK_SIZE], x[:-BLOCK_SIZE - lag], atol=1e-5)
+
+    def test_failed_block_leaves_fifos_in_step(self):
+        """A block that fails part way re-primes the FIFOs, so the delay stays exact"""
+        x = voice()
+        vocoder = ChannelVocoder(SAMPLE_RATE, BLOCK_SIZE)
+        run(vocoder, x[:3 * BLOCK_SIZE])
+        with self.assertRaises(ValueError):
+            vocoder.process(x[:BLOCK_SIZE], np.zeros(BLOCK_SIZE - 1, dtype=np.float32))
+        y = run(vocoder, x)
+        lag = vocoder.latency
+        np.testing.assert_allclose(y[lag:-BLOCK_SIZE], x[:-BLOCK_SIZE - lag], atol=1e-5)
+
+    def test_carrier_follows_the_voice_envelope(self):
+        """Fully vocoded output rises and falls with the speech"""
+        x = voice()
+        vocoder = ChannelVocoder(SAMPLE_RATE, BLOCK_SIZE)
+        vocoder.apply_plan(vocoder.plan(1.0, 120.0))
+        y = run(vocoder, x)
+        lag = vocoder.latency
+        blocks = range(0, len(x) - 2 * BLOCK_SIZE, BLOCK_SIZE)
+        level_in = [x[i:i + BLOCK_SIZE].std() for i in blocks]
+        level_out = [y[i + lag:i + lag + BLOCK_SIZE].std() for i in blocks]
+        self.assertGreater(np.corrcoef(level_in, level_out)[0, 1], 0.9)
+        self.assertFalse(np.allclose(y[lag:], x[:len(x) - lag], atol=1e-2))
+
+    def test_multichannel_matches_mono(self):
+        x = voice(1.0)
+        stereo = np.stack([x, 0.5 * x[::-1]], axis=1)
+        vocoder = ChannelVocoder(SAMPLE_RATE, BLOCK_SIZE, channels=2)
+        vocoder.apply_plan(vocoder.plan(0.8, 120.0))
+        y = run(vocoder, stereo)
+        for ch in range(2):
+            mono = ChannelVocoder(SAMPLE_RATE, BLOCK_SIZE)
+            mono.apply_plan(mono.plan(0.8, 120.0))
+            np.testing.assert_allclose(y[:, ch], run(mono, np.ascontiguousarray(stereo[:, ch])), atol=1e-6)
+
+
+class TestRingModulator(unittest.TestCase):
+    """Tests for the ring modulator"""
+
+    def test_full_mix_is_the_sine(self):
+        ring = RingModulator(SAMPLE_RATE, BLOCK_SIZE, ramp_time=0.0)
+        ring.apply_plan(ring.plan(1.0, 50.0))
+        ones = np.ones(4 * BLOCK_SIZE, dtype=np.float32)
+        t = np.arange(1, len(ones) + 1) / SAMPLE_RATE
+        np.testing.assert_allclose(run(ring, ones), np.sin(2 * np.pi * 50.0 * t), atol=1e-4)
+
+    def test_inactive_at_zero_mix(self):
+        self.assertFalse(RingModulator(SAMPLE_RATE, BLOCK_SIZE).active)
+
+
+class TestRobotEngine(unittest.TestCase):
+    """Tests for the robot stages in DSPEngine"""
+
+    def test_latency_and_live_parameters(self):
+        engine = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE, channel_vocoder=True)
+        plain = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE)
+        self.assertEqual(engine.latency, plain.latency + engine.channel_vocoder.latency)
+
+        store = ParamStore()
+        store.bind(engine.compile)
+        store.update(vocoder_mix=1.0, vocoder_pitch=90.0, ring_mix=0.5, ring_freq=40.0)
+        engine.apply(store.snapshot.compiled)
+        self.assertEqual(engine.channel_vocoder.mix, 1.0)
+        self.assertTrue(engine.ring.active)
+
+        x = voice(1.0)
+        y = np.concatenate([engine.process_block(x[i:i + BLOCK_SIZE]).copy()
+                            for i in range(0, len(x) - BLOCK_SIZE + 1, BLOCK_SIZE)])
+        self.assertTrue(np.isfinite(y).all())
+        self.assertGreater(np.abs(y).max(), 0.0)
+
+    def test_robot_params_ignored_without_vocoder(self):
+        """An engine built without the vocoder still accepts presets that use it"""
+        engine = DSPEngine(SAMPLE_RATE, 1, BLOCK_SIZE)
+        engine.set_params(-0.3, 1.5, 0.5, 0.8, vocoder_mix=1.0)
+        self.assertIsNone(engine.compiled.channel_vocoder)
+
+
+if __name__ == '__main__':
+    unittest.main()
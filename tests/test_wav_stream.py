@@ -0,0 +1,78 @@
+# Unit tests for memory-mapped streaming WAV I/O
+import unittest
+import sys
+import os
+import tempfile
+import tracemalloc
+
+import numpy as np
+from scipy.io import wavfile
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wav_stream import WavReader, WavWriter
+
+
+class TestWavStream(unittest.TestCase):
+    """Tests for block-iterated WAV reading and writing"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_round_trip_int16_and_float32(self):
+        """Blocks read and written back reproduce the file exactly"""
+        noise = 0.1 * self.rng.standard_normal((5000, 2))
+        for audio in ((noise * 32767).astype(np.int16), noise.astype(np.float32)):
+            wavfile.write(self.path('in.wav'), 8000, audio)
+            with WavReader(self.path('in.wav')) as reader:
+                with WavWriter(self.path('out.wav'), 8000, 2, reader.frames, reader.dtype) as writer:
+                    for block in reader.blocks(1024):
+                        writer.write(block)
+            rate, written = wavfile.read(self.path('out.wav'))
+            self.assertEqual(rate, 8000)
+            self.assertEqual(written.dtype, audio.dtype)
+            np.testing.assert_array_equal(written, audio)
+
+    def test_reader_scales_and_pads(self):
+        """int16 is scaled to float and reads past the end are zero"""
+        wavfile.write(self.path('in.wav'), 8000, np.full(100, 32767, dtype=np.int16))
+        with WavReader(self.path('in.wav')) as reader:
+            self.assertTrue(reader.mono)
+            block = reader.read(90, 110)
+        self.assertEqual(block.shape, (20, 1))
+        np.testing.assert_array_equal(block[:10], 1.0)
+        np.testing.assert_array_equal(block[10:], 0.0)
+
+    def test_writer_clips_int16(self):
+        """Out-of-range float samples saturate instead of wrapping"""
+        with WavWriter(self.path('out.wav'), 8000, 1, 2) as writer:
+            writer.write(np.array([[2.0], [-2.0]], dtype=np.float32))
+        np.testing.assert_array_equal(wavfile.read(self.path('out.wav'))[1], [32767, -32768])
+
+    def test_memory_does_not_grow_with_length(self):
+        """Peak Python allocation is the same for short and long files"""
+        peaks = []
+        for seconds in (2, 20):
+            audio = (0.1 * self.rng.standard_normal(8000 * seconds) * 32767).astype(np.int16)
+            wavfile.write(self.path('in.wav'), 8000, audio)
+            tracemalloc.start()
+            with WavReader(self.path('in.wav')) as reader:
+                with WavWriter(self.path('out.wav'), 8000, 1, reader.frames, reader.dtype) as writer:
+                    for block in reader.blocks(1024):
+                        writer.write(block * 0.5)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], 1.5 * peaks[0])
+        self.assertLess(peaks[1], 8000 * 20 * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()